@@ -0,0 +1,246 @@
+"""
+Build dos arquivos estáticos.
+
+    python -m app.build_assets
+
+Lê app/static e grava em ASSETS_DIR (app/static/dist):
+- arquivos idênticos viram um só (dedupe por SHA-256)
+- imagens reduzidas para a largura em que são exibidas, com variantes
+  WebP/AVIF (servidas conforme o Accept do navegador)
+- nomes com hash do conteúdo (cache imutável)
+- CSS/JS/SVG pré-comprimidos (gzip; brotli se instalado)
+- manifest.json: nome original → arquivo gerado (usado pelo asset() dos templates)
+"""
+import fnmatch
+import gzip
+import hashlib
+import json
+import logging
+import os
+import shutil
+import sys
+from io import BytesIO
+from typing import Dict, Optional
+
+from PIL import Image, ImageOps, features
+
+from app.services.assets import ASSETS_DIR, MANIFESTO, STATIC_DIR, hash_fontes
+
+try:
+    import brotli
+except ImportError:  # opcional
+    brotli = None
+
+logger = logging.getLogger(__name__)
+
+# Largura máxima (px) de cada imagem: largura exibida x 2 (telas retina)
+LARGURAS = {
+    # .option .icone: 40px de altura com scale(5.2) → ~370px de largura
+    "check-*.png": 800,
+    # .admin-btn: 40px
+    "arrow2.png": 120,
+    # .icon img: 25% do card
+    "camera-icon.png": 400,
+}
+LARGURA_PADRAO = 1600
+
+QUALIDADE_WEBP = 82
+QUALIDADE_AVIF = 60
+
+IMAGENS = {".png": "image/png", ".jpg": "image/jpeg", ".jpeg": "image/jpeg"}
+TEXTOS = {
+    ".css": "text/css",
+    ".js": "text/javascript",
+    ".svg": "image/svg+xml",
+    ".json": "application/json",
+}
+
+
+# ============================================================
+# UTILS
+# ============================================================
+
+def _largura(nome: str) -> int:
+    for padrao, largura in LARGURAS.items():
+        if fnmatch.fnmatch(nome, padrao):
+            return largura
+    return LARGURA_PADRAO
+
+
+def _gravar(pasta: str, nome: str, dados: bytes) -> None:
+    destino = os.path.join(pasta, nome)
+    temporario = destino + ".tmp"
+    with open(temporario, "wb") as f:
+        f.write(dados)
+    os.replace(temporario, destino)
+
+
+def _nome_hash(stem: str, dados: bytes, ext: str) -> str:
+    return f"{stem}.{hashlib.sha256(dados).hexdigest()[:10]}{ext}"
+
+
+# ============================================================
+# IMAGENS
+# ============================================================
+
+def _processar_imagem(dados: bytes, ext: str, largura: int) -> Dict[str, bytes]:
+    """
+    Retorna {mime: bytes} com a imagem reduzida no formato original e
+    as variantes modernas que ficaram menores que ela.
+    """
+    with Image.open(BytesIO(dados)) as original:
+        img = ImageOps.exif_transpose(original)
+        if img.width > largura:
+            altura = max(1, round(img.height * largura / img.width))
+            img = img.resize((largura, altura), Image.LANCZOS, reducing_gap=3.0)
+
+        saida = BytesIO()
+        if ext == ".png":
+            img.save(saida, format="PNG", optimize=True)
+            mime = "image/png"
+        else:
+            img.convert("RGB").save(
+                saida, format="JPEG", quality=85, optimize=True, progressive=True
+            )
+            mime = "image/jpeg"
+
+        # Sem redução de tamanho, fica o original se o recodificado não ganhou
+        otimizado = saida.getvalue()
+        reduzida = img.size != original.size
+        base = otimizado if reduzida or len(otimizado) < len(dados) else dados
+        resultado = {mime: base}
+
+        variantes = [("image/webp", "WEBP", {"quality": QUALIDADE_WEBP, "method": 4})]
+        if features.check("avif"):
+            variantes.append(
+                ("image/avif", "AVIF", {"quality": QUALIDADE_AVIF, "speed": 6})
+            )
+
+        for tipo, formato, opcoes in variantes:
+            buffer = BytesIO()
+            img.save(buffer, format=formato, **opcoes)
+            if buffer.tell() < len(base):
+                resultado[tipo] = buffer.getvalue()
+
+        return resultado
+
+
+EXTENSOES = {
+    "image/png": ".png",
+    "image/jpeg": ".jpg",
+    "image/webp": ".webp",
+    "image/avif": ".avif",
+}
+
+
+# ============================================================
+# BUILD
+# ============================================================
+
+def construir(forcar: bool = False) -> Optional[dict]:
+    """
+    Gera ASSETS_DIR. Sem mudança nas fontes (e sem `forcar`) não faz nada
+    e retorna None.
+    """
+    fontes = hash_fontes()
+    manifesto_path = os.path.join(ASSETS_DIR, MANIFESTO)
+
+    if not forcar and os.path.exists(manifesto_path):
+        with open(manifesto_path, "r", encoding="utf-8") as f:
+            if json.load(f).get("fontes") == fontes:
+                return None
+
+    # Nomes por processo: vários workers podem buildar ao mesmo tempo
+    temporaria = f"{ASSETS_DIR}.tmp-{os.getpid()}"
+    shutil.rmtree(temporaria, ignore_errors=True)
+    os.makedirs(temporaria)
+
+    assets: Dict[str, str] = {}
+    arquivos: Dict[str, dict] = {}
+    gerados: Dict[tuple, str] = {}
+    bytes_antes = bytes_depois = 0
+
+    for nome in sorted(fontes):
+        stem, ext = os.path.splitext(nome)
+        ext = ext.lower()
+        with open(os.path.join(STATIC_DIR, nome), "rb") as f:
+            dados = f.read()
+
+        bytes_antes += len(dados)
+
+        # ---------------------------------
+        # Dedupe: mesmo conteúdo + mesmo tratamento → mesmo arquivo
+        # ---------------------------------
+        chave = (fontes[nome], _largura(nome) if ext in IMAGENS else None)
+        if chave in gerados:
+            assets[nome] = gerados[chave]
+            continue
+
+        if ext in IMAGENS:
+            saidas = _processar_imagem(dados, ext, _largura(nome))
+            tipo = IMAGENS[ext]
+            principal = _nome_hash(stem, saidas[tipo], EXTENSOES[tipo])
+            base = principal[:-len(EXTENSOES[tipo])]
+
+            info = {"tipo": tipo, "variantes": {}, "encodings": {}}
+            for mime, conteudo in saidas.items():
+                arquivo = base + EXTENSOES[mime]
+                _gravar(temporaria, arquivo, conteudo)
+                if mime != tipo:
+                    info["variantes"][mime] = arquivo
+            bytes_depois += min(len(c) for c in saidas.values())
+
+        else:
+            principal = _nome_hash(stem, dados, ext)
+            _gravar(temporaria, principal, dados)
+            info = {
+                "tipo": TEXTOS.get(ext, "application/octet-stream"),
+                "variantes": {},
+                "encodings": {}
+            }
+
+            if ext in TEXTOS:
+                comprimido = gzip.compress(dados, compresslevel=9, mtime=0)
+                _gravar(temporaria, principal + ".gz", comprimido)
+                info["encodings"]["gzip"] = principal + ".gz"
+                menor = len(comprimido)
+
+                if brotli is not None:
+                    comprimido = brotli.compress(dados, quality=11)
+                    _gravar(temporaria, principal + ".br", comprimido)
+                    info["encodings"]["br"] = principal + ".br"
+                    menor = min(menor, len(comprimido))
+
+                bytes_depois += menor
+            else:
+                bytes_depois += len(dados)
+
+        arquivos[principal] = info
+        assets[nome] = principal
+        gerados[chave] = principal
+
+    manifesto = {"fontes": fontes, "assets": assets, "arquivos": arquivos}
+    with open(os.path.join(temporaria, MANIFESTO), "w", encoding="utf-8") as f:
+        json.dump(manifesto, f, indent=2, sort_keys=True)
+
+    # Troca a pasta inteira só no fim: o build anterior segue servindo até aqui
+    antiga = f"{ASSETS_DIR}.old-{os.getpid()}"
+    try:
+        if os.path.exists(ASSETS_DIR):
+            os.replace(ASSETS_DIR, antiga)
+        os.replace(temporaria, ASSETS_DIR)
+    except OSError:
+        # Outro processo trocou no mesmo instante; o build dele é equivalente
+        shutil.rmtree(temporaria, ignore_errors=True)
+    shutil.rmtree(antiga, ignore_errors=True)
+
+    logger.info(
+        "Assets: %d fonte(s) → %d arquivo(s); %d KB → %d KB",
+        len(fontes), len(arquivos), bytes_antes // 1024, bytes_depois // 1024
+    )
+    return manifesto
+
+
+if __name__ == "__main__":
+    logging.basicConfig(level=logging.INFO)
+    construir(forcar="--forcar" in sys.argv)
@@ -0,0 +1,120 @@
+"""
+Relatório de cold start: quanto custa importar a aplicação.
+
+    python -m app.inicializacao [--modulo app.main] [--orcamento-ms 800] [--top 25]
+
+Importa o módulo num processo novo com `python -X importtime` e mostra:
+- os módulos mais caros (tempo acumulado, incluindo o que eles importam)
+- o tempo próprio somado por pacote (fastapi, httpx, app, ...)
+
+Sai com código 1 se o total passar do orçamento (COLD_START_ORCAMENTO_MS),
+para ser usado no CI.
+"""
+import argparse
+import os
+import re
+import subprocess
+import sys
+from collections import defaultdict
+from dataclasses import dataclass
+from typing import Dict, List
+
+COLD_START_ORCAMENTO_MS = float(os.getenv("COLD_START_ORCAMENTO_MS", "800"))
+
+_LINHA = re.compile(r"^import time:\s+(\d+) \|\s+(\d+) \|( *)(\S+)$")
+
+
+@dataclass
+class ImportMedido:
+    modulo: str
+    proprio_us: int
+    acumulado_us: int
+    nivel: int
+
+    @property
+    def pacote(self) -> str:
+        return self.modulo.split(".")[0]
+
+
+# ============================================================
+# MEDIÇÃO
+# ============================================================
+
+def medir(modulo: str = "app.main") -> List[ImportMedido]:
+    """
+    Imports de `modulo` num interpretador limpo (sem cache de sys.modules).
+    """
+    processo = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", f"import {modulo}"],
+        capture_output=True,
+        text=True,
+        env={**os.environ, "PYTHONDONTWRITEBYTECODE": "1"}
+    )
+
+    if processo.returncode != 0:
+        raise RuntimeError(
+            f"Falha ao importar {modulo}:\n{processo.stderr[-2000:]}"
+        )
+
+    medidos = []
+    for linha in processo.stderr.splitlines():
+        achado = _LINHA.match(linha)
+        if achado:
+            proprio, acumulado, recuo, nome = achado.groups()
+            medidos.append(
+                ImportMedido(nome, int(proprio), int(acumulado), len(recuo) // 2)
+            )
+    return medidos
+
+
+def por_pacote(medidos: List[ImportMedido]) -> Dict[str, int]:
+    """
+    Pacote de primeiro nível → soma do tempo próprio dos seus módulos (µs).
+    """
+    totais: Dict[str, int] = defaultdict(int)
+    for medido in medidos:
+        totais[medido.pacote] += medido.proprio_us
+    return dict(totais)
+
+
+# ============================================================
+# RELATÓRIO
+# ============================================================
+
+def relatorio(modulo: str, top: int) -> float:
+    """
+    Imprime o relatório e retorna o total em ms.
+    """
+    medidos = medir(modulo)
+    total_ms = sum(m.proprio_us for m in medidos) / 1000
+
+    print(f"Import de {modulo}: {total_ms:.0f} ms ({len(medidos)} módulos)\n")
+
+    print(f"{'acumulado':>10} {'próprio':>9}  módulo")
+    for medido in sorted(medidos, key=lambda m: m.acumulado_us, reverse=True)[:top]:
+        print(
+            f"{medido.acumulado_us / 1000:>8.1f}ms {medido.proprio_us / 1000:>7.1f}ms"
+            f"  {medido.modulo}"
+        )
+
+    print(f"\n{'próprio':>10}  pacote")
+    pacotes = sorted(por_pacote(medidos).items(), key=lambda p: p[1], reverse=True)
+    for pacote, proprio in pacotes[:top]:
+        print(f"{proprio / 1000:>8.1f}ms  {pacote}")
+
+    return total_ms
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument("--modulo", default="app.main")
+    parser.add_argument("--orcamento-ms", type=float, default=COLD_START_ORCAMENTO_MS)
+    parser.add_argument("--top", type=int, default=25)
+    args = parser.parse_args()
+
+    total = relatorio(args.modulo, args.top)
+
+    if total > args.orcamento_ms:
+        print(f"\nAcima do orçamento: {total:.0f} ms > {args.orcamento_ms:.0f} ms")
+        sys.exit(1)
+    print(f"\nDentro do orçamento: {total:.0f} ms <= {args.orcamento_ms:.0f} ms")
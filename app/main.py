@@ -1,17 +1,70 @@
+import time
+
+_inicio_imports = time.perf_counter()
+
+import logging
+from contextlib import asynccontextmanager
+
 from fastapi import FastAPI, Request
 from fastapi.staticfiles import StaticFiles
 from fastapi.templating import Jinja2Templates
-from app.routers import public, respostas, termo, ressalvas, finalizacao, nps
+from app.routers import admin, assets as assets_router, public, respostas, termo, ressalvas, finalizacao, nps, jobs as jobs_router, metricas as metricas_router
+from app.services import assets, idempotencia, ingestao, jobs, metricas, render, supabase_client
+from app.services.supabase_client import close_async_client
+
+logger = logging.getLogger(__name__)
+
+# Custo de importar a aplicação (relatório detalhado: python -m app.inicializacao)
+TEMPO_IMPORTS = time.perf_counter() - _inicio_imports
+
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    inicio = time.perf_counter()
+    # Build/carga do manifest de assets (só refaz se app/static mudou)
+    await assets.iniciar()
+    # Sobe os processos de render antes da primeira requisição
+    await render.iniciar()
+    # Workers da fila de jobs no próprio processo (JOBS_WORKERS=0 desliga)
+    await jobs.iniciar()
+    # Remove respostas idempotentes vencidas
+    await idempotencia.iniciar()
+    # Gravação em lote de /api/respostas
+    await ingestao.respostas.iniciar()
+    # Pool HTTP do Supabase já conectado (SUPABASE_AQUECER=0 desliga)
+    await supabase_client.aquecer()
+    logger.info(
+        "Startup: imports %.0f ms, lifespan %.0f ms",
+        TEMPO_IMPORTS * 1000, (time.perf_counter() - inicio) * 1000
+    )
+    yield
+    await ingestao.respostas.parar()
+    await jobs.parar()
+    await render.parar()
+    # Fecha o pool de conexões HTTP compartilhado
+    await close_async_client()
+
+
+app = FastAPI(title="Sistema de Termos", lifespan=lifespan)
 
-app = FastAPI(title="Sistema de Termos")
+# Duração por rota/etapa em /metrics (METRICAS=0 desliga; SERVER_TIMING=1
+# devolve as etapas no cabeçalho Server-Timing)
+if metricas.METRICAS_ATIVAS:
+    app.add_middleware(metricas.MiddlewareMetricas)
 
 app.mount("/static", StaticFiles(directory="app/static"), name="static")
 
 templates = Jinja2Templates(directory="app/templates")
 
+app.include_router(assets_router.router)
 app.include_router(public.router)
 app.include_router(respostas.router)
 app.include_router(termo.router)
 app.include_router(ressalvas.router)
 app.include_router(finalizacao.router)
-app.include_router(nps.router)
\ No newline at end of file
+app.include_router(nps.router)
+app.include_router(jobs_router.router)
+app.include_router(metricas_router.router)
+# API do admin só com ADMIN_TOKEN configurado
+if admin.ADMIN_TOKEN:
+    app.include_router(admin.router)
\ No newline at end of file
@@ -0,0 +1,259 @@
+import asyncio
+import hmac
+import logging
+import os
+import re
+from collections import Counter
+from datetime import date, timedelta
+from typing import Any, List, Optional, Tuple
+
+from fastapi import APIRouter, Depends, HTTPException, Query
+from fastapi.responses import StreamingResponse
+from fastapi.security import HTTPAuthorizationCredentials, HTTPBearer
+
+from app.services import database as db, exportacao, processos
+
+logger = logging.getLogger(__name__)
+
+router = APIRouter(prefix="/admin/api", tags=["Admin"])
+
+# Token (Authorization: Bearer ...) exigido pelas rotas do admin; vazio =
+# router não é montado (app.main)
+ADMIN_TOKEN = os.getenv("ADMIN_TOKEN", "")
+
+ADMIN_PAGINA_PADRAO = 50
+ADMIN_PAGINA_MAX = 200
+
+# Colunas que a listagem pode devolver (imagens_termo fica de fora: JSON grande)
+CAMPOS_PROCESSO = (
+    "id", "processo_id", "codigo", "nome_cliente", "cpf", "status",
+    "status_entrega", "criado_em", "atualizado_em", "finalizado_em",
+    "termo_pdf", "pdf_ressalvas", "pdf_final",
+)
+CAMPOS_PADRAO = "codigo,nome_cliente,cpf,status,status_entrega,criado_em,finalizado_em"
+
+# Ordem da listagem e da chave do cursor (mais recentes primeiro)
+CHAVE_CURSOR = ("criado_em", "id")
+
+COLUNAS_ITEM = "id,item,descricao,prazo,aprovacao,criado_em"
+
+
+# ============================================================
+# AUTENTICAÇÃO
+# ============================================================
+
+_bearer = HTTPBearer(auto_error=False)
+
+
+async def exigir_admin(
+    credenciais: Optional[HTTPAuthorizationCredentials] = Depends(_bearer)
+) -> None:
+    """
+    As rotas do admin expõem nomes e CPFs: só com o ADMIN_TOKEN.
+    """
+    if not ADMIN_TOKEN or credenciais is None or not hmac.compare_digest(
+        credenciais.credentials.encode(), ADMIN_TOKEN.encode()
+    ):
+        raise HTTPException(
+            status_code=401,
+            detail="Não autorizado",
+            headers={"WWW-Authenticate": "Bearer"}
+        )
+
+
+# ============================================================
+# CURSOR
+# ============================================================
+
+def decodificar_cursor(cursor: str) -> List[Any]:
+    try:
+        return db.decodificar_cursor(cursor, len(CHAVE_CURSOR))
+    except ValueError:
+        raise HTTPException(status_code=400, detail="Cursor inválido")
+
+
+def projecao(campos: str) -> Tuple[List[str], str]:
+    """
+    Campos pedidos (validados) e o select do PostgREST, que sempre
+    inclui as colunas do cursor.
+    """
+    pedidos = [c.strip() for c in campos.split(",") if c.strip()]
+    invalidos = [c for c in pedidos if c not in CAMPOS_PROCESSO]
+    if invalidos:
+        raise HTTPException(
+            status_code=400,
+            detail=f"Campos inválidos: {', '.join(invalidos)}"
+        )
+
+    colunas = list(dict.fromkeys(pedidos + list(CHAVE_CURSOR)))
+    return pedidos, ",".join(colunas)
+
+
+# ============================================================
+# PROCESSOS
+# ============================================================
+
+async def contar_itens(ids: List[str]) -> Counter:
+    """
+    Itens de ressalva por processo da página, agregados no banco
+    (count() agrupado por processo_id): uma linha por processo, não
+    uma por item. Sem agregados no PostgREST (db_aggregates_enabled),
+    cai para uma contagem exata por processo.
+    """
+    if not ids:
+        return Counter()
+
+    try:
+        linhas = await db.select(
+            "ressalvas_itens",
+            "processo_id,total:count()",
+            {"processo_id": db.in_(ids)}
+        )
+    except db.SupabaseError as e:
+        if e.status_code != 400:
+            raise
+        logger.warning("Agregados indisponíveis no PostgREST (%s); contando por processo", e)
+        totais = await asyncio.gather(
+            *(db.contar("ressalvas_itens", {"processo_id": db.eq(i)}) for i in ids)
+        )
+        return Counter(dict(zip(ids, totais)))
+
+    return Counter({linha["processo_id"]: linha["total"] for linha in linhas})
+
+
+@router.get("/processos", dependencies=[Depends(exigir_admin)])
+async def listar_processos(
+    cursor: Optional[str] = None,
+    limite: int = Query(ADMIN_PAGINA_PADRAO, ge=1, le=ADMIN_PAGINA_MAX),
+    campos: str = CAMPOS_PADRAO,
+    status: Optional[str] = None,
+    de: Optional[date] = None,
+    ate: Optional[date] = None,
+    cpf: Optional[str] = None,
+    itens: bool = True
+):
+    """
+    Processos do mais recente para o mais antigo, paginados por cursor
+    (criado_em, id): cada página custa o mesmo, em qualquer profundidade.
+
+    - campos: colunas devolvidas, separadas por vírgula
+    - status: um ou mais, separados por vírgula
+    - de / ate: dia de criação (inclusive)
+    - itens: inclui a contagem de itens de ressalva
+    """
+    pedidos, select = projecao(campos)
+    filtros = {}
+
+    if status:
+        valores = [s.strip() for s in status.split(",") if s.strip()]
+        filtros["status"] = db.eq(valores[0]) if len(valores) == 1 else db.in_(valores)
+
+    if cpf:
+        filtros["cpf"] = db.eq(re.sub(r"\D", "", cpf))
+
+    periodo = []
+    if de:
+        periodo.append(f"criado_em.gte.{de.isoformat()}")
+    if ate:
+        periodo.append(f"criado_em.lt.{(ate + timedelta(days=1)).isoformat()}")
+    if periodo:
+        filtros["and"] = f"({','.join(periodo)})"
+
+    if cursor:
+        filtros["or"] = db.apos(CHAVE_CURSOR, decodificar_cursor(cursor))
+
+    # Um a mais para saber se existe próxima página
+    linhas = await db.select(
+        "processos",
+        select,
+        filtros,
+        ordem=",".join(f"{coluna}.desc" for coluna in CHAVE_CURSOR),
+        limite=limite + 1
+    )
+
+    proximo = None
+    if len(linhas) > limite:
+        linhas = linhas[:limite]
+        proximo = db.codificar_cursor([linhas[-1][c] for c in CHAVE_CURSOR])
+
+    contagem = await contar_itens([l["id"] for l in linhas]) if itens else None
+
+    resultado = []
+    for linha in linhas:
+        saida = {campo: linha.get(campo) for campo in pedidos}
+        saida["id"] = linha["id"]
+        if contagem is not None:
+            saida["itens_ressalva"] = contagem.get(linha["id"], 0)
+        resultado.append(saida)
+
+    return {"processos": resultado, "proximo_cursor": proximo}
+
+
+@router.get("/processos/{identificador}/ressalvas", dependencies=[Depends(exigir_admin)])
+async def listar_ressalvas(identificador: str):
+    """
+    Itens de ressalva do processo (código ou UUID), só com as colunas da
+    tabela do admin.
+    """
+    proc = await processos.buscar(identificador)
+    if proc is None:
+        raise HTTPException(status_code=404, detail="Processo não encontrado")
+
+    itens = await db.select(
+        "ressalvas_itens",
+        COLUNAS_ITEM,
+        {"processo_id": db.eq(proc["id"])},
+        ordem="criado_em.asc,id.asc"
+    )
+    return {"processo": proc["codigo"], "itens": itens}
+
+
+# ============================================================
+# EXPORTAÇÃO (ZIP)
+# ============================================================
+
+@router.get("/exportacao", dependencies=[Depends(exigir_admin)])
+async def exportar_entregas(
+    de: date,
+    ate: date,
+    documentos: str = "final",
+    cursor: Optional[str] = None,
+    limite: int = Query(
+        exportacao.EXPORTACAO_LIMITE_MAX, ge=1, le=exportacao.EXPORTACAO_LIMITE_MAX
+    )
+):
+    """
+    ZIP (em streaming) com os PDFs dos processos finalizados entre `de` e
+    `ate` e um manifesto.csv. documentos: final, termo e/ou ressalvas.
+
+    Períodos com mais de `limite` processos vêm em lotes: o cabeçalho
+    X-Proximo-Cursor traz o cursor do lote seguinte. O período vai até
+    EXPORTACAO_DIAS_MAX dias.
+    """
+    if de > ate:
+        raise HTTPException(status_code=400, detail="de depois de ate")
+    if (ate - de).days + 1 > exportacao.EXPORTACAO_DIAS_MAX:
+        raise HTTPException(
+            status_code=400,
+            detail=f"Período maior que {exportacao.EXPORTACAO_DIAS_MAX} dias"
+        )
+
+    try:
+        lista = exportacao.validar_documentos(
+            [d.strip() for d in documentos.split(",") if d.strip()]
+        )
+        lote = await exportacao.listar(de, ate, cursor, limite)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+    headers = {
+        "Content-Disposition": f'attachment; filename="entregas_{de}_{ate}.zip"'
+    }
+    if lote.proximo_cursor:
+        headers["X-Proximo-Cursor"] = lote.proximo_cursor
+
+    return StreamingResponse(
+        exportacao.gerar_zip(lote.processos, lista),
+        media_type="application/zip",
+        headers=headers
+    )
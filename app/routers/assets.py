@@ -0,0 +1,32 @@
+from fastapi import APIRouter, HTTPException, Request
+from fastapi.responses import FileResponse
+
+from app.services import assets
+
+router = APIRouter(tags=["Assets"])
+
+
+# ============================================================
+# ARQUIVOS ESTÁTICOS COM HASH (CACHE IMUTÁVEL)
+# ============================================================
+
+@router.get(assets.PREFIXO_URL + "/{arquivo}")
+async def servir_asset(arquivo: str, request: Request):
+    escolhido = assets.resolver(
+        arquivo,
+        request.headers.get("accept", ""),
+        request.headers.get("accept-encoding", "")
+    )
+
+    if escolhido is None:
+        raise HTTPException(status_code=404, detail="Arquivo não encontrado")
+
+    caminho, tipo, encoding, vary = escolhido
+
+    headers = {"Cache-Control": assets.CACHE_IMUTAVEL}
+    if encoding:
+        headers["Content-Encoding"] = encoding
+    if vary:
+        headers["Vary"] = vary
+
+    return FileResponse(caminho, media_type=tipo, headers=headers)
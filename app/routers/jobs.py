@@ -0,0 +1,23 @@
+from fastapi import APIRouter, HTTPException
+
+from app.services import jobs
+
+router = APIRouter(prefix="/jobs", tags=["Jobs"])
+
+
+# ============================================================
+# STATUS DE JOB
+# ============================================================
+
+@router.get("/{job_id}")
+async def status_job(job_id: str):
+    """
+    Consulta de um job criado em modo assíncrono
+    (`Prefer: respond-async` ou `?assincrono=true`).
+    """
+    job = await jobs.obter(job_id)
+
+    if job is None:
+        raise HTTPException(status_code=404, detail="Job não encontrado")
+
+    return job
@@ -0,0 +1,30 @@
+from fastapi import APIRouter, HTTPException
+from fastapi.concurrency import run_in_threadpool
+from fastapi.responses import Response
+
+from app.routers.public import cache_paginas
+from app.services import artefatos, idempotencia, indicadores, ingestao, metricas, processos
+
+router = APIRouter(tags=["Métricas"])
+
+# Estatísticas lidas a cada coleta
+metricas.registrar_coletor("artefatos", artefatos.cache.estatisticas)
+metricas.registrar_coletor("processos_cache", processos.cache.estatisticas)
+metricas.registrar_coletor("paginas_cache", cache_paginas.estatisticas)
+metricas.registrar_coletor("respostas_fila", ingestao.respostas.estatisticas)
+metricas.registrar_coletor("idempotencia", idempotencia.estatisticas)
+metricas.registrar_coletor("nps_indicadores", indicadores.rollups.estatisticas)
+
+
+# ============================================================
+# PROMETHEUS
+# ============================================================
+
+@router.get("/metrics", include_in_schema=False)
+async def exportar_metricas():
+    if not metricas.METRICAS_ATIVAS:
+        raise HTTPException(status_code=404, detail="Métricas desativadas")
+
+    # Coletores podem consultar SQLite (cache de artefatos)
+    corpo = await run_in_threadpool(metricas.expor)
+    return Response(corpo, media_type="text/plain; version=0.0.4; charset=utf-8")
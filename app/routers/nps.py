@@ -1,14 +1,12 @@
-from fastapi import APIRouter, HTTPException
-from pydantic import BaseModel
-import os
-from datetime import date
+from fastapi import APIRouter, HTTPException, Query, Request
+from pydantic import BaseModel, Field
+from typing import Literal, Optional
+import asyncio
+import json
+from datetime import date, timedelta
 
-from reportlab.pdfgen import canvas
-from reportlab.lib.pagesizes import A4
-from PyPDF2 import PdfMerger
-
-from app.services.upload import upload_pdf
-from app.services.supabase_client import supabase
+from app.services import artefatos, entrega, indicadores, jobs, pdfs, processos, render
+from app.services.upload import path_de_url, upload_bytes
 
 router = APIRouter(prefix="/nps", tags=["NPS"])
 
@@ -18,126 +16,136 @@ router = APIRouter(prefix="/nps", tags=["NPS"])
 # ===============================
 class NPSRequest(BaseModel):
     processo_id: str
-    nps: int
+    nps: int = Field(..., ge=0, le=10)
     avaliacoes: dict
     feedback: dict
 
 
 # ===============================
-# ROTA
+# PROCESSAMENTO
 # ===============================
-@router.post("/finalizar")
-def finalizar_nps(data: NPSRequest):
+async def processar_nps(data: NPSRequest) -> dict:
+
+    try:
+        # ===============================
+        # PROCESSO (CÓDIGO OU UUID)
+        # ===============================
+        processo = await entrega.buscar_processo(data.processo_id.strip())
+        pasta = entrega.pasta_processo(processo)
+
+        # ===============================
+        # MERGE EM MEMÓRIA (TERMO + RESSALVAS + NPS)
+        # ===============================
+        final_pdf = await entrega.montar_entrega(
+            processo,
+            render.renderizar(
+                pdfs.pagina_nps,
+                data.nps,
+                data.avaliacoes,
+                data.feedback
+            )
+        )
+
+        # ===============================
+        # UPLOAD (PDF FINAL + RESPOSTAS DO NPS)
+        # ===============================
+        final_url, _ = await asyncio.gather(
+            upload_bytes(
+                final_pdf,
+                pasta,
+                tipo="pdf",
+                nome="entrega_final.pdf",
+                upsert=True
+            ),
+            # Lido por /finalizacao/gerar-pdf-final
+            upload_bytes(
+                json.dumps(data.model_dump(), ensure_ascii=False).encode("utf-8"),
+                f"{pasta}/nps",
+                tipo="json",
+                nome="nps.json",
+                upsert=True
+            )
+        )
+
+    except entrega.EntregaError as e:
+        raise HTTPException(e.status_code, str(e))
+
+    except render.RenderTimeout as e:
+        raise HTTPException(504, str(e))
 
-    processo_id = data.processo_id.strip()
-    if not processo_id:
-        raise HTTPException(status_code=400, detail="processo_id ausente")
+    if not final_url:
+        raise HTTPException(500, "Falha no upload do PDF final")
+
+    await artefatos.guardar(path_de_url(final_url), final_pdf)
 
     # ===============================
-    # CAMINHOS
+    # UPDATE BANCO (100% COMPATÍVEL)
     # ===============================
-    base_dir = os.path.join("pdfs", processo_id)
+    await processos.atualizar(processo["id"], {
+        "status": "finalizado",
+        "pdf_final": final_url,
+        "finalizado_em": date.today().isoformat()
+    })
 
-    termo_pdf = os.path.join(base_dir, "termo", "termo.pdf")
-    ressalvas_pdf = os.path.join(base_dir, "ressalvas", "ressalvas.pdf")
-    final_dir = os.path.join(base_dir, "final")
+    # Rollups de /nps/indicadores (substitui uma finalização anterior)
+    await indicadores.registrar(
+        processo["id"], date.today(), data.nps, data.avaliacoes
+    )
 
-    if not os.path.exists(termo_pdf):
-        raise HTTPException(404, "Termo não encontrado")
+    return {
+        "status": "ok",
+        "pdf_final": final_url,
+        "entrega_final": final_url  # chave lida pelo NPS2System.html
+    }
 
-    if not os.path.exists(ressalvas_pdf):
-        raise HTTPException(404, "Ressalvas não encontradas")
 
-    os.makedirs(final_dir, exist_ok=True)
+async def executar_job_nps(payload: dict, arquivos: dict) -> dict:
+    return await processar_nps(NPSRequest.model_validate(payload))
 
-    # ===============================
-    # GERAR PDF NPS
-    # ===============================
-    nps_pdf = os.path.join(final_dir, "nps.pdf")
-    c = canvas.Canvas(nps_pdf, pagesize=A4)
-    width, height = A4
-
-    y = height - 50
-    c.setFont("Helvetica-Bold", 16)
-    c.drawString(40, y, "Pesquisa de Satisfação (NPS)")
-    y -= 40
-
-    c.setFont("Helvetica", 12)
-    c.drawString(40, y, f"NPS informado: {data.nps}")
-    y -= 30
-
-    # Avaliações
-    c.setFont("Helvetica-Bold", 12)
-    c.drawString(40, y, "Avaliações")
-    y -= 20
-
-    c.setFont("Helvetica", 10)
-    for k, v in data.avaliacoes.items():
-        c.drawString(40, y, f"{k}: {v}")
-        y -= 15
-        if y < 80:
-            c.showPage()
-            y = height - 50
-            c.setFont("Helvetica", 10)
-
-    # Feedback
-    y -= 20
-    c.setFont("Helvetica-Bold", 12)
-    c.drawString(40, y, "Feedback")
-    y -= 20
-
-    c.setFont("Helvetica", 10)
-    for titulo, texto in data.feedback.items():
-        c.drawString(40, y, f"{titulo}:")
-        y -= 14
-
-        for linha in texto.split("\n"):
-            c.drawString(50, y, linha[:110])
-            y -= 14
-            if y < 80:
-                c.showPage()
-                y = height - 50
-                c.setFont("Helvetica", 10)
-
-        y -= 10
-
-    c.showPage()
-    c.save()
 
-    # ===============================
-    # MERGE FINAL (3 PDFs)
-    # ===============================
-    final_pdf = os.path.join(final_dir, "entrega_final.pdf")
+jobs.registrar("nps", executar_job_nps)
+
 
-    merger = PdfMerger()
-    merger.append(termo_pdf)
-    merger.append(ressalvas_pdf)
-    merger.append(nps_pdf)
-    merger.write(final_pdf)
-    merger.close()
+# ===============================
+# ROTA
+# ===============================
+@router.post("/finalizar")
+async def finalizar_nps(data: NPSRequest, request: Request):
 
-    if not os.path.exists(final_pdf):
-        raise HTTPException(500, "Falha ao gerar PDF final")
+    processo_id = data.processo_id.strip()
+    if not processo_id:
+        raise HTTPException(status_code=400, detail="processo_id ausente")
 
-    # ===============================
-    # UPLOAD
-    # ===============================
-    remote_path = f"{processo_id}/entrega_final.pdf"
-    final_url = upload_pdf(final_pdf, remote_path)
+    if jobs.pedido_assincrono(request):
+        job_id = await jobs.enfileirar("nps", data.model_dump(mode="json"))
+        return jobs.resposta_aceita(job_id)
 
-    if not final_url:
-        raise HTTPException(500, "Falha no upload do PDF final")
+    return await processar_nps(data)
 
-    # ===============================
-    # UPDATE BANCO (100% COMPATÍVEL)
-    # ===============================
-    supabase.table("processos").update({
-        "status": "finalizado",
-        "pdf_final": final_url,
-        "finalizado_em": date.today().isoformat()
-    }).eq("processo_id", processo_id).execute()
 
-    return {
-        "status": "ok",
-        "pdf_final": final_url
-    }
+# ===============================
+# INDICADORES
+# ===============================
+@router.get("/indicadores")
+async def indicadores_nps(
+    granularidade: Literal["dia", "semana", "mes"] = "dia",
+    inicio: Optional[date] = None,
+    fim: Optional[date] = None,
+    dias: int = Query(90, ge=1, le=3660)
+):
+    """
+    NPS (promotores/neutros/detratores), média por critério de
+    `avaliacoes` e contagens por período. Sem datas: últimos `dias` dias.
+    Semanas e meses que tocam a faixa entram inteiros.
+
+    Os rollups ficam num SQLite local (INDICADORES_DB), compartilhado só
+    pelos processos da mesma máquina: os números só são completos com
+    a API em UMA máquina. Com várias, cada uma conta apenas as
+    finalizações que recebeu.
+    """
+    fim = fim or date.today()
+    inicio = inicio or fim - timedelta(days=dias - 1)
+    if inicio > fim:
+        raise HTTPException(status_code=400, detail="inicio depois de fim")
+
+    return await indicadores.consultar(granularidade, inicio, fim)
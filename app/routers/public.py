@@ -2,39 +2,47 @@ from fastapi import APIRouter, Request
 from fastapi.templating import Jinja2Templates
 from fastapi.responses import HTMLResponse
 
+from app.services import assets, paginas
+
 router = APIRouter()
 templates = Jinja2Templates(directory="app/templates")
+# {{ asset('arquivo.png') }} → URL com hash do build (ou /static/arquivo.png)
+templates.env.globals["asset"] = assets.url
+# HTML já renderizado e comprimido, revalidado por ETag
+cache_paginas = paginas.CachePaginas(
+    templates.env, "app/templates", paginas.PAGINAS_VERIFICAR_MTIME
+)
 
 @router.get("/", response_class=HTMLResponse)
-def index(request: Request):
-    return templates.TemplateResponse("Index.html", {"request": request})
+async def index(request: Request):
+    return paginas.responder(cache_paginas, request, "Index.html")
 
 @router.get("/termo", response_class=HTMLResponse)
-def termo(request: Request):
-    return templates.TemplateResponse("TermoAceite.html", {"request": request})
+async def termo(request: Request):
+    return paginas.responder(cache_paginas, request, "TermoAceite.html")
 
 
 @router.get("/ressalvas", response_class=HTMLResponse)
-def ressalvas(request: Request):
-    return templates.TemplateResponse("Ressalvas.html", {"request": request})
+async def ressalvas(request: Request):
+    return paginas.responder(cache_paginas, request, "Ressalvas.html")
 
 
 @router.get("/nps", response_class=HTMLResponse)
-def nps(request: Request):
-    return templates.TemplateResponse("NPS2System.html", {"request": request})
+async def nps(request: Request):
+    return paginas.responder(cache_paginas, request, "NPS2System.html")
 
 
 @router.get("/admin", response_class=HTMLResponse)
-def admin(request: Request):
-    return templates.TemplateResponse("admin.html", {"request": request})
+async def admin(request: Request):
+    return paginas.responder(cache_paginas, request, "admin.html")
 
 @router.get("/user", response_class=HTMLResponse)
-def user(request: Request):
-    return templates.TemplateResponse("User.html", {"request": request})
+async def user(request: Request):
+    return paginas.responder(cache_paginas, request, "User.html")
 
 @router.get("/nps-motor", response_class=HTMLResponse)
-def nps_motor(request: Request):
-    return templates.TemplateResponse("NPSMotor.html", {"request": request})
+async def nps_motor(request: Request):
+    return paginas.responder(cache_paginas, request, "NPSMotor.html")
 
 @router.get("/.well-known/appspecific/com.chrome.devtools.json")
 def chrome_devtools():
@@ -1,14 +1,48 @@
-from fastapi import APIRouter
+from typing import List
+
+from fastapi import APIRouter, HTTPException
 from app.schemas import RespostaCreate
-from app.services.supabase_client import supabase
+from app.services.ingestao import FilaCheia, respostas
 
 router = APIRouter(prefix="/api")
 
-@router.post("/respostas")
-def salvar_resposta(resposta: RespostaCreate):
-    supabase.table("respostas").insert({
+# Máximo de respostas por chamada do /respostas/batch
+RESPOSTAS_BATCH_MAX = 1000
+
+
+def _linha(resposta: RespostaCreate) -> dict:
+    return {
         "cliente_id": resposta.cliente_id,
         "pagina": resposta.pagina,
         "dados": resposta.dados
-    }).execute()
+    }
+
+
+def _enfileirar(linhas: List[dict]) -> None:
+    # Resposta sai ao entrar na fila; o INSERT é feito em lote depois
+    try:
+        respostas.adicionar(linhas)
+    except FilaCheia:
+        raise HTTPException(
+            status_code=503,
+            detail="Muitas respostas pendentes, tente novamente",
+            headers={"Retry-After": "1"}
+        )
+
+
+@router.post("/respostas")
+async def salvar_resposta(resposta: RespostaCreate):
+    _enfileirar([_linha(resposta)])
     return {"status": "ok"}
+
+
+@router.post("/respostas/batch")
+async def salvar_respostas(lote: List[RespostaCreate]):
+    if len(lote) > RESPOSTAS_BATCH_MAX:
+        raise HTTPException(
+            status_code=413,
+            detail=f"Máximo de {RESPOSTAS_BATCH_MAX} respostas por lote"
+        )
+
+    _enfileirar([_linha(resposta) for resposta in lote])
+    return {"status": "ok", "recebidas": len(lote)}
@@ -1,19 +1,37 @@
-from fastapi import APIRouter, HTTPException
+from fastapi import APIRouter, HTTPException, Request
+from fastapi.concurrency import run_in_threadpool
 from pydantic import BaseModel
-from typing import List, Optional
+from typing import Dict, List, Optional, Tuple
 from datetime import datetime, date
-import base64
+import asyncio
 import hashlib
+import json
+import os
+
+from app.services import (
+    artefatos, conteudo, database as db, idempotencia, jobs, layout, pdfs, processos,
+    render
+)
+from app.services.entrada import (
+    ArquivoEntrada,
+    ImagemDecodificada,
+    Partes,
+    ler_requisicao,
+    resolver_imagem,
+)
+from app.services.locks import LocksPorChave
+from app.services.upload import path_de_url, upload_bytes
 
-from reportlab.lib.pagesizes import A4
-from reportlab.pdfgen import canvas
-from reportlab.lib.utils import ImageReader
-from io import BytesIO
+router = APIRouter(prefix="/ressalvas", tags=["Ressalvas"])
 
-from app.services.supabase_client import supabase
-from app.services.upload import upload_pdf
+# Máximo de uploads simultâneos de fotos por requisição
+RESSALVAS_UPLOAD_CONCORRENCIA = int(os.getenv("RESSALVAS_UPLOAD_CONCORRENCIA", "4"))
 
-router = APIRouter(prefix="/ressalvas", tags=["Ressalvas"])
+# Páginas de itens acrescentados, no cache local de artefatos
+PREFIXO_PAGINAS = "render/ressalvas"
+
+# Um acréscimo por processo em andamento neste processo
+_locks_processo = LocksPorChave()
 
 # ============================================================
 # MODELS
@@ -24,42 +42,42 @@ class ImagemRessalva(BaseModel):
     descricao: str
     prazo: Optional[date] = None
     aprovacao: bool = False
-    imagem_base64: Optional[str] = None
+    imagem_base64: Optional[str] = None  # base64 ou nome da parte multipart
 
 
 class RessalvasRequest(BaseModel):
+    """
+    Aceito como JSON ou como multipart/form-data (campo "dados" com este
+    mesmo JSON e uma parte binária por imagem).
+    """
     processo_id: str  # CÓDIGO HUMANO (ex: EDIVALDO_819_2026-01-27_7N26)
     responsavel: str
     observacoes: Optional[str] = None
     imagens: List[ImagemRessalva]
+    # True: `imagens` traz só os itens NOVOS, acrescentados ao relatório
+    # já salvo (observacoes é ignorado)
+    acrescentar: bool = False
 
 
 class RessalvasResponse(BaseModel):
     success: bool
     pdf_url: Optional[str] = None
+    relatorio_pdf: Optional[dict] = None
+    imagens: List[dict] = []
+    imagens_falhas: List[dict] = []
 
 
 # ============================================================
 # UTILS
 # ============================================================
 
-def normalize_base64(encoded: str) -> str:
-    encoded = encoded.strip().replace("\n", "").replace(" ", "")
-    missing = len(encoded) % 4
-    if missing:
-        encoded += "=" * (4 - missing)
-    return encoded
-
-
-def decode_base64_image(base64_data: str) -> BytesIO:
+def carregar_imagem(valor: str, partes: Optional[Partes]) -> ImagemDecodificada:
+    """
+    Decodifica (base64) ou abre (multipart) a imagem UMA vez; o objeto
+    resultante carrega bytes, hash, dimensões e mime para o PDF e o banco.
+    """
     try:
-        if "," not in base64_data:
-            raise ValueError("Formato Base64 inválido")
-
-        _, encoded = base64_data.split(",", 1)
-        encoded = normalize_base64(encoded)
-
-        return BytesIO(base64.b64decode(encoded))
+        return resolver_imagem(valor, partes)
     except Exception as e:
         raise HTTPException(
             status_code=400,
@@ -67,200 +85,341 @@ def decode_base64_image(base64_data: str) -> BytesIO:
         )
 
 
-def gerar_hash_imagem(base64_data: str) -> str:
-    _, encoded = base64_data.split(",", 1)
-    encoded = normalize_base64(encoded)
-    raw = base64.b64decode(encoded)
-    return hashlib.sha256(raw).hexdigest()
-
-
 # ============================================================
-# PDF
+# PROCESSAMENTO
 # ============================================================
 
-def gerar_pdf_ressalvas(
-    processo_codigo: str,
-    responsavel: str,
-    observacoes: Optional[str],
-    imagens: List[ImagemRessalva]
-) -> BytesIO:
-    buffer = BytesIO()
-    c = canvas.Canvas(buffer, pagesize=A4)
-
-    largura, altura = A4
-    margem_x = 40
-    y = altura - 50
-
-    c.setFont("Helvetica-Bold", 14)
-    c.drawString(margem_x, y, "RELATÓRIO DE RESSALVAS")
-    y -= 30
-
-    c.setFont("Helvetica", 10)
-    c.drawString(margem_x, y, f"Processo: {processo_codigo}")
-    y -= 15
-    c.drawString(margem_x, y, f"Responsável: {responsavel}")
-    y -= 15
-    c.drawString(
-        margem_x,
-        y,
-        f"Data: {datetime.now().strftime('%d/%m/%Y %H:%M')}"
-    )
-    y -= 25
-
-    if observacoes:
-        c.setFont("Helvetica-Bold", 10)
-        c.drawString(margem_x, y, "Observações:")
-        y -= 15
-        c.setFont("Helvetica", 10)
-        c.drawString(margem_x, y, observacoes)
-        y -= 25
-
-    for idx, img in enumerate(imagens, start=1):
-        if y < 220:
-            c.showPage()
-            y = altura - 50
-
-        c.setFont("Helvetica-Bold", 11)
-        c.drawString(margem_x, y, f"Item {idx}: {img.item}")
-        y -= 15
-
-        c.setFont("Helvetica", 10)
-        c.drawString(margem_x, y, f"Descrição: {img.descricao}")
-        y -= 15
-
-        if img.prazo:
-            c.drawString(
-                margem_x,
-                y,
-                f"Prazo: {img.prazo.strftime('%d/%m/%Y')}"
-            )
-            y -= 15
+async def buscar_processo(codigo: str) -> dict:
+    # Cache em memória: normalmente preenchido pelo /termo/salvar
+    proc = await processos.buscar(codigo)
 
-        c.drawString(
-            margem_x,
-            y,
-            f"Aprovação: {'Sim' if img.aprovacao else 'Não'}"
+    if not proc:
+        raise HTTPException(
+            status_code=404,
+            detail=f"Processo não encontrado: {codigo}"
         )
-        y -= 15
 
-        if img.imagem_base64:
-            image_stream = decode_base64_image(img.imagem_base64)
-            image = ImageReader(image_stream)
-
-            c.drawImage(
-                image,
-                margem_x,
-                y - 150,
-                width=200,
-                height=150,
-                preserveAspectRatio=True,
-                mask="auto"
-            )
-            y -= 170
-        else:
-            y -= 20
+    return proc
 
-    c.showPage()
-    c.save()
-    buffer.seek(0)
-    return buffer
 
+async def buscar_processo_uuid(codigo: str) -> str:
+    return (await buscar_processo(codigo))["id"]
 
-# ============================================================
-# ROUTE
-# ============================================================
 
-@router.post("/salvar", response_model=RessalvasResponse)
-def salvar_ressalvas(data: RessalvasRequest):
+async def preparar_itens(
+    imagens: List[ImagemRessalva],
+    partes: Optional[Partes]
+) -> Tuple[List[Optional[ImagemDecodificada]], List[pdfs.ItemRessalvaPdf]]:
+    arquivos = await run_in_threadpool(
+        lambda: [
+            carregar_imagem(img.imagem_base64, partes) if img.imagem_base64 else None
+            for img in imagens
+        ]
+    )
+
+    # Spec serializável para o pool de render (bytes das fotos inclusos)
+    itens_pdf = await run_in_threadpool(
+        lambda: [
+            pdfs.ItemRessalvaPdf(
+                item=img.item,
+                descricao=img.descricao,
+                prazo=img.prazo,
+                aprovacao=img.aprovacao,
+                imagem=arquivo.ler() if arquivo is not None else None
+            )
+            for img, arquivo in zip(imagens, arquivos)
+        ]
+    )
+
+    return arquivos, itens_pdf
+
+
+async def enviar_pdf_e_fotos(
+    pdf: bytes,
+    processo_uuid: str,
+    imagens: List[ImagemRessalva],
+    arquivos: List[Optional[ImagemDecodificada]]
+) -> Tuple[str, List[dict], List[dict]]:
+    """
+    PDF com nome novo (objetos imutáveis) e fotos no armazenamento por
+    conteúdo: reenvios de imagens idênticas não geram novo upload.
+    """
+    folder = f"{processo_uuid}/ressalvas"
+    pdf_url, (imagens_salvas, imagens_falhas) = await asyncio.gather(
+        upload_bytes(pdf, folder, tipo="pdf"),
+        conteudo.armazenar_varios(
+            [
+                (img.item, arquivo, arquivo.sha256)
+                for img, arquivo in zip(imagens, arquivos)
+                if arquivo is not None
+            ],
+            RESSALVAS_UPLOAD_CONCORRENCIA
+        )
+    )
+
+    if not pdf_url:
+        raise HTTPException(
+            status_code=500,
+            detail="Falha no upload do PDF"
+        )
+
+    await artefatos.guardar(path_de_url(pdf_url), pdf)
+    return pdf_url, imagens_salvas, imagens_falhas
+
+
+async def registrar_itens(
+    processo_uuid: str,
+    imagens: List[ImagemRessalva],
+    arquivos: List[Optional[ImagemDecodificada]],
+    pdf_url: str
+) -> None:
+    itens = []
+
+    for img, arquivo in zip(imagens, arquivos):
+        itens.append({
+            "processo_id": processo_uuid,
+            "item": img.item,
+            "descricao": img.descricao,
+            "prazo": img.prazo.isoformat() if img.prazo else None,
+            "aprovacao": img.aprovacao,
+            # Hash calculado na própria decodificação
+            "imagem_hash": arquivo.sha256 if arquivo is not None else None,
+            "criado_em": datetime.utcnow().isoformat()
+        })
+
+    if itens:
+        await db.insert("ressalvas_itens", itens)
+
+    # Não altera criado_em
+    await processos.atualizar(processo_uuid, {
+        "status": "RESSALVAS_REGISTRADAS",
+        "pdf_ressalvas": pdf_url,
+        "atualizado_em": datetime.utcnow().isoformat()
+    })
+
+
+async def processar_ressalvas(
+    data: RessalvasRequest,
+    partes: Optional[Partes]
+) -> RessalvasResponse:
     try:
         # ----------------------------------------------------
         # 1. BUSCA PROCESSO PELO CÓDIGO (RETORNA UUID REAL)
         # ----------------------------------------------------
-        proc = (
-            supabase
-            .table("processos")
-            .select("id")
-            .eq("codigo", data.processo_id)
-            .single()
-            .execute()
-        )
-
-        if not proc.data:
-            raise HTTPException(
-                status_code=404,
-                detail=f"Processo não encontrado: {data.processo_id}"
-            )
+        proc = await buscar_processo(data.processo_id)
+        processo_uuid = proc["id"]
 
-        processo_uuid = proc.data["id"]
+        # Sem relatório anterior, "acrescentar" gera o relatório completo
+        if data.acrescentar:
+            documentos = await processos.documentos(processo_uuid)
+            if documentos.get("pdf_ressalvas"):
+                return await acrescentar_ressalvas(data, partes, proc)
 
         # ----------------------------------------------------
         # 2. GERA PDF
         # ----------------------------------------------------
-        pdf_buffer = gerar_pdf_ressalvas(
+        arquivos, itens_pdf = await preparar_itens(data.imagens, partes)
+
+        pdf, relatorio = await render.renderizar(
+            pdfs.ressalvas,
             processo_codigo=data.processo_id,
             responsavel=data.responsavel,
             observacoes=data.observacoes,
-            imagens=data.imagens
+            itens=itens_pdf
         )
+        relatorio.logar()
 
         # ----------------------------------------------------
-        # 3. PDF → BASE64
+        # 3. UPLOAD PDF + FOTOS (BUCKET: processos)
         # ----------------------------------------------------
-        pdf_base64 = (
-            "data:application/pdf;base64,"
-            + base64.b64encode(pdf_buffer.read()).decode()
+        pdf_url, imagens_salvas, imagens_falhas = await enviar_pdf_e_fotos(
+            pdf, processo_uuid, data.imagens, arquivos
         )
 
         # ----------------------------------------------------
-        # 4. UPLOAD (BUCKET: processos)
-        # ----------------------------------------------------
-        folder = f"{processo_uuid}/ressalvas"
-        pdf_url = upload_pdf(pdf_base64, folder)
-
-        if not pdf_url:
-            raise HTTPException(
-                status_code=500,
-                detail="Falha no upload do PDF"
-            )
-
-        # ----------------------------------------------------
-        # 5. INSERE ITENS DE RESSALVAS
-        # ----------------------------------------------------
-        itens = []
-
-        for img in data.imagens:
-            itens.append({
-                "processo_id": processo_uuid,
-                "item": img.item,
-                "descricao": img.descricao,
-                "prazo": img.prazo.isoformat() if img.prazo else None,
-                "aprovacao": img.aprovacao,
-                "imagem_hash": (
-                    gerar_hash_imagem(img.imagem_base64)
-                    if img.imagem_base64 else None
-                ),
-                "criado_em": datetime.utcnow().isoformat()
-            })
-
-        if itens:
-            supabase.table("ressalvas_itens").insert(itens).execute()
-
-        # ----------------------------------------------------
-        # 6. ATUALIZA PROCESSO (NÃO ALTERA criado_em)
+        # 4. INSERE ITENS E ATUALIZA PROCESSO
         # ----------------------------------------------------
-        supabase.table("processos").update({
-            "status": "RESSALVAS_REGISTRADAS",
-            "pdf_ressalvas": pdf_url,
-            "atualizado_em": datetime.utcnow().isoformat()
-        }).eq("id", processo_uuid).execute()
-
-        return RessalvasResponse(success=True, pdf_url=pdf_url)
+        await registrar_itens(processo_uuid, data.imagens, arquivos, pdf_url)
+
+        return RessalvasResponse(
+            success=True,
+            pdf_url=pdf_url,
+            relatorio_pdf=relatorio.as_dict(),
+            imagens=imagens_salvas,
+            imagens_falhas=imagens_falhas
+        )
 
     except HTTPException:
         raise
 
+    except render.RenderTimeout as e:
+        raise HTTPException(status_code=504, detail=str(e))
+
     except Exception as e:
         raise HTTPException(
             status_code=500,
             detail=f"Erro interno ao salvar ressalvas: {str(e)}"
         )
+
+
+# ============================================================
+# MODO INCREMENTAL (ACRESCENTAR)
+# ============================================================
+
+def chave_paginas(
+    processo_codigo: str,
+    responsavel: str,
+    inicio: int,
+    imagens: List[ImagemRessalva],
+    arquivos: List[Optional[ImagemDecodificada]]
+) -> str:
+    """
+    Path (no cache de artefatos) das páginas renderizadas para estes
+    itens: muda com o conteúdo, a posição, as fotos e a diagramação.
+    """
+    spec = [layout.VERSAO, processo_codigo, responsavel, inicio] + [
+        [
+            img.item,
+            img.descricao,
+            img.prazo.isoformat() if img.prazo else None,
+            img.aprovacao,
+            arquivo.sha256 if arquivo is not None else None,
+        ]
+        for img, arquivo in zip(imagens, arquivos)
+    ]
+    resumo = hashlib.sha256(json.dumps(spec).encode("utf-8")).hexdigest()
+    return f"{PREFIXO_PAGINAS}/{resumo}.pdf"
+
+
+async def acrescentar_ressalvas(
+    data: RessalvasRequest,
+    partes: Optional[Partes],
+    proc: dict
+) -> RessalvasResponse:
+    """
+    Renderiza só os itens novos como páginas extras, mescla ao PDF já
+    salvo e insere só as linhas novas. O trabalho é proporcional ao delta.
+    """
+    processo_uuid = proc["id"]
+
+    # Dois acréscimos ao mesmo processo partiriam do mesmo PDF base
+    async with _locks_processo.travar(processo_uuid):
+        # O PDF pode ter mudado enquanto esperávamos o lock (ou em outro
+        # processo): lido do banco, nunca do cache
+        documentos, existentes, (arquivos, itens_pdf) = await asyncio.gather(
+            processos.documentos(processo_uuid),
+            db.contar("ressalvas_itens", {"processo_id": db.eq(processo_uuid)}),
+            preparar_itens(data.imagens, partes)
+        )
+        inicio = existentes + 1
+
+        # ------------------------------------------------
+        # 1. PÁGINAS DOS ITENS NOVOS (CACHE)
+        # ------------------------------------------------
+        chave = chave_paginas(
+            data.processo_id, data.responsavel, inicio, data.imagens, arquivos
+        )
+        relatorio = None
+        paginas = await run_in_threadpool(artefatos.cache.obter, chave)
+
+        if paginas is None:
+            paginas, relatorio = await render.renderizar(
+                pdfs.ressalvas_continuacao,
+                processo_codigo=data.processo_id,
+                responsavel=data.responsavel,
+                itens=itens_pdf,
+                inicio=inicio
+            )
+            relatorio.logar()
+            await artefatos.guardar(chave, paginas)
+
+        # ------------------------------------------------
+        # 2. MESCLA AO PDF EXISTENTE
+        # ------------------------------------------------
+        atual = await artefatos.baixar(path_de_url(documentos["pdf_ressalvas"]))
+        pdf = await render.renderizar(pdfs.mesclar, [atual, paginas])
+
+        # ------------------------------------------------
+        # 3. UPLOAD + ITENS NOVOS
+        # ------------------------------------------------
+        pdf_url, imagens_salvas, imagens_falhas = await enviar_pdf_e_fotos(
+            pdf, processo_uuid, data.imagens, arquivos
+        )
+        await registrar_itens(processo_uuid, data.imagens, arquivos, pdf_url)
+
+    return RessalvasResponse(
+        success=True,
+        pdf_url=pdf_url,
+        relatorio_pdf=relatorio.as_dict() if relatorio is not None else None,
+        imagens=imagens_salvas,
+        imagens_falhas=imagens_falhas
+    )
+
+
+# ============================================================
+# MODO ASSÍNCRONO (JOB)
+# ============================================================
+
+def preparar_job(
+    data: RessalvasRequest,
+    partes: Optional[Partes]
+) -> Tuple[dict, Dict[str, ArquivoEntrada]]:
+    """
+    Decodifica/valida as imagens e as troca por arquivos nomeados
+    que são salvos junto com o job.
+    """
+    payload = data.model_dump(mode="json")
+    arquivos: Dict[str, ArquivoEntrada] = {}
+
+    for idx, (img, item) in enumerate(zip(data.imagens, payload["imagens"])):
+        if img.imagem_base64:
+            nome = f"imagem_{idx}"
+            arquivos[nome] = carregar_imagem(img.imagem_base64, partes)
+            item["imagem_base64"] = nome
+
+    return payload, arquivos
+
+
+async def executar_job_ressalvas(
+    payload: dict,
+    arquivos: Dict[str, ArquivoEntrada]
+) -> dict:
+    resposta = await processar_ressalvas(
+        RessalvasRequest.model_validate(payload),
+        arquivos
+    )
+    return resposta.model_dump()
+
+
+jobs.registrar("ressalvas", executar_job_ressalvas)
+
+
+# ============================================================
+# ROUTE
+# ============================================================
+
+@router.post("/salvar", response_model=RessalvasResponse)
+async def salvar_ressalvas(request: Request):
+    # Repetições com a mesma Idempotency-Key não renderizam nem enviam de novo
+    return await idempotencia.executar(
+        request, "ressalvas", _salvar_ressalvas
+    )
+
+
+async def _salvar_ressalvas(request: Request):
+    data, form = await ler_requisicao(
+        request, RessalvasRequest, campos_binarios=("imagem_base64",)
+    )
+
+    try:
+        if jobs.pedido_assincrono(request):
+            await buscar_processo_uuid(data.processo_id)
+            payload, arquivos = await run_in_threadpool(preparar_job, data, form)
+            job_id = await jobs.enfileirar("ressalvas", payload, arquivos)
+            return jobs.resposta_aceita(job_id)
+
+        return await processar_ressalvas(data, form)
+
+    finally:
+        if form is not None:
+            await form.close()
@@ -1,118 +1,188 @@
-from fastapi import APIRouter, HTTPException
+from fastapi import APIRouter, HTTPException, Request
+from fastapi.concurrency import run_in_threadpool
 from pydantic import BaseModel
-import base64
+import asyncio
 import os
 import re
 import random
 import string
 import uuid
 from datetime import datetime
-from io import BytesIO
+from typing import Dict, List, Optional, Tuple
 
-from reportlab.pdfgen import canvas
-from reportlab.lib.utils import ImageReader
-from reportlab.lib.pagesizes import A4
-from reportlab.lib.colors import HexColor
-
-from app.services.upload import upload_pdf
-from app.services.supabase_client import supabase
+from app.services import (
+    artefatos, conteudo, database as db, idempotencia, jobs, pdfs, processos, render
+)
+from app.services.entrada import (
+    ArquivoEntrada,
+    Partes,
+    ler_requisicao,
+    resolver_arquivo,
+    resolver_imagem,
+)
+from app.services.upload import path_de_url, upload_bytes
 
 router = APIRouter(prefix="/termo", tags=["Termo"])
 
+# Máximo de uploads simultâneos de imagens adicionais por termo
+TERMO_UPLOAD_CONCORRENCIA = int(os.getenv("TERMO_UPLOAD_CONCORRENCIA", "4"))
+
 
 # ============================================================
 # MODEL
 # ============================================================
 
 class TermoRequest(BaseModel):
+    """
+    Aceito como JSON ou como multipart/form-data (campo "dados" com este
+    mesmo JSON). No multipart, os campos de imagem trazem o nome da parte
+    binária em vez do base64.
+    """
     cpf: str
     nome_cliente: str
     status_entrega: str
-    imagem: str  # base64 (data:image/...)
+    imagem: str  # base64 (data:image/...) ou nome da parte multipart
     imagens: list = []  # list of dicts with item and imagem_base64
 
 
 # ============================================================
-# ROTA
+# IMAGENS ADICIONAIS
 # ============================================================
 
-@router.post("/salvar")
-def salvar_termo(data: TermoRequest):
+async def upload_imagens_adicionais(
+    imagens: list,
+    partes: Optional[Partes]
+) -> Tuple[List[dict], List[dict]]:
+    """
+    Grava as imagens no armazenamento por conteúdo (dedup por SHA-256),
+    em paralelo, até TERMO_UPLOAD_CONCORRENCIA por vez.
+    Retorna (enviadas, falhas); falha de um item não derruba os demais.
+    """
+    itens, falhas = [], []
+
+    for img_data in imagens:
+        item = img_data.get("item") if isinstance(img_data, dict) else None
+        try:
+            arquivo = resolver_imagem(img_data["imagem_base64"], partes)
+        except Exception as e:
+            falhas.append({"item": item, "erro": str(e)})
+            continue
+        itens.append((item, arquivo, None))
+
+    enviadas, falhas_upload = await conteudo.armazenar_varios(
+        itens,
+        TERMO_UPLOAD_CONCORRENCIA
+    )
+
+    return enviadas, falhas + falhas_upload
+
+
+# ============================================================
+# PROCESSAMENTO
+# ============================================================
+
+def validar_termo(data: TermoRequest, partes: Optional[Partes]) -> str:
+    """
+    Validações baratas, feitas antes de aceitar um job. Retorna o CPF limpo.
+    """
+    cpf_limpo = re.sub(r"\D", "", data.cpf)
+    if not re.fullmatch(r"\d{11}", cpf_limpo):
+        raise HTTPException(status_code=400, detail="CPF inválido")
+
+    if not data.nome_cliente.strip():
+        raise HTTPException(status_code=400, detail="Nome do cliente obrigatório")
+
+    if partes is None and "," not in data.imagem:
+        raise HTTPException(status_code=400, detail="Imagem Base64 inválida")
+
+    if data.status_entrega not in ("concluido", "concluido_com_ressalva"):
+        raise HTTPException(status_code=400, detail="Status de entrega inválido")
+
+    return cpf_limpo
+
+
+def gerar_identificadores(data: TermoRequest, cpf_limpo: str) -> Tuple[str, str]:
+    """
+    Código humano + UUID real de um processo novo.
+    """
+    primeiro_nome = re.sub(r"[^A-Z]", "", data.nome_cliente.split()[0].upper())
+    ultimos_cpf = cpf_limpo[-3:]
+    data_hoje = datetime.now().strftime("%Y-%m-%d")
+    sufixo = "".join(random.choices(string.ascii_uppercase + string.digits, k=4))
+
+    codigo_processo = f"{primeiro_nome}_{ultimos_cpf}_{data_hoje}_{sufixo}"
+    processo_uuid = str(uuid.uuid4())  # ✅ UUID REAL (IMPORTANTE)
+    return codigo_processo, processo_uuid
+
+
+async def processar_termo(
+    data: TermoRequest,
+    partes: Optional[Partes],
+    identificadores: Optional[Tuple[str, str]] = None
+) -> dict:
+    """
+    `identificadores` (código, UUID) vêm fixados no payload dos jobs: um
+    job recuperado após queda reusa os mesmos e não duplica o processo.
+    """
     try:
         # ====================================================
         # 1. VALIDAÇÕES
         # ====================================================
-        cpf_limpo = re.sub(r"\D", "", data.cpf)
-        if not re.fullmatch(r"\d{11}", cpf_limpo):
-            raise HTTPException(status_code=400, detail="CPF inválido")
-
-        if not data.nome_cliente.strip():
-            raise HTTPException(status_code=400, detail="Nome do cliente obrigatório")
-
-        if "," not in data.imagem:
-            raise HTTPException(status_code=400, detail="Imagem Base64 inválida")
-
-        if data.status_entrega not in ("concluido", "concluido_com_ressalva"):
-            raise HTTPException(status_code=400, detail="Status de entrega inválido")
+        cpf_limpo = validar_termo(data, partes)
 
         # ====================================================
         # 2. GERA CÓDIGO HUMANO + UUID REAL
         # ====================================================
-        primeiro_nome = re.sub(r"[^A-Z]", "", data.nome_cliente.split()[0].upper())
-        ultimos_cpf = cpf_limpo[-3:]
-        data_hoje = datetime.now().strftime("%Y-%m-%d")
-        sufixo = "".join(random.choices(string.ascii_uppercase + string.digits, k=4))
+        if identificadores is None:
+            codigo_processo, processo_uuid = gerar_identificadores(data, cpf_limpo)
+        else:
+            codigo_processo, processo_uuid = identificadores
 
-        codigo_processo = f"{primeiro_nome}_{ultimos_cpf}_{data_hoje}_{sufixo}"
-        processo_uuid = str(uuid.uuid4())  # ✅ UUID REAL (IMPORTANTE)
+            # Execução anterior do mesmo job chegou a inserir o processo
+            if await processos.buscar(codigo_processo) is not None:
+                return {
+                    "success": True,
+                    "processo_id": codigo_processo,
+                    "imagens_falhas": [],
+                    "relatorio_pdf": None
+                }
 
         # ====================================================
-        # 3. DECODE DA IMAGEM
+        # 3. DECODE DA IMAGEM (BASE64 OU PARTE MULTIPART)
         # ====================================================
         try:
-            _, img_b64 = data.imagem.split(",", 1)
-            img_bytes = base64.b64decode(img_b64)
+            imagem = resolver_arquivo(data.imagem, partes)
         except Exception:
             raise HTTPException(status_code=400, detail="Falha ao decodificar imagem")
 
         # ====================================================
-        # 4. GERA PDF EM MEMÓRIA
+        # 4. UPLOAD IMAGENS ADICIONAIS (EM PARALELO, SE HOUVER)
         # ====================================================
-        buffer = BytesIO()
-        c = canvas.Canvas(buffer, pagesize=A4)
-        width, height = A4
-
-        # Fundo roxo
-        c.setFillColor(HexColor("#5b2fa6"))
-        c.rect(0, 0, width, height, stroke=0, fill=1)
-
-        # Imagem capturada
-        c.drawImage(
-            ImageReader(BytesIO(img_bytes)),
-            0,
-            0,
-            width=width,
-            height=height,
-            mask="auto"
+        # Disparado antes do PDF: os uploads correm enquanto o termo
+        # é renderizado e enviado.
+        imagens_task = asyncio.create_task(
+            upload_imagens_adicionais(data.imagens, partes)
         )
 
-        c.showPage()
-        c.save()
-        buffer.seek(0)
+        try:
+            # ================================================
+            # 5. GERA PDF EM MEMÓRIA
+            # ================================================
+            # Renderização é CPU-bound: roda no pool de processos
+            imagem_bytes = await run_in_threadpool(imagem.ler)
+            pdf, relatorio = await render.renderizar(pdfs.termo, imagem_bytes)
+            relatorio.logar()
 
-        # ====================================================
-        # 5. PDF → BASE64
-        # ====================================================
-        pdf_base64 = (
-            "data:application/pdf;base64,"
-            + base64.b64encode(buffer.read()).decode()
-        )
+            # ================================================
+            # 6. UPLOAD (BUCKET: processos)
+            # ================================================
+            folder = f"{processo_uuid}/termo"
+            termo_url = await upload_bytes(pdf, folder, tipo="pdf")
+            # Cópia local: a finalização lê daqui sem ir ao storage
+            await artefatos.guardar(path_de_url(termo_url), pdf)
 
-        # ====================================================
-        # 6. UPLOAD (BUCKET: processos)
-        # ====================================================
-        folder = f"{processo_uuid}/termo"
-        termo_url = upload_pdf(pdf_base64, folder)
+        finally:
+            imagens_urls, imagens_falhas = await imagens_task
 
         if not termo_url:
             raise HTTPException(
@@ -121,33 +191,9 @@ def salvar_termo(data: TermoRequest):
             )
 
         # ====================================================
-        # 7. UPLOAD IMAGENS ADICIONAIS (SE HOUVER)
+        # 7. INSERE PROCESSO NO BANCO
         # ====================================================
-        imagens_urls = []
-        if data.imagens:
-            for img_data in data.imagens:
-                try:
-                    _, img_b64 = img_data["imagem_base64"].split(",", 1)
-                    img_bytes = base64.b64decode(img_b64)
-                    img_buffer = BytesIO(img_bytes)
-                    img_base64 = (
-                        "data:image/png;base64,"
-                        + base64.b64encode(img_buffer.read()).decode()
-                    )
-                    img_folder = f"{processo_uuid}/termo/imagens"
-                    img_url = upload_pdf(img_base64, img_folder)  # reuse upload_pdf for images
-                    if img_url:
-                        imagens_urls.append({
-                            "item": img_data["item"],
-                            "url": img_url
-                        })
-                except Exception as e:
-                    print(f"Erro ao processar imagem {img_data['item']}: {e}")
-
-        # ====================================================
-        # 8. INSERE PROCESSO NO BANCO
-        # ====================================================
-        res = supabase.table("processos").insert({
+        criados = await db.insert("processos", {
             "processo_id": processo_uuid,     # ✅ UUID REAL
             "codigo": codigo_processo,        # ✅ CÓDIGO HUMANO
             "nome_cliente": data.nome_cliente,
@@ -155,29 +201,126 @@ def salvar_termo(data: TermoRequest):
             "status": "TERMO_GERADO",
             "status_entrega": data.status_entrega,
             "termo_pdf": termo_url,
-            "imagens_termo": imagens_urls if imagens_urls else None,
+            "imagens_termo": [
+                {"item": img["item"], "url": img["url"], "hash": img["hash"]}
+                for img in imagens_urls
+            ] or None,
             "criado_em": datetime.utcnow().isoformat()
-        }).execute()
+        }, retornar=True)
 
-        if hasattr(res, "error") and res.error:
-            raise HTTPException(
-                status_code=500,
-                detail=f"Erro Supabase: {res.error.message}"
-            )
+        # Ressalvas/NPS deste processo resolvem o código sem ir ao banco
+        if criados:
+            processos.lembrar(criados[0])
 
         # ====================================================
         # 8. RESPOSTA
         # ====================================================
         return {
             "success": True,
-            "processo_id": codigo_processo
+            "processo_id": codigo_processo,
+            "imagens_falhas": imagens_falhas,
+            "relatorio_pdf": relatorio.as_dict()
         }
 
     except HTTPException:
         raise
 
+    except render.RenderTimeout as e:
+        raise HTTPException(status_code=504, detail=str(e))
+
+    except db.SupabaseError as e:
+        raise HTTPException(
+            status_code=500,
+            detail=f"Erro Supabase: {str(e)}"
+        )
+
     except Exception as e:
         raise HTTPException(
             status_code=500,
             detail=f"Erro interno: {str(e)}"
         )
+
+
+# ============================================================
+# MODO ASSÍNCRONO (JOB)
+# ============================================================
+
+def preparar_job(
+    data: TermoRequest,
+    partes: Optional[Partes]
+) -> Tuple[dict, Dict[str, ArquivoEntrada]]:
+    """
+    Troca cada imagem (base64 ou parte multipart) por um arquivo nomeado
+    que é salvo junto com o job. Código e UUID do processo já ficam
+    fixados no payload.
+    """
+    payload = data.model_dump()
+    payload["codigo"], payload["processo_uuid"] = gerar_identificadores(
+        data, re.sub(r"\D", "", data.cpf)
+    )
+    arquivos: Dict[str, ArquivoEntrada] = {}
+
+    try:
+        arquivos["imagem"] = resolver_arquivo(data.imagem, partes)
+    except Exception:
+        raise HTTPException(status_code=400, detail="Falha ao decodificar imagem")
+    payload["imagem"] = "imagem"
+
+    for idx, img_data in enumerate(payload["imagens"]):
+        try:
+            nome = f"imagem_{idx}"
+            arquivos[nome] = resolver_arquivo(img_data["imagem_base64"], partes)
+            img_data["imagem_base64"] = nome
+        except Exception:
+            # Mantém o valor original: a falha é reportada por item no job
+            continue
+
+    return payload, arquivos
+
+
+async def executar_job_termo(
+    payload: dict,
+    arquivos: Dict[str, ArquivoEntrada]
+) -> dict:
+    # Jobs enfileirados antes dos identificadores fixos geram os seus
+    identificadores = None
+    if payload.get("codigo") and payload.get("processo_uuid"):
+        identificadores = (payload.pop("codigo"), payload.pop("processo_uuid"))
+
+    return await processar_termo(
+        TermoRequest.model_validate(payload), arquivos, identificadores
+    )
+
+
+jobs.registrar("termo", executar_job_termo)
+
+
+# ============================================================
+# ROTA
+# ============================================================
+
+@router.post("/salvar")
+async def salvar_termo(request: Request):
+    # Repetições com a mesma Idempotency-Key não renderizam nem enviam de novo
+    return await idempotencia.executar(
+        request, "termo", _salvar_termo
+    )
+
+
+async def _salvar_termo(request: Request):
+    data, form = await ler_requisicao(
+        request, TermoRequest, campos_binarios=("imagem", "imagem_base64")
+    )
+
+    try:
+        if jobs.pedido_assincrono(request):
+            validar_termo(data, form)
+            payload, arquivos = await run_in_threadpool(preparar_job, data, form)
+            job_id = await jobs.enfileirar("termo", payload, arquivos)
+            return jobs.resposta_aceita(job_id)
+
+        return await processar_termo(data, form)
+
+    finally:
+        if form is not None:
+            await form.close()
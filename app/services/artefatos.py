@@ -0,0 +1,239 @@
+import hashlib
+import logging
+import os
+import sqlite3
+import threading
+import time
+import uuid
+from typing import Dict, Optional
+
+from fastapi.concurrency import run_in_threadpool
+
+from app.services.locks import LocksPorChave
+from app.services.upload import baixar as baixar_storage
+
+logger = logging.getLogger(__name__)
+
+ARTEFATOS_DIR = os.getenv("ARTEFATOS_DIR", os.path.join("data", "artefatos"))
+ARTEFATOS_MAX_BYTES = int(os.getenv("ARTEFATOS_MAX_BYTES", str(512 * 1024 * 1024)))
+# Objetos regravados no mesmo path (upsert) por outra instância ficam
+# desatualizados aqui por no máximo este tempo
+ARTEFATOS_TTL = int(os.getenv("ARTEFATOS_TTL", str(24 * 3600)))
+
+
+# ============================================================
+# CACHE LRU EM DISCO
+# ============================================================
+
+class CacheArtefatos:
+    """
+    Cópias locais de objetos do bucket, por path.
+
+    - Conteúdo gravado por SHA-256 (<pasta>/<aa>/<sha256>): paths com o
+      mesmo conteúdo dividem o arquivo
+    - Escrita atômica (arquivo temporário + os.replace)
+    - Limite de bytes com descarte do menos usado recentemente (LRU) e TTL
+    """
+
+    def __init__(self, pasta: str, max_bytes: int, ttl: int):
+        self.pasta = pasta
+        self.max_bytes = max_bytes
+        self.ttl = ttl
+        self._lock = threading.Lock()
+        self._conn: Optional[sqlite3.Connection] = None
+        self.hits = 0
+        self.misses = 0
+        self.descartes = 0
+
+    def _conexao(self) -> sqlite3.Connection:
+        if self._conn is None:
+            os.makedirs(self.pasta, exist_ok=True)
+            self._conn = sqlite3.connect(
+                os.path.join(self.pasta, "indice.sqlite3"),
+                check_same_thread=False,
+                timeout=30,
+                isolation_level=None
+            )
+            self._conn.execute("PRAGMA journal_mode=WAL")
+            self._conn.execute(
+                "CREATE TABLE IF NOT EXISTS artefatos ("
+                " path TEXT PRIMARY KEY,"
+                " sha256 TEXT NOT NULL,"
+                " tamanho INTEGER NOT NULL,"
+                " criado_em REAL NOT NULL,"
+                " acessado_em REAL NOT NULL)"
+            )
+            self._conn.execute(
+                "CREATE INDEX IF NOT EXISTS artefatos_lru ON artefatos (acessado_em)"
+            )
+        return self._conn
+
+    def _arquivo(self, sha256: str) -> str:
+        return os.path.join(self.pasta, sha256[:2], sha256)
+
+    def _remover(self, conn: sqlite3.Connection, path: str, sha256: str) -> None:
+        conn.execute("DELETE FROM artefatos WHERE path = ?", (path,))
+        # Só apaga o arquivo se nenhum outro path aponta para o mesmo conteúdo
+        if conn.execute(
+            "SELECT 1 FROM artefatos WHERE sha256 = ? LIMIT 1", (sha256,)
+        ).fetchone() is None:
+            try:
+                os.remove(self._arquivo(sha256))
+            except FileNotFoundError:
+                pass
+
+    # ---------------------------------
+    # Leitura
+    # ---------------------------------
+    def obter(self, path: str, contar: bool = True) -> Optional[bytes]:
+        agora = time.time()
+
+        with self._lock:
+            conn = self._conexao()
+            row = conn.execute(
+                "SELECT sha256, criado_em FROM artefatos WHERE path = ?", (path,)
+            ).fetchone()
+
+            if row is None:
+                self.misses += contar
+                return None
+
+            sha256, criado_em = row
+            if criado_em + self.ttl < agora:
+                self._remover(conn, path, sha256)
+                self.misses += contar
+                return None
+
+            conn.execute(
+                "UPDATE artefatos SET acessado_em = ? WHERE path = ?", (agora, path)
+            )
+
+        try:
+            with open(self._arquivo(sha256), "rb") as f:
+                dados = f.read()
+        except FileNotFoundError:
+            # Descartado por outro processo entre a consulta e a leitura
+            with self._lock:
+                self._conexao().execute("DELETE FROM artefatos WHERE path = ?", (path,))
+                self.misses += contar
+            return None
+
+        with self._lock:
+            self.hits += 1
+        return dados
+
+    # ---------------------------------
+    # Escrita
+    # ---------------------------------
+    def gravar(self, path: str, dados: bytes) -> str:
+        sha256 = hashlib.sha256(dados).hexdigest()
+
+        if len(dados) > self.max_bytes:
+            return sha256
+
+        destino = self._arquivo(sha256)
+        if not os.path.exists(destino):
+            os.makedirs(os.path.dirname(destino), exist_ok=True)
+            temporario = f"{destino}.{uuid.uuid4().hex}.tmp"
+            with open(temporario, "wb") as f:
+                f.write(dados)
+            os.replace(temporario, destino)
+
+        agora = time.time()
+        with self._lock:
+            conn = self._conexao()
+            anterior = conn.execute(
+                "SELECT sha256 FROM artefatos WHERE path = ?", (path,)
+            ).fetchone()
+            if anterior is not None and anterior[0] != sha256:
+                self._remover(conn, path, anterior[0])
+
+            conn.execute(
+                "INSERT OR REPLACE INTO artefatos"
+                " (path, sha256, tamanho, criado_em, acessado_em)"
+                " VALUES (?, ?, ?, ?, ?)",
+                (path, sha256, len(dados), agora, agora)
+            )
+            self._descartar(conn)
+
+        return sha256
+
+    def _descartar(self, conn: sqlite3.Connection) -> None:
+        total = conn.execute(
+            "SELECT COALESCE(SUM(tamanho), 0) FROM artefatos"
+        ).fetchone()[0]
+
+        if total <= self.max_bytes:
+            return
+
+        for path, sha256, tamanho in conn.execute(
+            "SELECT path, sha256, tamanho FROM artefatos ORDER BY acessado_em"
+        ).fetchall():
+            self._remover(conn, path, sha256)
+            self.descartes += 1
+            total -= tamanho
+            if total <= self.max_bytes:
+                break
+
+    def invalidar(self, path: str) -> None:
+        with self._lock:
+            conn = self._conexao()
+            row = conn.execute(
+                "SELECT sha256 FROM artefatos WHERE path = ?", (path,)
+            ).fetchone()
+            if row is not None:
+                self._remover(conn, path, row[0])
+
+    def estatisticas(self) -> Dict[str, int]:
+        with self._lock:
+            entradas, total = self._conexao().execute(
+                "SELECT COUNT(*), COALESCE(SUM(tamanho), 0) FROM artefatos"
+            ).fetchone()
+            return {
+                "hits": self.hits,
+                "misses": self.misses,
+                "descartes": self.descartes,
+                "entradas": entradas,
+                "bytes": total,
+                "max_bytes": self.max_bytes,
+            }
+
+
+cache = CacheArtefatos(ARTEFATOS_DIR, ARTEFATOS_MAX_BYTES, ARTEFATOS_TTL)
+
+# Um download por path em andamento neste processo
+_locks = LocksPorChave()
+
+
+# ============================================================
+# API
+# ============================================================
+
+async def baixar(path: str) -> bytes:
+    """
+    Lê o objeto do cache local; na falta, baixa do storage e guarda.
+    """
+    dados = await run_in_threadpool(cache.obter, path)
+    if dados is not None:
+        return dados
+
+    async with _locks.travar(path):
+        # Outro download do mesmo path pode ter terminado enquanto esperávamos
+        dados = await run_in_threadpool(cache.obter, path, False)
+        if dados is not None:
+            return dados
+
+        dados = await baixar_storage(path)
+        await guardar(path, dados)
+        return dados
+
+
+async def guardar(path: str, dados: bytes) -> None:
+    """
+    Write-through: quem acabou de enviar um objeto já guarda a cópia local.
+    Falha no cache nunca derruba a requisição.
+    """
+    try:
+        await run_in_threadpool(cache.gravar, path, dados)
+    except OSError:
+        logger.exception("Falha ao gravar artefato %s no cache", path)
@@ -0,0 +1,145 @@
+import hashlib
+import json
+import logging
+import os
+from typing import Dict, Optional
+
+from fastapi.concurrency import run_in_threadpool
+
+logger = logging.getLogger(__name__)
+
+STATIC_DIR = os.getenv("STATIC_DIR", os.path.join("app", "static"))
+ASSETS_DIR = os.getenv("ASSETS_DIR", os.path.join(STATIC_DIR, "dist"))
+# Gera os assets no startup se as fontes mudaram desde o último build
+ASSETS_AUTO_BUILD = os.getenv("ASSETS_AUTO_BUILD", "1") == "1"
+
+MANIFESTO = "manifest.json"
+PREFIXO_URL = "/assets"
+CACHE_IMUTAVEL = "public, max-age=31536000, immutable"
+
+_manifesto: dict = {}
+_versao = ""
+
+
+# ============================================================
+# FONTES / MANIFESTO
+# ============================================================
+
+def hash_fontes() -> Dict[str, str]:
+    """
+    nome → SHA-256 de cada arquivo de app/static (sem a pasta de build).
+    """
+    fontes = {}
+    for nome in os.listdir(STATIC_DIR):
+        caminho = os.path.join(STATIC_DIR, nome)
+        if not os.path.isfile(caminho):
+            continue
+        with open(caminho, "rb") as f:
+            fontes[nome] = hashlib.sha256(f.read()).hexdigest()
+    return fontes
+
+
+def _ler_manifesto() -> dict:
+    try:
+        with open(os.path.join(ASSETS_DIR, MANIFESTO), "r", encoding="utf-8") as f:
+            return json.load(f)
+    except FileNotFoundError:
+        return {}
+
+
+def _preparar() -> dict:
+    if ASSETS_AUTO_BUILD:
+        from app.build_assets import construir
+        try:
+            construir()
+        except Exception:
+            logger.exception("Build de assets falhou; servindo /static original")
+    return _ler_manifesto()
+
+
+async def iniciar() -> None:
+    global _manifesto, _versao
+    _manifesto = await run_in_threadpool(_preparar)
+    _versao = hashlib.sha256(
+        json.dumps(_manifesto.get("assets", {}), sort_keys=True).encode()
+    ).hexdigest()[:16]
+
+
+def versao() -> str:
+    """
+    Muda quando o manifest muda: entra na chave do cache de páginas.
+    """
+    return _versao
+
+
+# ============================================================
+# TEMPLATES
+# ============================================================
+
+def url(nome: str) -> str:
+    """
+    Global `asset()` dos templates: URL com hash quando há build,
+    senão o arquivo original em /static.
+    """
+    arquivo = _manifesto.get("assets", {}).get(nome)
+    if arquivo is None:
+        return f"/static/{nome}"
+    return f"{PREFIXO_URL}/{arquivo}"
+
+
+# ============================================================
+# SERVIDOR
+# ============================================================
+
+def aceita(cabecalho: str, valor: str) -> bool:
+    """
+    `valor` aparece no Accept/Accept-Encoding sem q=0.
+    """
+    for parte in cabecalho.lower().split(","):
+        token, *parametros = [p.strip() for p in parte.split(";")]
+        if token != valor:
+            continue
+        for parametro in parametros:
+            if parametro.startswith("q="):
+                try:
+                    return float(parametro[2:]) > 0
+                except ValueError:
+                    return False
+        return True
+    return False
+
+
+def resolver(
+    arquivo: str,
+    accept: str,
+    accept_encoding: str
+) -> Optional[tuple]:
+    """
+    Escolhe o que servir para `arquivo`: (caminho, content-type,
+    content-encoding ou None, Vary) ou None se não for um asset do build.
+    """
+    info = _manifesto.get("arquivos", {}).get(arquivo)
+    if info is None:
+        return None
+
+    # Imagens: AVIF > WebP > original, conforme o navegador aceita
+    for mime in ("image/avif", "image/webp"):
+        variante = info["variantes"].get(mime)
+        if variante and aceita(accept, mime):
+            return os.path.join(ASSETS_DIR, variante), mime, None, "Accept"
+
+    # Textos: brotli > gzip > original
+    for encoding in ("br", "gzip"):
+        comprimido = info["encodings"].get(encoding)
+        if comprimido and aceita(accept_encoding, encoding):
+            return (
+                os.path.join(ASSETS_DIR, comprimido),
+                info["tipo"],
+                encoding,
+                "Accept-Encoding"
+            )
+
+    vary = "Accept" if info["variantes"] else (
+        "Accept-Encoding" if info["encodings"] else None
+    )
+    return os.path.join(ASSETS_DIR, arquivo), info["tipo"], None, vary
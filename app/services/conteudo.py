@@ -0,0 +1,188 @@
+import asyncio
+import os
+import sqlite3
+import threading
+import time
+from dataclasses import dataclass
+from typing import BinaryIO, List, Optional, Tuple
+
+from fastapi.concurrency import run_in_threadpool
+
+from app.services.entrada import ArquivoEntrada
+from app.services.locks import LocksPorChave
+from app.services.upload import (
+    UploadError,
+    detectar_tipo,
+    existe_objeto,
+    public_url,
+    upload_bytes,
+)
+
+# Objetos endereçados por conteúdo: cas/<2 primeiros>/<sha256>.<tipo>
+CAS_PREFIXO = "cas"
+CAS_INDICE = os.getenv("CAS_INDICE", os.path.join("data", "cas.sqlite3"))
+
+
+@dataclass
+class ObjetoArmazenado:
+    sha256: str
+    path: str
+    url: str
+    reutilizado: bool
+
+
+# ============================================================
+# ÍNDICE LOCAL (SQLITE)
+# ============================================================
+
+class IndiceLocal:
+    """
+    hash → path dos objetos que já sabemos existir no bucket.
+    Evita a consulta remota na maioria dos reenvios.
+    """
+
+    def __init__(self, caminho: str):
+        self.caminho = caminho
+        self._lock = threading.Lock()
+        self._conn: Optional[sqlite3.Connection] = None
+
+    def _conexao(self) -> sqlite3.Connection:
+        if self._conn is None:
+            os.makedirs(os.path.dirname(self.caminho) or ".", exist_ok=True)
+            self._conn = sqlite3.connect(self.caminho, check_same_thread=False)
+            self._conn.execute("PRAGMA journal_mode=WAL")
+            self._conn.execute(
+                "CREATE TABLE IF NOT EXISTS objetos ("
+                " sha256 TEXT PRIMARY KEY,"
+                " path TEXT NOT NULL,"
+                " criado_em REAL NOT NULL)"
+            )
+        return self._conn
+
+    def obter(self, sha256: str) -> Optional[str]:
+        with self._lock:
+            row = self._conexao().execute(
+                "SELECT path FROM objetos WHERE sha256 = ?", (sha256,)
+            ).fetchone()
+        return row[0] if row else None
+
+    def registrar(self, sha256: str, path: str) -> None:
+        with self._lock:
+            conn = self._conexao()
+            conn.execute(
+                "INSERT OR REPLACE INTO objetos (sha256, path, criado_em)"
+                " VALUES (?, ?, ?)",
+                (sha256, path, time.time())
+            )
+            conn.commit()
+
+
+indice = IndiceLocal(CAS_INDICE)
+
+# Um upload por hash em andamento neste processo
+_locks = LocksPorChave()
+
+
+# ============================================================
+# UTILS
+# ============================================================
+
+def path_conteudo(sha256: str, tipo: str) -> str:
+    return f"{CAS_PREFIXO}/{sha256[:2]}/{sha256}.{tipo}"
+
+
+def _detectar_tipo_stream(stream: BinaryIO) -> Optional[str]:
+    tipo = detectar_tipo(stream.read(16))
+    stream.seek(0)
+    return tipo
+
+
+# ============================================================
+# ARMAZENAMENTO
+# ============================================================
+
+async def armazenar(
+    arquivo: ArquivoEntrada,
+    sha256: Optional[str] = None
+) -> ObjetoArmazenado:
+    """
+    Grava o arquivo no bucket pelo seu SHA-256.
+    Se o blob já existe (índice local ou HEAD remoto) o upload é pulado
+    e o objeto existente é referenciado.
+    """
+    sha256 = sha256 or arquivo.sha256
+    if sha256 is None:
+        sha256 = await run_in_threadpool(arquivo.calcular_sha256)
+
+    stream = arquivo.abrir()
+    # Arquivo em disco (spool): a leitura sai do event loop
+    tipo = await run_in_threadpool(_detectar_tipo_stream, stream)
+    if tipo is None:
+        raise UploadError("Falha no upload do arquivo: tipo não suportado")
+
+    path = path_conteudo(sha256, tipo)
+    async with _locks.travar(sha256):
+        # ---------------------------------
+        # 1. Índice local
+        # ---------------------------------
+        existente = await run_in_threadpool(indice.obter, sha256)
+        if existente:
+            return ObjetoArmazenado(sha256, existente, public_url(existente), True)
+
+        # ---------------------------------
+        # 2. Consulta remota
+        # ---------------------------------
+        if await existe_objeto(path):
+            await run_in_threadpool(indice.registrar, sha256, path)
+            return ObjetoArmazenado(sha256, path, public_url(path), True)
+
+        # ---------------------------------
+        # 3. Upload
+        # ---------------------------------
+        reutilizado = False
+        try:
+            folder, nome = path.rsplit("/", 1)
+            await upload_bytes(arquivo.abrir(), folder, tipo=tipo, nome=nome)
+        except UploadError as e:
+            # Outra instância gravou o mesmo blob no meio do caminho
+            if not e.duplicado:
+                raise
+            reutilizado = True
+
+        await run_in_threadpool(indice.registrar, sha256, path)
+        return ObjetoArmazenado(sha256, path, public_url(path), reutilizado)
+
+
+async def armazenar_varios(
+    itens: List[Tuple[str, ArquivoEntrada, Optional[str]]],
+    concorrencia: int
+) -> Tuple[List[dict], List[dict]]:
+    """
+    Armazena vários (item, arquivo, sha256) em paralelo, até `concorrencia`
+    por vez. Retorna (armazenados, falhas); falha de um item não derruba
+    os demais.
+    """
+    limite = asyncio.Semaphore(max(1, concorrencia))
+
+    async def _um(arquivo: ArquivoEntrada, sha256: Optional[str]) -> ObjetoArmazenado:
+        async with limite:
+            return await armazenar(arquivo, sha256)
+
+    resultados = await asyncio.gather(
+        *(_um(arquivo, sha256) for _, arquivo, sha256 in itens),
+        return_exceptions=True
+    )
+
+    armazenados, falhas = [], []
+    for (item, _, _), resultado in zip(itens, resultados):
+        if isinstance(resultado, Exception):
+            falhas.append({"item": item, "erro": str(resultado)})
+        else:
+            armazenados.append({
+                "item": item,
+                "url": resultado.url,
+                "hash": resultado.sha256,
+                "reutilizado": resultado.reutilizado
+            })
+
+    return armazenados, falhas
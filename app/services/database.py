@@ -0,0 +1,241 @@
+import base64
+import json as json_lib
+from typing import Any, Dict, Iterable, List, Optional, Sequence, Union
+
+import httpx
+
+from app.services import metricas
+from app.services.supabase_client import get_async_client
+
+# Nome da etapa (métricas / Server-Timing) por método HTTP
+ETAPAS = {"GET": "db_select", "POST": "db_insert", "PATCH": "db_update"}
+
+
+class SupabaseError(Exception):
+    def __init__(self, mensagem: str, status_code: Optional[int] = None):
+        super().__init__(mensagem)
+        self.status_code = status_code
+
+    @property
+    def recusado(self) -> bool:
+        """O banco recusou os dados (tipo, constraint): repetir não adianta."""
+        return self.status_code in (400, 409, 422)
+
+
+# ============================================================
+# FILTROS (SINTAXE POSTGREST)
+# ============================================================
+
+def _valor(valor: Any) -> str:
+    if valor is None:
+        return "null"
+    if isinstance(valor, bool):
+        return "true" if valor else "false"
+    return str(valor)
+
+
+def eq(valor: Any) -> str:
+    if valor is None:
+        return "is.null"
+    return f"eq.{_valor(valor)}"
+
+
+def in_(valores: Iterable[Any]) -> str:
+    itens = ",".join(
+        '"' + _valor(v).replace('"', '\\"') + '"' for v in valores
+    )
+    return f"in.({itens})"
+
+
+def gte(valor: Any) -> str:
+    return f"gte.{_valor(valor)}"
+
+
+def lt(valor: Any) -> str:
+    return f"lt.{_valor(valor)}"
+
+
+def _citar(valor: Any) -> str:
+    # Dentro de or=/and= vírgulas, pontos e parênteses são reservados
+    return '"' + _valor(valor).replace('"', '\\"') + '"'
+
+
+def apos(colunas: Sequence[str], valores: Sequence[Any], descendente: bool = True) -> str:
+    """
+    Condição de keyset para o parâmetro `or`: linhas depois de `valores`
+    na ordenação por `colunas` (todas na mesma direção).
+
+    apos(["criado_em", "id"], [t, i]) → (criado_em.lt.t,and(criado_em.eq.t,id.lt.i))
+    """
+    operador = "lt" if descendente else "gt"
+    condicoes = []
+    for n, (coluna, valor) in enumerate(zip(colunas, valores)):
+        iguais = [
+            f"{c}.eq.{_citar(v)}" for c, v in zip(colunas[:n], valores[:n])
+        ]
+        atual = f"{coluna}.{operador}.{_citar(valor)}"
+        condicoes.append(f"and({','.join(iguais + [atual])})" if iguais else atual)
+    return f"({','.join(condicoes)})"
+
+
+def codificar_cursor(valores: Sequence[Any]) -> str:
+    """
+    Cursor opaco (base64url de JSON) com os valores da chave de ordenação
+    da última linha entregue.
+    """
+    bruto = json_lib.dumps(list(valores)).encode("utf-8")
+    return base64.urlsafe_b64encode(bruto).decode("ascii").rstrip("=")
+
+
+def decodificar_cursor(cursor: str, tamanho: int) -> List[Any]:
+    """
+    Inverso de codificar_cursor; ValueError se o cursor não for válido.
+    """
+    bruto = base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4))
+    valores = json_lib.loads(bruto)
+    if not isinstance(valores, list) or len(valores) != tamanho:
+        raise ValueError("Cursor inválido")
+    return valores
+
+
+# ============================================================
+# REQUISIÇÕES
+# ============================================================
+
+def _erro(resp: httpx.Response) -> SupabaseError:
+    try:
+        corpo = resp.json()
+        mensagem = corpo.get("message") or corpo.get("error") or resp.text
+    except ValueError:
+        mensagem = resp.text
+
+    return SupabaseError(f"{resp.status_code}: {mensagem}", resp.status_code)
+
+
+async def _enviar(
+    metodo: str,
+    tabela: str,
+    *,
+    params: Optional[Dict[str, str]] = None,
+    json: Any = None,
+    prefer: Optional[str] = None
+) -> httpx.Response:
+    headers = {}
+    if prefer:
+        headers["Prefer"] = prefer
+
+    with metricas.etapa(ETAPAS.get(metodo, "db")):
+        resp = await get_async_client().request(
+            metodo,
+            f"/rest/v1/{tabela}",
+            params=params,
+            json=json,
+            headers=headers
+        )
+
+    if resp.status_code >= 400:
+        raise _erro(resp)
+
+    return resp
+
+
+async def _request(
+    metodo: str,
+    tabela: str,
+    *,
+    params: Optional[Dict[str, str]] = None,
+    json: Any = None,
+    prefer: Optional[str] = None
+) -> List[dict]:
+    resp = await _enviar(metodo, tabela, params=params, json=json, prefer=prefer)
+
+    if not resp.content:
+        return []
+
+    return resp.json()
+
+
+# ============================================================
+# OPERAÇÕES DE TABELA
+# ============================================================
+
+async def select(
+    tabela: str,
+    colunas: str = "*",
+    filtros: Optional[Dict[str, str]] = None,
+    *,
+    ordem: Optional[str] = None,
+    limite: Optional[int] = None,
+    unico: bool = False
+) -> Union[List[dict], Optional[dict]]:
+    """
+    SELECT via PostgREST.
+    Com unico=True retorna a linha encontrada (ou None).
+    """
+    params = {"select": colunas, **(filtros or {})}
+    if ordem:
+        params["order"] = ordem
+    if limite is not None:
+        params["limit"] = str(limite)
+
+    linhas = await _request("GET", tabela, params=params)
+
+    if not unico:
+        return linhas
+
+    if len(linhas) > 1:
+        raise SupabaseError(f"Mais de uma linha em {tabela} para {filtros}")
+
+    return linhas[0] if linhas else None
+
+
+async def contar(tabela: str, filtros: Optional[Dict[str, str]] = None) -> int:
+    """
+    COUNT(*) exato no banco (Prefer: count=exact, limit=0): não traz as
+    linhas nem esbarra no limite de linhas do PostgREST.
+    """
+    resp = await _enviar(
+        "GET",
+        tabela,
+        params={"select": "id", **(filtros or {}), "limit": "0"},
+        prefer="count=exact"
+    )
+
+    # Content-Range: */<total> (ou 0-0/<total>)
+    total = resp.headers.get("content-range", "").rpartition("/")[2]
+    if not total.isdigit():
+        raise SupabaseError(f"Contagem de {tabela} sem Content-Range")
+    return int(total)
+
+
+async def insert(
+    tabela: str,
+    linhas: Union[dict, List[dict]],
+    *,
+    retornar: bool = False
+) -> List[dict]:
+    return await _request(
+        "POST",
+        tabela,
+        json=linhas,
+        prefer="return=representation" if retornar else "return=minimal"
+    )
+
+
+async def update(
+    tabela: str,
+    valores: dict,
+    filtros: Dict[str, str],
+    *,
+    retornar: bool = False
+) -> List[dict]:
+    if not filtros:
+        raise SupabaseError("UPDATE sem filtros não é permitido")
+
+    return await _request(
+        "PATCH",
+        tabela,
+        params=filtros,
+        json=valores,
+        prefer="return=representation" if retornar else "return=minimal"
+    )
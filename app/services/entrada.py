@@ -0,0 +1,568 @@
+import binascii
+import hashlib
+import json
+import os
+import re
+import shutil
+import tempfile
+from io import BytesIO
+from typing import (
+    Any, BinaryIO, Collection, List, Mapping, Optional, Tuple, Type, TypeVar
+)
+
+from fastapi import HTTPException, Request
+from fastapi.exceptions import RequestValidationError
+from pydantic import BaseModel, ValidationError
+from starlette.datastructures import UploadFile
+from starlette.formparsers import MultiPartParser
+
+from app.services import metricas
+
+# Partes multipart acima deste tamanho são despejadas em disco
+UPLOAD_SPOOL_MAX_SIZE = int(os.getenv("UPLOAD_SPOOL_MAX_SIZE", str(1024 * 1024)))
+MultiPartParser.spool_max_size = UPLOAD_SPOOL_MAX_SIZE
+
+# Corpo máximo das rotas com upload (JSON ou multipart); acima → 413
+REQUISICAO_MAX_BYTES = int(os.getenv("REQUISICAO_MAX_BYTES", str(64 * 1024 * 1024)))
+# Imagem decodificada máxima por campo; acima → 413
+IMAGEM_MAX_BYTES = int(os.getenv("IMAGEM_MAX_BYTES", str(20 * 1024 * 1024)))
+
+Modelo = TypeVar("Modelo", bound=BaseModel)
+
+# Nome → parte binária: FormData do multipart ou arquivos salvos de um job
+Partes = Mapping[str, Any]
+
+
+# ============================================================
+# DECODIFICAÇÃO INCREMENTAL
+# ============================================================
+
+# Caracteres base64 por bloco (múltiplo de 4)
+BASE64_BLOCO = 256 * 1024
+
+_ESPACOS = re.compile(r"\s+")
+
+
+def decodificar_base64(
+    texto: str,
+    destino: BinaryIO,
+    inicio: int = 0
+) -> Tuple[str, int]:
+    """
+    Decodifica texto[inicio:] em blocos direto para `destino`, atualizando
+    o SHA-256 no mesmo passo. Espaços/quebras de linha são ignorados e o
+    padding ausente é completado. Nenhuma cópia integral da string é feita.
+
+    Retorna (sha256, bytes escritos).
+    """
+    sha = hashlib.sha256()
+    total = 0
+    resto = ""
+
+    for pos in range(inicio, len(texto), BASE64_BLOCO):
+        trecho = resto + texto[pos:pos + BASE64_BLOCO]
+        if _ESPACOS.search(trecho):
+            trecho = _ESPACOS.sub("", trecho)
+
+        corte = len(trecho) - len(trecho) % 4
+        trecho, resto = trecho[:corte], trecho[corte:]
+        if not trecho:
+            continue
+
+        dados = binascii.a2b_base64(trecho)
+        sha.update(dados)
+        destino.write(dados)
+        total += len(dados)
+
+    if resto:
+        dados = binascii.a2b_base64(resto + "=" * (-len(resto) % 4))
+        sha.update(dados)
+        destino.write(dados)
+        total += len(dados)
+
+    return sha.hexdigest(), total
+
+
+# ============================================================
+# ARQUIVO RECEBIDO
+# ============================================================
+
+class ArquivoEntrada:
+    """
+    Conteúdo binário recebido por uma rota: base64 vindo do JSON
+    ou parte binária de um upload multipart (SpooledTemporaryFile).
+    """
+
+    def __init__(
+        self,
+        arquivo: BinaryIO,
+        content_type: Optional[str] = None,
+        sha256: Optional[str] = None,
+        tamanho: Optional[int] = None
+    ):
+        self.arquivo = arquivo
+        self.content_type = content_type
+        self.sha256 = sha256
+        self.tamanho = tamanho
+
+    @classmethod
+    def de_base64(cls, data_url: str) -> "ArquivoEntrada":
+        virgula = data_url.find(",")
+        if virgula < 0:
+            raise ValueError("Formato Base64 inválido")
+
+        header = data_url[:virgula]
+        content_type = header[5:].split(";", 1)[0] if header.startswith("data:") else None
+
+        buffer = BytesIO()
+        with metricas.etapa("base64", len(data_url)):
+            sha256, tamanho = decodificar_base64(data_url, buffer, virgula + 1)
+
+        return cls(buffer, content_type or None, sha256, tamanho)
+
+    @classmethod
+    def de_upload(cls, upload: UploadFile) -> "ArquivoEntrada":
+        return cls(upload.file, upload.content_type)
+
+    def abrir(self) -> BinaryIO:
+        self.arquivo.seek(0)
+        return self.arquivo
+
+    def ler(self) -> bytes:
+        return self.abrir().read()
+
+    def copiar_para(self, destino: BinaryIO) -> None:
+        shutil.copyfileobj(self.abrir(), destino)
+
+    def calcular_sha256(self) -> str:
+        """
+        Hash de partes multipart (já em disco/memória); para base64
+        o valor vem pronto da decodificação.
+        """
+        if self.sha256 is None:
+            sha = hashlib.sha256()
+            stream = self.abrir()
+            tamanho = 0
+            for bloco in iter(lambda: stream.read(1024 * 1024), b""):
+                sha.update(bloco)
+                tamanho += len(bloco)
+            self.sha256, self.tamanho = sha.hexdigest(), tamanho
+            stream.seek(0)
+
+        return self.sha256
+
+
+class ImagemDecodificada(ArquivoEntrada):
+    """
+    Imagem decodificada uma única vez, com hash, dimensões e mime.
+    Consumida tanto pelo PDF quanto pela montagem das linhas no banco.
+    """
+
+    mime: str
+    largura: int
+    altura: int
+
+    @classmethod
+    def de_arquivo(cls, origem: ArquivoEntrada) -> "ImagemDecodificada":
+        from PIL import Image
+
+        imagem = cls(origem.arquivo, origem.content_type, origem.sha256, origem.tamanho)
+        imagem.calcular_sha256()
+
+        # Só o cabeçalho é lido aqui; os pixels ficam para o render
+        try:
+            with Image.open(imagem.abrir()) as img:
+                imagem.largura, imagem.altura = img.size
+                imagem.mime = Image.MIME.get(img.format, "application/octet-stream")
+        except Exception:
+            raise ValueError("Conteúdo não é uma imagem válida")
+
+        imagem.abrir()
+        return imagem
+
+
+# ============================================================
+# JSON EM STREAMING
+# ============================================================
+
+class CorpoGrande(Exception):
+    pass
+
+
+class PartesJson(dict):
+    """
+    Imagens extraídas do corpo JSON, por nome. Mesmo contrato do FormData
+    do multipart para as rotas (get / close).
+    """
+
+    async def close(self) -> None:
+        for parte in self.values():
+            if isinstance(parte, ArquivoEntrada):
+                parte.arquivo.close()
+
+
+_ESPACOS_BYTES = re.compile(rb"\s+")
+_ASPAS_OU_BARRA = re.compile(rb'["\\]')
+# Escapes válidos dentro de base64 em JSON (\\/ e quebras de linha); os
+# demais só aparecem em strings que não são data URL, copiadas como vieram
+_ESCAPES = {ord("/"): b"/", ord("n"): b"", ord("r"): b"", ord("t"): b""}
+
+
+class _Base64Stream:
+    """
+    Decodifica um data URL base64 à medida que os pedaços chegam,
+    direto para um arquivo temporário (memória até UPLOAD_SPOOL_MAX_SIZE).
+    """
+
+    # O cabeçalho "data:<mime>;base64," precisa aparecer nestes bytes
+    CABECALHO_MAX = 256
+
+    def __init__(self):
+        self.cabecalho = bytearray()
+        self.iniciado = False
+        self.content_type: Optional[str] = None
+        self.destino = tempfile.SpooledTemporaryFile(max_size=UPLOAD_SPOOL_MAX_SIZE)
+        self.sha = hashlib.sha256()
+        self.tamanho = 0
+        self.resto = b""
+        self.erro: Optional[Exception] = None
+
+    def _decodificar(self, trecho: bytes) -> None:
+        if self.erro is not None:
+            return
+        try:
+            dados = binascii.a2b_base64(trecho)
+        except binascii.Error as e:
+            self.erro = e
+            return
+        self.tamanho += len(dados)
+        if self.tamanho > IMAGEM_MAX_BYTES:
+            raise CorpoGrande(f"Imagem acima de {IMAGEM_MAX_BYTES} bytes")
+        self.sha.update(dados)
+        self.destino.write(dados)
+
+    def escrever(self, pedaco: bytes) -> bool:
+        """
+        False se o valor não é um data URL (sem vírgula no início):
+        o chamador o trata como string comum.
+        """
+        if not self.iniciado:
+            self.cabecalho += pedaco
+            virgula = self.cabecalho.find(b",")
+            if virgula < 0:
+                return len(self.cabecalho) <= self.CABECALHO_MAX
+            header = bytes(self.cabecalho[:virgula]).decode("latin-1")
+            if header.startswith("data:"):
+                self.content_type = header[5:].split(";", 1)[0] or None
+            pedaco = bytes(self.cabecalho[virgula + 1:])
+            self.iniciado = True
+
+        trecho = self.resto + _ESPACOS_BYTES.sub(b"", pedaco)
+        corte = len(trecho) - len(trecho) % 4
+        self.resto = trecho[corte:]
+        if corte:
+            self._decodificar(trecho[:corte])
+        return True
+
+    def finalizar(self) -> Any:
+        """
+        ArquivoEntrada pronto, ou a exceção de decodificação (levantada só
+        quando a rota resolver o campo, como no fluxo original).
+        """
+        if self.resto:
+            self._decodificar(self.resto + b"=" * (-len(self.resto) % 4))
+        if self.erro is not None:
+            self.destino.close()
+            return self.erro
+        return ArquivoEntrada(
+            self.destino, self.content_type, self.sha.hexdigest(), self.tamanho
+        )
+
+
+class ExtratorJson:
+    """
+    Lê o JSON em pedaços e desvia os valores string dos `campos` binários
+    (em qualquer nível: "imagem", "imagens[].imagem_base64") para
+    _Base64Stream, deixando no JSON só o nome da parte extraída.
+
+    O restante (pequeno) é acumulado e entregue ao json.loads no fim:
+    o corpo inteiro e as strings base64 nunca ficam em memória.
+    """
+
+    FORA, STRING, BINARIO = range(3)
+
+    def __init__(self, campos: Collection[str]):
+        self.campos = {c.encode() for c in campos}
+        self.saida = bytearray()
+        self.partes = PartesJson()
+        self.estado = self.FORA
+        self.escape = False
+        # Conteúdo da última string fechada (possível chave) e se, desde
+        # então, só apareceu ":" fora de strings
+        self.string = bytearray()
+        self.ultima_string = b""
+        self.so_dois_pontos: Optional[bool] = None
+        self.binario: Optional[_Base64Stream] = None
+        # Bytes originais do valor binário até o cabeçalho do data URL: se
+        # não for data URL, voltam ao JSON sem perder nenhum escape
+        self.bruto = bytearray()
+
+    # ---------------------------------
+    # Estados
+    # ---------------------------------
+    def _fora(self, dados: bytes, pos: int) -> int:
+        fim = dados.find(b'"', pos)
+        segmento = dados[pos:] if fim < 0 else dados[pos:fim]
+        self.saida += segmento
+
+        limpo = segmento.strip()
+        if limpo:
+            self.so_dois_pontos = (
+                limpo == b":" and self.so_dois_pontos is None
+            )
+        if fim < 0:
+            return len(dados)
+
+        # Abre string: valor de um campo binário?
+        if self.so_dois_pontos and self.ultima_string in self.campos:
+            self.estado = self.BINARIO
+            self.binario = _Base64Stream()
+            self.bruto = bytearray()
+        else:
+            self.estado = self.STRING
+            self.saida += b'"'
+            self.string = bytearray()
+        self.so_dois_pontos = None
+        return fim + 1
+
+    def _string(self, dados: bytes, pos: int) -> int:
+        if self.escape:
+            self.escape = False
+            self.saida += dados[pos:pos + 1]
+            self._guardar(dados[pos:pos + 1])
+            pos += 1
+
+        while pos < len(dados):
+            achado = _ASPAS_OU_BARRA.search(dados, pos)
+            fim = len(dados) if achado is None else achado.start()
+            self.saida += dados[pos:fim]
+            self._guardar(dados[pos:fim])
+            if achado is None:
+                return len(dados)
+
+            if dados[fim] == ord("\\"):
+                self.saida += b"\\"
+                self._guardar(b"\\")
+                if fim + 1 < len(dados):
+                    self.saida += dados[fim + 1:fim + 2]
+                    self._guardar(dados[fim + 1:fim + 2])
+                    pos = fim + 2
+                else:
+                    self.escape = True
+                    return len(dados)
+                continue
+
+            self.saida += b'"'
+            self.ultima_string = bytes(self.string)
+            self.estado = self.FORA
+            return fim + 1
+
+        return pos
+
+    def _guardar(self, trecho: bytes) -> None:
+        # Só o começo importa (comparação com nomes de campos)
+        if len(self.string) <= 64:
+            self.string += trecho[:65]
+
+    def _binario(self, dados: bytes, pos: int) -> int:
+        inicio = pos
+        partes: List[bytes] = []
+        if self.escape:
+            self.escape = False
+            partes.append(_ESCAPES.get(dados[pos], b""))
+            pos += 1
+
+        while True:
+            achado = _ASPAS_OU_BARRA.search(dados, pos)
+            fim = len(dados) if achado is None else achado.start()
+            partes.append(dados[pos:fim])
+            if achado is None or dados[fim] == ord('"'):
+                break
+            if fim + 1 < len(dados):
+                partes.append(_ESCAPES.get(dados[fim + 1], b""))
+                pos = fim + 2
+            else:
+                self.escape = True
+                fim = len(dados)
+                achado = None
+                break
+
+        if not self.binario.iniciado:
+            # Inclui a barra de um escape partido entre dois pedaços
+            self.bruto += dados[inicio:fim]
+
+        if not self.binario.escrever(b"".join(partes)):
+            # Não é data URL: volta a ser uma string comum no JSON
+            self.saida += b'"' + bytes(self.bruto)
+            self.binario.destino.close()
+            self.binario = None
+            self.estado = self.STRING
+            self.string = bytearray()
+            return fim
+
+        if achado is None:
+            return len(dados)
+
+        if not self.binario.iniciado:
+            # Fechou antes da vírgula: string curta comum
+            self.saida += b'"' + bytes(self.bruto) + b'"'
+            self.binario.destino.close()
+        else:
+            nome = f"__json_{len(self.partes)}"
+            self.partes[nome] = self.binario.finalizar()
+            self.saida += b'"' + nome.encode() + b'"'
+        self.binario = None
+        self.bruto = bytearray()
+        self.ultima_string = b""
+        self.estado = self.FORA
+        return fim + 1
+
+    # ---------------------------------
+    # API
+    # ---------------------------------
+    def alimentar(self, dados: bytes) -> None:
+        pos = 0
+        while pos < len(dados):
+            if self.estado == self.FORA:
+                pos = self._fora(dados, pos)
+            elif self.estado == self.STRING:
+                pos = self._string(dados, pos)
+            else:
+                pos = self._binario(dados, pos)
+
+    def finalizar(self) -> Any:
+        if self.binario is not None:
+            self.binario.destino.close()
+        return json.loads(bytes(self.saida))
+
+
+async def ler_json_streaming(
+    request: Request,
+    campos: Collection[str],
+    limite: int = REQUISICAO_MAX_BYTES
+) -> Tuple[Any, PartesJson]:
+    """
+    JSON do corpo com os campos binários já decodificados em arquivos.
+    CorpoGrande se o corpo passar de `limite` (sem ler o resto).
+    """
+    extrator = ExtratorJson(campos)
+    recebidos = 0
+
+    try:
+        async for pedaco in request.stream():
+            recebidos += len(pedaco)
+            if recebidos > limite:
+                raise CorpoGrande(f"Corpo acima de {limite} bytes")
+            extrator.alimentar(pedaco)
+
+        return extrator.finalizar(), extrator.partes
+
+    except BaseException:
+        await extrator.partes.close()
+        raise
+
+
+# ============================================================
+# LEITURA DA REQUISIÇÃO (JSON OU MULTIPART)
+# ============================================================
+
+def is_multipart(request: Request) -> bool:
+    return request.headers.get("content-type", "").startswith("multipart/form-data")
+
+
+async def ler_requisicao(
+    request: Request,
+    modelo: Type[Modelo],
+    campos_binarios: Collection[str] = ()
+) -> Tuple[Modelo, Optional[Partes]]:
+    """
+    Lê o corpo como JSON ou como multipart/form-data.
+
+    No multipart, o campo "dados" traz o mesmo JSON do contrato original,
+    mas os campos de imagem contêm o NOME da parte binária em vez do base64.
+
+    No JSON, os valores base64 dos `campos_binarios` são decodificados
+    durante a leitura (ler_json_streaming) e trocados pelo nome da parte,
+    como no multipart.
+
+    O chamador deve fechar as partes retornadas (form.close()).
+    """
+    form: Optional[Any] = None
+    tamanho = request.headers.get("content-length", "")
+    tamanho = int(tamanho) if tamanho.isdigit() else 0
+
+    # Rejeita antes de ler qualquer byte do corpo
+    if tamanho > REQUISICAO_MAX_BYTES:
+        raise HTTPException(
+            status_code=413,
+            detail=f"Corpo acima de {REQUISICAO_MAX_BYTES} bytes"
+        )
+
+    try:
+        with metricas.etapa("leitura", tamanho):
+            if is_multipart(request):
+                form = await request.form()
+                bruto = form.get("dados")
+                if not isinstance(bruto, str):
+                    raise HTTPException(status_code=400, detail="Campo 'dados' ausente")
+                payload = json.loads(bruto)
+            elif campos_binarios:
+                payload, form = await ler_json_streaming(request, campos_binarios)
+                if not form:
+                    form = None
+            else:
+                payload = await request.json()
+
+            return modelo.model_validate(payload), form
+
+    except CorpoGrande as e:
+        if form is not None:
+            await form.close()
+        raise HTTPException(status_code=413, detail=str(e))
+
+    except ValidationError as e:
+        if form is not None:
+            await form.close()
+        raise RequestValidationError(e.errors())
+
+    except ValueError:
+        if form is not None:
+            await form.close()
+        raise HTTPException(status_code=400, detail="JSON inválido")
+
+    except BaseException:
+        if form is not None:
+            await form.close()
+        raise
+
+
+def resolver_arquivo(valor: str, partes: Optional[Partes]) -> ArquivoEntrada:
+    """
+    Converte o valor de um campo de imagem em ArquivoEntrada:
+    nome de parte (multipart ou arquivo de job) ou data URL base64.
+    """
+    if partes is not None:
+        parte = partes.get(valor)
+        if isinstance(parte, UploadFile):
+            return ArquivoEntrada.de_upload(parte)
+        if isinstance(parte, ArquivoEntrada):
+            return parte
+        if isinstance(parte, Exception):
+            # Base64 inválido detectado na leitura em streaming
+            raise parte
+
+    return ArquivoEntrada.de_base64(valor)
+
+
+def resolver_imagem(valor: str, partes: Optional[Partes]) -> ImagemDecodificada:
+    return ImagemDecodificada.de_arquivo(resolver_arquivo(valor, partes))
@@ -0,0 +1,62 @@
+import asyncio
+from typing import Awaitable, Optional
+
+from app.services import artefatos, pdfs, processos, render
+from app.services.upload import UploadError, path_de_url
+
+
+class EntregaError(Exception):
+    def __init__(self, mensagem: str, status_code: int = 500):
+        super().__init__(mensagem)
+        self.status_code = status_code
+
+
+# ============================================================
+# PROCESSO
+# ============================================================
+
+async def buscar_processo(identificador: str) -> dict:
+    proc = await processos.buscar(identificador)
+
+    if proc is None:
+        raise EntregaError(f"Processo não encontrado: {identificador}", 404)
+
+    return proc
+
+
+def pasta_processo(processo: dict) -> str:
+    return processo.get("processo_id") or processo["id"]
+
+
+# ============================================================
+# DOCUMENTOS
+# ============================================================
+
+async def baixar_documento(url: Optional[str], ausente: str) -> bytes:
+    if not url:
+        raise EntregaError(ausente, 404)
+
+    try:
+        # PDFs de termo/ressalvas têm nome único: o cache local nunca fica velho
+        return await artefatos.baixar(path_de_url(url))
+    except UploadError as e:
+        if e.status_code == 404:
+            raise EntregaError(ausente, 404)
+        raise
+
+
+async def montar_entrega(processo: dict, pagina_nps: Awaitable[bytes]) -> bytes:
+    """
+    Termo + ressalvas (baixados do storage) + página do NPS, mesclados
+    em memória. Downloads e render da página correm em paralelo.
+    As URLs vêm do banco: outro processo pode ter gerado as ressalvas.
+    """
+    documentos = await processos.documentos(processo["id"])
+
+    termo, ressalvas, nps = await asyncio.gather(
+        baixar_documento(documentos.get("termo_pdf"), "Termo não encontrado"),
+        baixar_documento(documentos.get("pdf_ressalvas"), "Ressalvas não encontradas"),
+        pagina_nps
+    )
+
+    return await render.renderizar(pdfs.mesclar, [termo, ressalvas, nps])
@@ -0,0 +1,340 @@
+"""
+Exportação em ZIP dos PDFs de entrega de um período (auditoria).
+
+O ZIP é montado em streaming: os objetos são baixados do storage com
+prefetch limitado (EXPORTACAO_PREFETCH processos à frente) e cada bloco
+escrito no ZIP sai para o cliente logo em seguida. A memória depende da
+janela de prefetch, não do tamanho do arquivo.
+
+Cada ZIP cobre no máximo `limite` processos (ordem: finalizado_em, id) e
+termina com manifesto.csv. O cursor do próximo lote retoma a exportação:
+
+    python -m app.services.exportacao --de 2026-09-01 --ate 2026-09-30 --saida auditoria/
+"""
+import asyncio
+import csv
+import io
+import logging
+import os
+import zipfile
+from collections import deque
+from dataclasses import dataclass
+from datetime import date, datetime, timedelta
+from typing import AsyncIterator, Deque, List, Optional, Sequence, Tuple
+
+from app.services import database as db
+from app.services.upload import UploadError, baixar, path_de_url
+
+logger = logging.getLogger(__name__)
+
+# Processos baixados à frente do que está sendo escrito no ZIP
+EXPORTACAO_PREFETCH = int(os.getenv("EXPORTACAO_PREFETCH", "4"))
+EXPORTACAO_LIMITE_MAX = int(os.getenv("EXPORTACAO_LIMITE_MAX", "1000"))
+# Período máximo (dias) de uma exportação pela API
+EXPORTACAO_DIAS_MAX = int(os.getenv("EXPORTACAO_DIAS_MAX", "366"))
+EXPORTACAO_PAGINA = 200
+# Tamanho dos blocos enviados ao cliente
+EXPORTACAO_BLOCO = 256 * 1024
+
+# documento → coluna em processos e nome dentro da pasta do processo
+DOCUMENTOS = {
+    "final": ("pdf_final", "entrega_final.pdf"),
+    "termo": ("termo_pdf", "termo.pdf"),
+    "ressalvas": ("pdf_ressalvas", "ressalvas.pdf"),
+}
+
+CHAVE_CURSOR = ("finalizado_em", "id")
+COLUNAS = (
+    "id,codigo,nome_cliente,cpf,status,status_entrega,criado_em,finalizado_em,"
+    "termo_pdf,pdf_ressalvas,pdf_final"
+)
+CAMPOS_MANIFESTO = (
+    "codigo", "id", "nome_cliente", "cpf", "status", "status_entrega",
+    "criado_em", "finalizado_em",
+)
+
+
+def validar_documentos(documentos: Sequence[str]) -> List[str]:
+    lista = list(dict.fromkeys(documentos))
+    invalidos = [d for d in lista if d not in DOCUMENTOS]
+    if not lista or invalidos:
+        raise ValueError(
+            f"Documentos inválidos: {', '.join(invalidos) or '(nenhum)'}"
+            f" (use {', '.join(DOCUMENTOS)})"
+        )
+    return lista
+
+
+@dataclass
+class Lote:
+    processos: List[dict]
+    proximo_cursor: Optional[str]
+
+
+# ============================================================
+# SELEÇÃO
+# ============================================================
+
+async def listar(
+    de: date,
+    ate: date,
+    cursor: Optional[str] = None,
+    limite: int = EXPORTACAO_LIMITE_MAX
+) -> Lote:
+    """
+    Até `limite` processos finalizados no período (só metadados), em
+    páginas keyset, e o cursor para o lote seguinte.
+    """
+    periodo = (
+        f"(finalizado_em.gte.{de.isoformat()},"
+        f"finalizado_em.lt.{(ate + timedelta(days=1)).isoformat()})"
+    )
+    ultimo = db.decodificar_cursor(cursor, len(CHAVE_CURSOR)) if cursor else None
+    processos: List[dict] = []
+
+    while len(processos) <= limite:
+        filtros = {"and": periodo}
+        if ultimo is not None:
+            filtros["or"] = db.apos(CHAVE_CURSOR, ultimo, descendente=False)
+
+        pagina = await db.select(
+            "processos",
+            COLUNAS,
+            filtros,
+            ordem=",".join(f"{coluna}.asc" for coluna in CHAVE_CURSOR),
+            limite=min(EXPORTACAO_PAGINA, limite + 1 - len(processos))
+        )
+        processos.extend(pagina)
+        if len(pagina) < EXPORTACAO_PAGINA:
+            break
+        ultimo = [pagina[-1][coluna] for coluna in CHAVE_CURSOR]
+
+    proximo = None
+    if len(processos) > limite:
+        processos = processos[:limite]
+        proximo = db.codificar_cursor([processos[-1][c] for c in CHAVE_CURSOR])
+
+    return Lote(processos, proximo)
+
+
+# ============================================================
+# ZIP EM STREAMING
+# ============================================================
+
+class _SaidaZip:
+    """
+    Destino não-posicionável para o zipfile: acumula o que foi escrito
+    até ser retirado (o zipfile usa data descriptors, sem seek).
+    """
+
+    def __init__(self):
+        self._blocos: List[bytes] = []
+        self._posicao = 0
+
+    def write(self, dados) -> int:
+        self._blocos.append(bytes(dados))
+        self._posicao += len(dados)
+        return len(dados)
+
+    def tell(self) -> int:
+        return self._posicao
+
+    def flush(self) -> None:
+        pass
+
+    def retirar(self) -> bytes:
+        dados = b"".join(self._blocos)
+        self._blocos.clear()
+        return dados
+
+
+Documento = Tuple[str, Optional[bytes], str]
+
+
+async def _baixar_documento(processo: dict, documento: str) -> Documento:
+    coluna, nome = DOCUMENTOS[documento]
+    url = processo.get(coluna)
+    if not url:
+        return nome, None, "ausente"
+
+    try:
+        return nome, await baixar(path_de_url(url)), "ok"
+    except UploadError as e:
+        if e.status_code == 404:
+            return nome, None, "ausente"
+        logger.warning("Exportação: falha ao baixar %s: %s", url, e)
+        return nome, None, f"erro {e.status_code}" if e.status_code else "erro"
+
+
+async def _baixar_processo(processo: dict, documentos: Sequence[str]) -> List[Documento]:
+    return await asyncio.gather(
+        *(_baixar_documento(processo, documento) for documento in documentos)
+    )
+
+
+def _data_zip(valor: Optional[str]) -> Tuple[int, int, int, int, int, int]:
+    try:
+        momento = datetime.fromisoformat(valor) if valor else datetime.now()
+    except ValueError:
+        momento = datetime.now()
+    return max(momento, datetime(1980, 1, 1)).timetuple()[:6]
+
+
+async def gerar_zip(
+    processos: Sequence[dict],
+    documentos: Sequence[str] = ("final",),
+    prefetch: int = EXPORTACAO_PREFETCH
+) -> AsyncIterator[bytes]:
+    """
+    Blocos do ZIP: <codigo>/<documento>.pdf para cada processo e, ao
+    final, manifesto.csv com os metadados e a situação de cada documento.
+    PDFs já são comprimidos: as entradas são gravadas sem compressão.
+    """
+    saida = _SaidaZip()
+    zip_ = zipfile.ZipFile(saida, "w", compression=zipfile.ZIP_STORED)
+
+    manifesto = io.StringIO()
+    escritor = csv.writer(manifesto)
+    escritor.writerow(list(CAMPOS_MANIFESTO) + list(documentos))
+
+    fila = iter(processos)
+    pendentes: Deque[Tuple[dict, asyncio.Task]] = deque()
+
+    def encher() -> None:
+        while len(pendentes) < max(1, prefetch):
+            processo = next(fila, None)
+            if processo is None:
+                return
+            pendentes.append((
+                processo,
+                asyncio.create_task(_baixar_processo(processo, documentos))
+            ))
+
+    try:
+        encher()
+        while pendentes:
+            processo, tarefa = pendentes.popleft()
+            encher()
+            baixados = await tarefa
+
+            pasta = processo.get("codigo") or processo["id"]
+            situacoes = []
+            for nome, dados, situacao in baixados:
+                situacoes.append(situacao)
+                if dados is None:
+                    continue
+
+                info = zipfile.ZipInfo(
+                    f"{pasta}/{nome}", _data_zip(processo.get("finalizado_em"))
+                )
+                with zip_.open(info, "w") as destino:
+                    visao = memoryview(dados)
+                    for inicio in range(0, len(visao), EXPORTACAO_BLOCO):
+                        destino.write(visao[inicio:inicio + EXPORTACAO_BLOCO])
+                        yield saida.retirar()
+                yield saida.retirar()
+
+            escritor.writerow(
+                [processo.get(campo) for campo in CAMPOS_MANIFESTO] + situacoes
+            )
+
+        zip_.writestr(
+            zipfile.ZipInfo("manifesto.csv", _data_zip(None)),
+            manifesto.getvalue().encode("utf-8"),
+            compress_type=zipfile.ZIP_DEFLATED
+        )
+        zip_.close()
+        yield saida.retirar()
+
+    finally:
+        # Cliente desconectou: não deixa downloads órfãos
+        for _, tarefa in pendentes:
+            tarefa.cancel()
+
+
+# ============================================================
+# CLI
+# ============================================================
+
+async def exportar_para_pasta(
+    de: date,
+    ate: date,
+    pasta: str,
+    documentos: Sequence[str],
+    limite: int
+) -> int:
+    """
+    Grava entregas_<de>_<ate>_NNN.zip em `pasta`, um por lote. O cursor
+    do próximo lote fica em `pasta`/.cursor: rodar de novo retoma dali.
+    """
+    os.makedirs(pasta, exist_ok=True)
+    estado = os.path.join(pasta, ".cursor")
+    cursor, parte = None, 1
+
+    if os.path.exists(estado):
+        with open(estado, encoding="utf-8") as f:
+            parte_texto, _, cursor = f.read().strip().partition(" ")
+            parte = int(parte_texto)
+            cursor = cursor or None
+        logger.info("Retomando a exportação na parte %d", parte)
+
+    total = 0
+    while True:
+        lote = await listar(de, ate, cursor, limite)
+        if not lote.processos:
+            break
+
+        destino = os.path.join(pasta, f"entregas_{de}_{ate}_{parte:03d}.zip")
+        temporario = destino + ".parcial"
+        with open(temporario, "wb") as f:
+            async for bloco in gerar_zip(lote.processos, documentos):
+                f.write(bloco)
+        os.replace(temporario, destino)
+
+        total += len(lote.processos)
+        logger.info("%s: %d processo(s)", destino, len(lote.processos))
+
+        if lote.proximo_cursor is None:
+            break
+        cursor, parte = lote.proximo_cursor, parte + 1
+        with open(estado, "w", encoding="utf-8") as f:
+            f.write(f"{parte} {cursor}")
+
+    if os.path.exists(estado):
+        os.remove(estado)
+    return total
+
+
+if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Exporta os PDFs de entrega em ZIP")
+    parser.add_argument("--de", type=date.fromisoformat, required=True)
+    parser.add_argument("--ate", type=date.fromisoformat, required=True)
+    parser.add_argument("--saida", required=True, help="pasta dos arquivos .zip")
+    parser.add_argument(
+        "--documentos",
+        default="final",
+        help=f"separados por vírgula: {', '.join(DOCUMENTOS)}"
+    )
+    parser.add_argument("--por-arquivo", type=int, default=EXPORTACAO_LIMITE_MAX)
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO)
+
+    async def _main() -> int:
+        from app.services.supabase_client import close_async_client
+        try:
+            return await exportar_para_pasta(
+                args.de,
+                args.ate,
+                args.saida,
+                validar_documentos(
+                    [d.strip() for d in args.documentos.split(",") if d.strip()]
+                ),
+                args.por_arquivo
+            )
+        finally:
+            await close_async_client()
+
+    logger.info("Exportados %d processo(s)", asyncio.run(_main()))
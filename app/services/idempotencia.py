@@ -0,0 +1,436 @@
+import asyncio
+import hashlib
+import json
+import logging
+import os
+import re
+import socket
+import sqlite3
+import threading
+import time
+from dataclasses import dataclass, field
+from typing import Any, Awaitable, Callable, Dict, Optional, Tuple
+
+from starlette.types import Message, Receive
+
+from fastapi import HTTPException, Request
+from fastapi.concurrency import run_in_threadpool
+from fastapi.encoders import jsonable_encoder
+from fastapi.responses import JSONResponse, Response
+
+from app.services.entrada import REQUISICAO_MAX_BYTES
+
+logger = logging.getLogger(__name__)
+
+IDEMPOTENCIA_DB = os.getenv(
+    "IDEMPOTENCIA_DB", os.path.join("data", "idempotencia.sqlite3")
+)
+# Por quanto tempo uma resposta concluída é devolvida para a mesma chave
+IDEMPOTENCIA_TTL_SEGUNDOS = int(os.getenv("IDEMPOTENCIA_TTL_SEGUNDOS", "86400"))
+# Execução "em andamento" sem conclusão por mais que isso pode ser retomada
+# (processo que morreu no meio); mesmo valor do lease dos jobs
+IDEMPOTENCIA_LEASE_SEGUNDOS = int(os.getenv("IDEMPOTENCIA_LEASE_SEGUNDOS", "900"))
+# Espera máxima de uma repetição pela execução de OUTRO processo
+IDEMPOTENCIA_ESPERA_MAX = float(os.getenv("IDEMPOTENCIA_ESPERA_MAX", "120"))
+IDEMPOTENCIA_INTERVALO = 0.25
+
+CABECALHO = "idempotency-key"
+CHAVE_MAX = 255
+
+EXECUTANDO = "executando"
+CONCLUIDO = "concluido"
+
+# Cabeçalhos da resposta original que voltam na repetição
+CABECALHOS_GUARDADOS = ("location",)
+
+_DONO = f"{socket.gethostname()}:{os.getpid()}"
+
+
+@dataclass
+class Resultado:
+    status_code: int
+    corpo: bytes
+    headers: Dict[str, str] = field(default_factory=dict)
+    # SHA-256 do corpo da requisição que gerou a resposta
+    hash_corpo: Optional[str] = None
+
+    def resposta(self, repetida: bool) -> Response:
+        headers = dict(self.headers)
+        if repetida:
+            headers["Idempotent-Replayed"] = "true"
+        return Response(
+            self.corpo,
+            status_code=self.status_code,
+            headers=headers,
+            media_type="application/json"
+        )
+
+
+# ============================================================
+# REGISTRO (SQLITE)
+# ============================================================
+
+class RegistroIdempotencia:
+    """
+    Chave → estado da execução e resposta final. Compartilhado pelos
+    processos da mesma máquina, como a fila de jobs.
+    """
+
+    def __init__(self, caminho: str, ttl: int):
+        self.caminho = caminho
+        self.ttl = ttl
+        self._lock = threading.Lock()
+        self._conn: Optional[sqlite3.Connection] = None
+
+    def _conexao(self) -> sqlite3.Connection:
+        if self._conn is None:
+            os.makedirs(os.path.dirname(self.caminho) or ".", exist_ok=True)
+            self._conn = sqlite3.connect(
+                self.caminho,
+                check_same_thread=False,
+                timeout=30,
+                isolation_level=None
+            )
+            self._conn.row_factory = sqlite3.Row
+            self._conn.execute("PRAGMA journal_mode=WAL")
+            self._conn.execute(
+                "CREATE TABLE IF NOT EXISTS idempotencia ("
+                " chave TEXT PRIMARY KEY,"
+                " status TEXT NOT NULL,"
+                " dono TEXT,"
+                " status_code INTEGER,"
+                " corpo BLOB,"
+                " headers TEXT,"
+                " criado_em REAL NOT NULL,"
+                " atualizado_em REAL NOT NULL,"
+                " hash_corpo TEXT)"
+            )
+            colunas = {
+                linha["name"]
+                for linha in self._conn.execute("PRAGMA table_info(idempotencia)")
+            }
+            if "hash_corpo" not in colunas:
+                self._conn.execute("ALTER TABLE idempotencia ADD COLUMN hash_corpo TEXT")
+        return self._conn
+
+    def reservar(self, chave: str) -> Optional[sqlite3.Row]:
+        """
+        Marca a chave como em execução por este processo. Devolve None
+        se a reserva foi feita, ou o registro existente (em andamento
+        ou concluído) caso contrário.
+        """
+        agora = time.time()
+        with self._lock:
+            conn = self._conexao()
+            # Resposta vencida ou execução abandonada: a chave fica livre
+            conn.execute(
+                "DELETE FROM idempotencia WHERE chave = ?"
+                " AND ((status = ? AND atualizado_em < ?)"
+                "   OR (status = ? AND atualizado_em < ?))",
+                (
+                    chave,
+                    CONCLUIDO, agora - self.ttl,
+                    EXECUTANDO, agora - IDEMPOTENCIA_LEASE_SEGUNDOS,
+                )
+            )
+            reservado = conn.execute(
+                "INSERT INTO idempotencia (chave, status, dono, criado_em, atualizado_em)"
+                " VALUES (?, ?, ?, ?, ?)"
+                " ON CONFLICT (chave) DO NOTHING",
+                (chave, EXECUTANDO, _DONO, agora, agora)
+            ).rowcount
+            if reservado:
+                return None
+            return conn.execute(
+                "SELECT * FROM idempotencia WHERE chave = ?", (chave,)
+            ).fetchone()
+
+    def concluir(self, chave: str, resultado: Resultado) -> None:
+        with self._lock:
+            self._conexao().execute(
+                "UPDATE idempotencia SET status = ?, status_code = ?, corpo = ?,"
+                " headers = ?, hash_corpo = ?, atualizado_em = ?"
+                " WHERE chave = ? AND dono = ?",
+                (
+                    CONCLUIDO,
+                    resultado.status_code,
+                    resultado.corpo,
+                    json.dumps(resultado.headers),
+                    resultado.hash_corpo,
+                    time.time(),
+                    chave,
+                    _DONO,
+                )
+            )
+
+    def liberar(self, chave: str) -> None:
+        """
+        Falha sem resposta guardada: a próxima repetição executa de novo.
+        """
+        with self._lock:
+            self._conexao().execute(
+                "DELETE FROM idempotencia WHERE chave = ? AND status = ? AND dono = ?",
+                (chave, EXECUTANDO, _DONO)
+            )
+
+    def expurgar(self) -> int:
+        with self._lock:
+            return self._conexao().execute(
+                "DELETE FROM idempotencia WHERE status = ? AND atualizado_em < ?",
+                (CONCLUIDO, time.time() - self.ttl)
+            ).rowcount
+
+
+def _resultado_da_linha(linha: sqlite3.Row) -> Resultado:
+    return Resultado(
+        linha["status_code"],
+        bytes(linha["corpo"]),
+        json.loads(linha["headers"] or "{}"),
+        linha["hash_corpo"]
+    )
+
+
+registro = RegistroIdempotencia(IDEMPOTENCIA_DB, IDEMPOTENCIA_TTL_SEGUNDOS)
+
+# Execuções em andamento neste processo: repetições esperam no Future
+_em_andamento: Dict[str, "asyncio.Future[Resultado]"] = {}
+
+_contagem = {"executadas": 0, "repetidas": 0, "aguardadas": 0, "liberadas": 0}
+
+
+def estatisticas() -> Dict[str, int]:
+    return {**_contagem, "em_andamento": len(_em_andamento)}
+
+
+# ============================================================
+# CORPO DA REQUISIÇÃO
+# ============================================================
+
+class HashCorpo:
+    """
+    SHA-256 do corpo calculado à medida que a rota o lê (receive em tee,
+    nada é guardado). No multipart o boundary, sorteado a cada envio, fica
+    de fora: a repetição legítima de um upload tem o mesmo hash.
+
+    O resto do corpo que a rota não leu só é consumido até `limite`
+    bytes; acima disso não há hash (None).
+    """
+
+    def __init__(self, receive: Receive, content_type: str, limite: int = REQUISICAO_MAX_BYTES):
+        self._receive = receive
+        self._limite = limite
+        self._hash = hashlib.sha256()
+        self._lidos = 0
+        self._fim = False
+        self._resto = b""
+
+        encontrado = re.search(r'boundary="?([^";]+)"?', content_type)
+        self._boundary = encontrado.group(1).encode("latin-1") if encontrado else b""
+
+    def _atualizar(self, dados: bytes) -> None:
+        if not self._boundary:
+            self._hash.update(dados)
+            return
+
+        # Guarda o final do bloco: o boundary pode estar partido entre dois
+        dados = (self._resto + dados).replace(self._boundary, b"")
+        corte = max(0, len(dados) - len(self._boundary) + 1)
+        self._hash.update(dados[:corte])
+        self._resto = dados[corte:]
+
+    async def __call__(self) -> Message:
+        mensagem = await self._receive()
+        if mensagem["type"] == "http.request":
+            corpo = mensagem.get("body", b"")
+            self._lidos += len(corpo)
+            self._atualizar(corpo)
+            self._fim = not mensagem.get("more_body", False)
+        elif mensagem["type"] == "http.disconnect":
+            self._fim = True
+        return mensagem
+
+    async def calcular(self) -> Optional[str]:
+        # A rota pode ter parado antes do fim (ex.: erro 4xx): lê o resto
+        while not self._fim:
+            if self._lidos > self._limite:
+                return None
+            await self()
+        self._hash.update(self._resto)
+        self._resto = b""
+        return self._hash.hexdigest()
+
+
+def _com_hash(request: Request) -> Tuple[Request, HashCorpo]:
+    """
+    Cópia da requisição cujo corpo passa pelo HashCorpo.
+    """
+    hash_corpo = HashCorpo(request.receive, request.headers.get("content-type", ""))
+    return Request(request.scope, receive=hash_corpo), hash_corpo
+
+
+async def _conferir_corpo(request: Request, resultado: Resultado) -> None:
+    """
+    Repetição de uma chave: o corpo tem de ser o mesmo da execução
+    original; outro corpo com a mesma chave é erro do cliente.
+    """
+    if resultado.hash_corpo is None:
+        return
+
+    _, hash_corpo = _com_hash(request)
+    calculado = await hash_corpo.calcular()
+    if calculado is None:
+        raise HTTPException(
+            status_code=413,
+            detail=f"Corpo acima de {REQUISICAO_MAX_BYTES} bytes"
+        )
+    if calculado != resultado.hash_corpo:
+        raise HTTPException(
+            status_code=422,
+            detail="Idempotency-Key já usada com outro corpo de requisição"
+        )
+
+
+# ============================================================
+# EXECUÇÃO
+# ============================================================
+
+def _capturar(resposta: Any) -> Resultado:
+    if isinstance(resposta, Response):
+        headers = {
+            nome: resposta.headers[nome]
+            for nome in CABECALHOS_GUARDADOS
+            if nome in resposta.headers
+        }
+        return Resultado(resposta.status_code, bytes(resposta.body), headers)
+
+    corpo = JSONResponse(jsonable_encoder(resposta)).body
+    return Resultado(200, bytes(corpo))
+
+
+async def _aguardar_outro_processo(chave: str) -> Optional[Resultado]:
+    """
+    A chave está reservada por outro processo: espera a resposta dele.
+    Devolve None se a reserva foi liberada e passou a ser nossa.
+    """
+    limite = time.monotonic() + IDEMPOTENCIA_ESPERA_MAX
+
+    while time.monotonic() < limite:
+        await asyncio.sleep(IDEMPOTENCIA_INTERVALO)
+        linha = await run_in_threadpool(registro.reservar, chave)
+        if linha is None:
+            return None
+        if linha["status"] == CONCLUIDO:
+            return _resultado_da_linha(linha)
+
+    raise HTTPException(
+        status_code=409,
+        detail="Requisição com esta Idempotency-Key ainda em processamento"
+    )
+
+
+async def executar(
+    request: Request,
+    escopo: str,
+    funcao: Callable[[Request], Awaitable[Any]]
+) -> Any:
+    """
+    Executa `funcao(request)` uma única vez por `Idempotency-Key` (por
+    escopo).
+
+    - sem o cabeçalho: executa normalmente
+    - repetição de uma chave concluída: confere o hash do corpo (lido até
+      REQUISICAO_MAX_BYTES) e devolve a resposta guardada
+    - repetição simultânea: espera a primeira execução e devolve o mesmo
+      resultado
+    - repetição com outro corpo: 422
+    - erros 5xx e 413 não são guardados: a próxima repetição executa de novo
+    """
+    valor = request.headers.get(CABECALHO)
+    if valor is None:
+        return await funcao(request)
+
+    valor = valor.strip()
+    if not valor or len(valor) > CHAVE_MAX:
+        raise HTTPException(
+            status_code=400,
+            detail=f"Idempotency-Key deve ter de 1 a {CHAVE_MAX} caracteres"
+        )
+    chave = f"{escopo}:{valor}"
+
+    andamento = _em_andamento.get(chave)
+    if andamento is not None:
+        _contagem["aguardadas"] += 1
+        try:
+            resultado = await asyncio.shield(andamento)
+        except asyncio.CancelledError:
+            if not andamento.cancelled():
+                raise
+            # A primeira execução foi interrompida: esta assume a chave
+            return await executar(request, escopo, funcao)
+
+        await _conferir_corpo(request, resultado)
+        return resultado.resposta(repetida=True)
+
+    futuro: "asyncio.Future[Resultado]" = asyncio.get_running_loop().create_future()
+    _em_andamento[chave] = futuro
+    reservado = False
+
+    try:
+        linha = await run_in_threadpool(registro.reservar, chave)
+        if linha is not None:
+            if linha["status"] == CONCLUIDO:
+                resultado = _resultado_da_linha(linha)
+            else:
+                _contagem["aguardadas"] += 1
+                resultado = await _aguardar_outro_processo(chave)
+
+            if resultado is not None:
+                _contagem["repetidas"] += 1
+                # Antes da conferência: quem espera no Future confere o próprio corpo
+                futuro.set_result(resultado)
+                await _conferir_corpo(request, resultado)
+                return resultado.resposta(repetida=True)
+
+        reservado = True
+        requisicao, hash_corpo = _com_hash(request)
+        try:
+            resultado = _capturar(await funcao(requisicao))
+        except HTTPException as e:
+            # 413: o corpo nem foi lido, outro corpo com a mesma chave pode passar
+            if e.status_code >= 500 or e.status_code == 413:
+                raise
+            # Erro do cliente é determinístico: a repetição recebe o mesmo
+            resultado = _capturar(JSONResponse(
+                {"detail": e.detail},
+                status_code=e.status_code,
+                headers=e.headers
+            ))
+
+        # None (corpo acima do limite que a rota não leu): guarda sem conferência
+        resultado.hash_corpo = await hash_corpo.calcular()
+        await run_in_threadpool(registro.concluir, chave, resultado)
+        reservado = False
+        _contagem["executadas"] += 1
+        futuro.set_result(resultado)
+        return resultado.resposta(repetida=False)
+
+    except BaseException as e:
+        if reservado:
+            _contagem["liberadas"] += 1
+            await asyncio.shield(run_in_threadpool(registro.liberar, chave))
+        if isinstance(e, asyncio.CancelledError):
+            futuro.cancel()
+        elif not futuro.done():
+            futuro.set_exception(e)
+            # Evita o aviso de exceção não lida quando ninguém esperava
+            futuro.exception()
+        raise
+
+    finally:
+        _em_andamento.pop(chave, None)
+
+
+async def iniciar() -> None:
+    expurgadas = await run_in_threadpool(registro.expurgar)
+    if expurgadas:
+        logger.info("%d resposta(s) idempotente(s) expirada(s) removida(s)", expurgadas)
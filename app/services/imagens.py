@@ -0,0 +1,222 @@
+import logging
+import math
+import os
+import time
+from dataclasses import dataclass, field
+from io import BytesIO
+from typing import TYPE_CHECKING, BinaryIO, Dict, Optional, Tuple, Union
+
+from app.services import metricas
+
+if TYPE_CHECKING:  # PIL é importado no primeiro uso
+    from PIL import Image
+
+logger = logging.getLogger(__name__)
+
+
+# ============================================================
+# PERFIS DE QUALIDADE
+# ============================================================
+
+@dataclass(frozen=True)
+class PerfilImagem:
+    dpi: int                   # resolução alvo no tamanho impresso
+    qualidade_jpeg: int        # 1-95
+    max_cores_paleta: int = 256  # até quantas cores vale PNG com paleta
+
+
+PERFIS: Dict[str, PerfilImagem] = {
+    "economico": PerfilImagem(dpi=110, qualidade_jpeg=65),
+    "padrao": PerfilImagem(dpi=150, qualidade_jpeg=80),
+    "alta": PerfilImagem(dpi=220, qualidade_jpeg=90),
+}
+
+IMAGEM_PERFIL = os.getenv("IMAGEM_PERFIL", "padrao")
+
+
+def obter_perfil(nome: Optional[str] = None) -> PerfilImagem:
+    nome = nome or IMAGEM_PERFIL
+    if nome not in PERFIS:
+        raise ValueError(f"Perfil de imagem desconhecido: {nome}")
+    return PERFIS[nome]
+
+
+# ============================================================
+# RESULTADO / RELATÓRIO
+# ============================================================
+
+@dataclass
+class ImagemNormalizada:
+    dados: bytes
+    mime: str
+    largura: int
+    altura: int
+    bytes_antes: int
+    bytes_depois: int
+    tempo_ms: float
+
+    def stream(self) -> BytesIO:
+        return BytesIO(self.dados)
+
+
+@dataclass
+class RelatorioPdf:
+    """
+    Tamanho das imagens antes/depois da normalização e tempo de render.
+    """
+    documento: str
+    imagens: int = 0
+    bytes_antes: int = 0
+    bytes_depois: int = 0
+    tempo_imagens_ms: float = 0.0
+    tempo_render_ms: float = 0.0
+    bytes_pdf: int = 0
+    _inicio: float = field(default_factory=time.perf_counter, repr=False)
+
+    def adicionar(self, imagem: ImagemNormalizada) -> None:
+        self.imagens += 1
+        self.bytes_antes += imagem.bytes_antes
+        self.bytes_depois += imagem.bytes_depois
+        self.tempo_imagens_ms += imagem.tempo_ms
+
+    def finalizar(self, bytes_pdf: int) -> "RelatorioPdf":
+        self.bytes_pdf = bytes_pdf
+        self.tempo_render_ms = (time.perf_counter() - self._inicio) * 1000
+        return self
+
+    def logar(self) -> None:
+        # Separado de finalizar(): o render roda no pool de processos,
+        # o log e as métricas ficam no processo da API
+        metricas.registrar_etapa(
+            "pdf_imagens", self.tempo_imagens_ms / 1000, self.bytes_antes
+        )
+        logger.info(
+            "pdf=%s imagens=%d antes=%dB depois=%dB pdf=%dB "
+            "tempo_imagens=%.1fms tempo_render=%.1fms",
+            self.documento, self.imagens, self.bytes_antes, self.bytes_depois,
+            self.bytes_pdf, self.tempo_imagens_ms, self.tempo_render_ms
+        )
+
+    def as_dict(self) -> dict:
+        return {
+            "imagens": self.imagens,
+            "bytes_antes": self.bytes_antes,
+            "bytes_depois": self.bytes_depois,
+            "bytes_pdf": self.bytes_pdf,
+            "tempo_imagens_ms": round(self.tempo_imagens_ms, 1),
+            "tempo_render_ms": round(self.tempo_render_ms, 1),
+        }
+
+
+# ============================================================
+# PIPELINE
+# ============================================================
+
+def _tamanho_fonte(fonte: Union[bytes, BinaryIO]) -> int:
+    if isinstance(fonte, (bytes, bytearray)):
+        return len(fonte)
+    atual = fonte.tell()
+    fonte.seek(0, os.SEEK_END)
+    tamanho = fonte.tell()
+    fonte.seek(atual)
+    return tamanho - atual
+
+
+def _e_line_art(img: "Image.Image", max_cores: int) -> bool:
+    """
+    Poucas cores distintas (texto, assinaturas, formulários) → paleta.
+    A contagem é feita numa miniatura para não varrer a imagem inteira.
+    """
+    amostra = img.copy()
+    amostra.thumbnail((256, 256))
+    return amostra.convert("RGBA").getcolors(maxcolors=max_cores) is not None
+
+
+def _achatar(img: "Image.Image", fundo: Tuple[int, int, int]) -> "Image.Image":
+    from PIL import Image
+
+    if img.mode in ("RGBA", "LA") or (img.mode == "P" and "transparency" in img.info):
+        rgba = img.convert("RGBA")
+        base = Image.new("RGB", rgba.size, fundo)
+        base.paste(rgba, mask=rgba.getchannel("A"))
+        return base
+    return img.convert("RGB")
+
+
+def normalizar_imagem(
+    fonte: Union[bytes, BinaryIO],
+    largura_pt: float,
+    altura_pt: float,
+    perfil: Optional[PerfilImagem] = None,
+    fundo: Tuple[int, int, int] = (255, 255, 255)
+) -> ImagemNormalizada:
+    """
+    Decodifica uma vez, aplica a orientação EXIF, reduz para o DPI alvo
+    da caixa onde a imagem será desenhada (largura_pt x altura_pt) e
+    recodifica como JPEG ou, para line-art, PNG com paleta.
+
+    Transparência é achatada sobre `fundo` (a cor atrás da imagem no PDF).
+    """
+    from PIL import Image, ImageOps
+
+    perfil = perfil or obter_perfil()
+    inicio = time.perf_counter()
+
+    bytes_antes = _tamanho_fonte(fonte)
+    if isinstance(fonte, (bytes, bytearray)):
+        fonte = BytesIO(fonte)
+
+    alvo = (
+        max(1, math.ceil(largura_pt / 72 * perfil.dpi)),
+        max(1, math.ceil(altura_pt / 72 * perfil.dpi)),
+    )
+
+    with Image.open(fonte) as original:
+        # Atalho de decodificação reduzida (JPEG); lado maior cobre
+        # a caixa em qualquer orientação EXIF
+        lado = max(alvo)
+        original.draft("RGB", (lado, lado))
+
+        img = ImageOps.exif_transpose(original)
+
+        # ---------------------------------
+        # 1. Downsample para o DPI da caixa
+        # ---------------------------------
+        if img.width > alvo[0] or img.height > alvo[1]:
+            img.thumbnail(alvo, Image.LANCZOS)
+
+        # ---------------------------------
+        # 2. Recodifica
+        # ---------------------------------
+        saida = BytesIO()
+
+        if _e_line_art(img, perfil.max_cores_paleta):
+            paleta = _achatar(img, fundo).quantize(
+                colors=perfil.max_cores_paleta,
+                method=Image.Quantize.FASTOCTREE
+            )
+            paleta.save(saida, format="PNG")
+            mime = "image/png"
+        else:
+            _achatar(img, fundo).save(
+                saida,
+                format="JPEG",
+                quality=perfil.qualidade_jpeg,
+                optimize=True,
+                progressive=True
+            )
+            mime = "image/jpeg"
+
+        largura, altura = img.size
+
+    dados = saida.getvalue()
+
+    return ImagemNormalizada(
+        dados=dados,
+        mime=mime,
+        largura=largura,
+        altura=altura,
+        bytes_antes=bytes_antes,
+        bytes_depois=len(dados),
+        tempo_ms=(time.perf_counter() - inicio) * 1000
+    )
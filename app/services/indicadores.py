@@ -0,0 +1,466 @@
+"""
+Indicadores de NPS a partir de rollups pré-agregados.
+
+Cada /nps/finalizar grava a resposta e soma a contribuição dela nos
+rollups por dia, semana (segunda-feira) e mês. As consultas leem só os
+rollups, então custam o mesmo com 100 ou 1 milhão de processos.
+
+Recalcular (backfill) refaz os rollups com GROUP BY sobre as respostas,
+sem iterar linha a linha em Python:
+
+    python -m app.services.indicadores              # só recalcula
+    python -m app.services.indicadores --importar   # lê antes os nps.json do storage
+"""
+import asyncio
+import json
+import logging
+import os
+import sqlite3
+import threading
+import time
+from datetime import date, timedelta
+from typing import Dict, Iterable, List, Optional, Tuple
+
+from fastapi.concurrency import run_in_threadpool
+
+from app.services import database as db, entrega
+from app.services.upload import UploadError, baixar
+
+logger = logging.getLogger(__name__)
+
+INDICADORES_DB = os.getenv("INDICADORES_DB", os.path.join("data", "indicadores.sqlite3"))
+# Downloads simultâneos de nps.json na importação do histórico
+INDICADORES_IMPORTACAO_CONCORRENCIA = int(
+    os.getenv("INDICADORES_IMPORTACAO_CONCORRENCIA", "8")
+)
+# Processos por página (keyset) na importação
+INDICADORES_IMPORTACAO_PAGINA = 500
+
+GRANULARIDADES = ("dia", "semana", "mes")
+
+# Período de cada granularidade, em SQL (recalcular) e em Python (incremental)
+_PERIODO_SQL = {
+    "dia": "dia",
+    "semana": "date(dia, 'weekday 0', '-6 days')",
+    "mes": "strftime('%Y-%m', dia)",
+}
+
+
+def periodo(granularidade: str, dia: date) -> str:
+    if granularidade == "dia":
+        return dia.isoformat()
+    if granularidade == "semana":
+        return (dia - timedelta(days=dia.weekday())).isoformat()
+    if granularidade == "mes":
+        return dia.strftime("%Y-%m")
+    raise ValueError(f"Granularidade inválida: {granularidade}")
+
+
+def classificar(nps: int) -> Tuple[int, int, int]:
+    """
+    (promotor, neutro, detrator) de uma nota 0-10.
+    """
+    return int(nps >= 9), int(7 <= nps <= 8), int(nps <= 6)
+
+
+def criterios_numericos(avaliacoes: dict) -> Dict[str, float]:
+    """
+    Só as notas numéricas de `avaliacoes` ("4" vira 4; texto é ignorado).
+    """
+    notas: Dict[str, float] = {}
+    for criterio, valor in (avaliacoes or {}).items():
+        if isinstance(valor, bool):
+            continue
+        try:
+            notas[str(criterio)] = float(valor)
+        except (TypeError, ValueError):
+            continue
+    return notas
+
+
+# ============================================================
+# ROLLUPS (SQLITE)
+# ============================================================
+
+class RollupsNps:
+    """
+    Respostas de NPS (uma por processo) e os agregados derivados delas.
+    """
+
+    def __init__(self, caminho: str):
+        self.caminho = caminho
+        self._lock = threading.Lock()
+        self._conn: Optional[sqlite3.Connection] = None
+
+    def _conexao(self) -> sqlite3.Connection:
+        if self._conn is None:
+            os.makedirs(os.path.dirname(self.caminho) or ".", exist_ok=True)
+            self._conn = sqlite3.connect(
+                self.caminho,
+                check_same_thread=False,
+                timeout=30,
+                isolation_level=None
+            )
+            self._conn.row_factory = sqlite3.Row
+            self._conn.execute("PRAGMA journal_mode=WAL")
+            self._conn.executescript(
+                "CREATE TABLE IF NOT EXISTS nps_respostas ("
+                " processo_id TEXT PRIMARY KEY,"
+                " dia TEXT NOT NULL,"
+                " nps INTEGER NOT NULL,"
+                " avaliacoes TEXT NOT NULL,"
+                " registrado_em REAL NOT NULL);"
+                "CREATE TABLE IF NOT EXISTS nps_rollup ("
+                " granularidade TEXT NOT NULL,"
+                " periodo TEXT NOT NULL,"
+                " respostas INTEGER NOT NULL,"
+                " promotores INTEGER NOT NULL,"
+                " neutros INTEGER NOT NULL,"
+                " detratores INTEGER NOT NULL,"
+                " soma_nps INTEGER NOT NULL,"
+                " PRIMARY KEY (granularidade, periodo));"
+                "CREATE TABLE IF NOT EXISTS nps_rollup_criterios ("
+                " granularidade TEXT NOT NULL,"
+                " periodo TEXT NOT NULL,"
+                " criterio TEXT NOT NULL,"
+                " quantidade INTEGER NOT NULL,"
+                " soma REAL NOT NULL,"
+                " PRIMARY KEY (granularidade, periodo, criterio));"
+            )
+        return self._conn
+
+    # ---------------------------------
+    # Incremental
+    # ---------------------------------
+    @staticmethod
+    def _somar(
+        conn: sqlite3.Connection,
+        dia: date,
+        nps: int,
+        notas: Dict[str, float],
+        sinal: int
+    ) -> None:
+        promotor, neutro, detrator = classificar(nps)
+
+        for granularidade in GRANULARIDADES:
+            chave = periodo(granularidade, dia)
+            conn.execute(
+                "INSERT INTO nps_rollup VALUES (?, ?, ?, ?, ?, ?, ?)"
+                " ON CONFLICT (granularidade, periodo) DO UPDATE SET"
+                " respostas = respostas + excluded.respostas,"
+                " promotores = promotores + excluded.promotores,"
+                " neutros = neutros + excluded.neutros,"
+                " detratores = detratores + excluded.detratores,"
+                " soma_nps = soma_nps + excluded.soma_nps",
+                (
+                    granularidade, chave, sinal, sinal * promotor,
+                    sinal * neutro, sinal * detrator, sinal * nps,
+                )
+            )
+            conn.executemany(
+                "INSERT INTO nps_rollup_criterios VALUES (?, ?, ?, ?, ?)"
+                " ON CONFLICT (granularidade, periodo, criterio) DO UPDATE SET"
+                " quantidade = quantidade + excluded.quantidade,"
+                " soma = soma + excluded.soma",
+                [
+                    (granularidade, chave, criterio, sinal, sinal * nota)
+                    for criterio, nota in notas.items()
+                ]
+            )
+
+    def registrar(self, processo_id: str, dia: date, nps: int, avaliacoes: dict) -> None:
+        """
+        Grava a resposta do processo e atualiza os rollups. Uma nova
+        finalização do mesmo processo substitui a anterior (desconta a
+        contribuição antiga antes de somar a nova).
+        """
+        notas = criterios_numericos(avaliacoes)
+
+        with self._lock:
+            conn = self._conexao()
+            conn.execute("BEGIN IMMEDIATE")
+            try:
+                anterior = conn.execute(
+                    "SELECT dia, nps, avaliacoes FROM nps_respostas WHERE processo_id = ?",
+                    (processo_id,)
+                ).fetchone()
+                if anterior is not None:
+                    self._somar(
+                        conn,
+                        date.fromisoformat(anterior["dia"]),
+                        anterior["nps"],
+                        json.loads(anterior["avaliacoes"]),
+                        -1
+                    )
+
+                conn.execute(
+                    "INSERT OR REPLACE INTO nps_respostas VALUES (?, ?, ?, ?, ?)",
+                    (processo_id, dia.isoformat(), nps, json.dumps(notas), time.time())
+                )
+                self._somar(conn, dia, nps, notas, 1)
+                conn.execute("COMMIT")
+
+            except BaseException:
+                conn.execute("ROLLBACK")
+                raise
+
+    # ---------------------------------
+    # Backfill
+    # ---------------------------------
+    def substituir_respostas(
+        self,
+        respostas: Iterable[Tuple[str, date, int, dict]]
+    ) -> None:
+        """
+        Carga em lote (importação do histórico). Os rollups só ficam
+        corretos depois de recalcular().
+        """
+        agora = time.time()
+        with self._lock:
+            conn = self._conexao()
+            conn.execute("BEGIN IMMEDIATE")
+            try:
+                conn.executemany(
+                    "INSERT OR REPLACE INTO nps_respostas VALUES (?, ?, ?, ?, ?)",
+                    [
+                        (
+                            processo_id, dia.isoformat(), nps,
+                            json.dumps(criterios_numericos(avaliacoes)), agora,
+                        )
+                        for processo_id, dia, nps, avaliacoes in respostas
+                    ]
+                )
+                conn.execute("COMMIT")
+            except BaseException:
+                conn.execute("ROLLBACK")
+                raise
+
+    def recalcular(self) -> int:
+        """
+        Refaz todos os rollups a partir de nps_respostas (uma agregação
+        GROUP BY por granularidade, dentro de uma transação).
+        """
+        with self._lock:
+            conn = self._conexao()
+            conn.execute("BEGIN IMMEDIATE")
+            try:
+                conn.execute("DELETE FROM nps_rollup")
+                conn.execute("DELETE FROM nps_rollup_criterios")
+
+                for granularidade, expressao in _PERIODO_SQL.items():
+                    conn.execute(
+                        "INSERT INTO nps_rollup"
+                        f" SELECT ?, {expressao},"
+                        " COUNT(*), SUM(nps >= 9), SUM(nps BETWEEN 7 AND 8),"
+                        " SUM(nps <= 6), SUM(nps)"
+                        f" FROM nps_respostas GROUP BY {expressao}",
+                        (granularidade,)
+                    )
+                    conn.execute(
+                        "INSERT INTO nps_rollup_criterios"
+                        f" SELECT ?, {expressao}, j.key, COUNT(*), SUM(j.value)"
+                        " FROM nps_respostas, json_each(nps_respostas.avaliacoes) AS j"
+                        f" GROUP BY {expressao}, j.key",
+                        (granularidade,)
+                    )
+
+                total = conn.execute("SELECT COUNT(*) FROM nps_respostas").fetchone()[0]
+                conn.execute("COMMIT")
+                return total
+
+            except BaseException:
+                conn.execute("ROLLBACK")
+                raise
+
+    # ---------------------------------
+    # Consulta
+    # ---------------------------------
+    def consultar(self, granularidade: str, inicio: date, fim: date) -> dict:
+        if granularidade not in GRANULARIDADES:
+            raise ValueError(f"Granularidade inválida: {granularidade}")
+
+        faixa = (granularidade, periodo(granularidade, inicio), periodo(granularidade, fim))
+
+        with self._lock:
+            conn = self._conexao()
+            linhas = conn.execute(
+                "SELECT * FROM nps_rollup"
+                " WHERE granularidade = ? AND periodo BETWEEN ? AND ?"
+                " AND respostas > 0 ORDER BY periodo",
+                faixa
+            ).fetchall()
+            criterios = conn.execute(
+                "SELECT periodo, criterio, quantidade, soma FROM nps_rollup_criterios"
+                " WHERE granularidade = ? AND periodo BETWEEN ? AND ?"
+                " AND quantidade > 0",
+                faixa
+            ).fetchall()
+
+        por_periodo: Dict[str, Dict[str, Tuple[int, float]]] = {}
+        for c in criterios:
+            por_periodo.setdefault(c["periodo"], {})[c["criterio"]] = (
+                c["quantidade"], c["soma"]
+            )
+
+        periodos = [
+            _resumo(dict(linha), por_periodo.get(linha["periodo"], {}))
+            for linha in linhas
+        ]
+
+        # Total da faixa: soma dos próprios rollups (nº de períodos, não de processos)
+        total = {"respostas": 0, "promotores": 0, "neutros": 0, "detratores": 0, "soma_nps": 0}
+        total_criterios: Dict[str, List[float]] = {}
+        for linha in linhas:
+            for campo in total:
+                total[campo] += linha[campo]
+        for notas in por_periodo.values():
+            for criterio, (quantidade, soma) in notas.items():
+                acumulado = total_criterios.setdefault(criterio, [0, 0.0])
+                acumulado[0] += quantidade
+                acumulado[1] += soma
+
+        return {
+            "granularidade": granularidade,
+            "inicio": inicio.isoformat(),
+            "fim": fim.isoformat(),
+            "total": _resumo(
+                total, {k: (int(v[0]), v[1]) for k, v in total_criterios.items()}
+            ),
+            "periodos": periodos,
+        }
+
+    def estatisticas(self) -> Dict[str, int]:
+        with self._lock:
+            conn = self._conexao()
+            return {
+                "respostas": conn.execute("SELECT COUNT(*) FROM nps_respostas").fetchone()[0],
+                "rollups": conn.execute("SELECT COUNT(*) FROM nps_rollup").fetchone()[0],
+            }
+
+
+def _resumo(linha: dict, criterios: Dict[str, Tuple[int, float]]) -> dict:
+    respostas = linha["respostas"]
+    resumo = {
+        "respostas": respostas,
+        "promotores": linha["promotores"],
+        "neutros": linha["neutros"],
+        "detratores": linha["detratores"],
+        # % promotores - % detratores (-100 a 100)
+        "nps": round((linha["promotores"] - linha["detratores"]) * 100 / respostas, 1)
+        if respostas else None,
+        "media_nps": round(linha["soma_nps"] / respostas, 2) if respostas else None,
+        "criterios": {
+            criterio: round(soma / quantidade, 2)
+            for criterio, (quantidade, soma) in sorted(criterios.items())
+        },
+    }
+    if "periodo" in linha:
+        resumo = {"periodo": linha["periodo"], **resumo}
+    return resumo
+
+
+rollups = RollupsNps(INDICADORES_DB)
+
+
+# ============================================================
+# API
+# ============================================================
+
+async def registrar(processo_id: str, dia: date, nps: int, avaliacoes: dict) -> None:
+    """
+    Chamado na finalização. Falha nos indicadores nunca derruba a entrega.
+    """
+    try:
+        await run_in_threadpool(rollups.registrar, processo_id, dia, nps, avaliacoes)
+    except Exception:
+        logger.exception("Falha ao atualizar indicadores de NPS (%s)", processo_id)
+
+
+async def consultar(granularidade: str, inicio: date, fim: date) -> dict:
+    return await run_in_threadpool(rollups.consultar, granularidade, inicio, fim)
+
+
+async def importar_historico(
+    concorrencia: int = INDICADORES_IMPORTACAO_CONCORRENCIA
+) -> int:
+    """
+    Lê os nps.json dos processos já finalizados e recalcula os rollups.
+    Os processos vêm em páginas keyset por id (sem esbarrar no limite de
+    linhas do PostgREST), baixadas uma página por vez.
+    """
+    semaforo = asyncio.Semaphore(concorrencia)
+
+    async def ler(processo: dict) -> Optional[Tuple[str, date, int, dict]]:
+        async with semaforo:
+            try:
+                dados = json.loads(
+                    await baixar(f"{entrega.pasta_processo(processo)}/nps/nps.json")
+                )
+            except UploadError as e:
+                if e.status_code == 404:
+                    return None
+                raise
+
+        nota = int(dados["nps"])
+        if not 0 <= nota <= 10:
+            logger.warning("NPS fora de 0-10 ignorado: %s = %s", processo["id"], nota)
+            return None
+
+        dia = processo.get("finalizado_em")
+        return (
+            processo["id"],
+            date.fromisoformat(dia[:10]) if dia else date.today(),
+            nota,
+            dados.get("avaliacoes") or {},
+        )
+
+    respostas: List[Tuple[str, date, int, dict]] = []
+    ultimo = None
+    while True:
+        filtros = {"status": db.eq("finalizado")}
+        if ultimo is not None:
+            filtros["or"] = db.apos(("id",), (ultimo,), descendente=False)
+
+        pagina = await db.select(
+            "processos",
+            "id,processo_id,finalizado_em",
+            filtros,
+            ordem="id.asc",
+            limite=INDICADORES_IMPORTACAO_PAGINA
+        )
+        respostas.extend(r for r in await asyncio.gather(*map(ler, pagina)) if r)
+
+        if len(pagina) < INDICADORES_IMPORTACAO_PAGINA:
+            break
+        ultimo = pagina[-1]["id"]
+
+    await run_in_threadpool(rollups.substituir_respostas, respostas)
+    return await run_in_threadpool(rollups.recalcular)
+
+
+if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Rollups dos indicadores de NPS")
+    parser.add_argument(
+        "--importar",
+        action="store_true",
+        help="lê os nps.json dos processos finalizados antes de recalcular"
+    )
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO)
+
+    if args.importar:
+        async def _importar() -> int:
+            from app.services.supabase_client import close_async_client
+            try:
+                return await importar_historico()
+            finally:
+                await close_async_client()
+
+        total = asyncio.run(_importar())
+    else:
+        total = rollups.recalcular()
+
+    logger.info("Rollups de NPS recalculados a partir de %d resposta(s)", total)
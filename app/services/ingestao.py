@@ -0,0 +1,310 @@
+import asyncio
+import json
+import logging
+import os
+import time
+from collections import deque
+from typing import Deque, List, Optional
+
+from fastapi.concurrency import run_in_threadpool
+
+from app.services import database as db
+
+logger = logging.getLogger(__name__)
+
+# Linhas aceitas e ainda não gravadas (acima disso a API responde 503)
+RESPOSTAS_FILA_MAX = int(os.getenv("RESPOSTAS_FILA_MAX", "10000"))
+# Linhas por INSERT
+RESPOSTAS_LOTE = int(os.getenv("RESPOSTAS_LOTE", "500"))
+# Espera máxima para completar um lote, em segundos
+RESPOSTAS_INTERVALO = float(os.getenv("RESPOSTAS_INTERVALO", "0.5"))
+# Linhas que o banco recusou/não recebeu; regravadas depois
+RESPOSTAS_SPILL = os.getenv(
+    "RESPOSTAS_SPILL",
+    os.path.join("data", "respostas.spill.jsonl")
+)
+RESPOSTAS_SPILL_RETRY = float(os.getenv("RESPOSTAS_SPILL_RETRY", "30"))
+
+# Sufixos (sobre o spill) das linhas ilegíveis e das recusadas pelo banco
+SUFIXO_CORROMPIDAS = ".corrupt"
+SUFIXO_RECUSADAS = ".rejected"
+
+
+class FilaCheia(Exception):
+    pass
+
+
+# ============================================================
+# ARQUIVO DE SPILL (JSONL)
+# ============================================================
+
+def _anexar_spill(caminho: str, linhas: List[dict]) -> None:
+    os.makedirs(os.path.dirname(caminho) or ".", exist_ok=True)
+    conteudo = "".join(
+        json.dumps(linha, ensure_ascii=False, default=str) + "\n" for linha in linhas
+    )
+    with open(caminho, "a", encoding="utf-8") as f:
+        f.write(conteudo)
+        f.flush()
+        os.fsync(f.fileno())
+
+
+def _reservar_spill(caminho: str) -> Optional[str]:
+    """
+    Move o spill para um nome exclusivo deste processo (rename atômico):
+    novas falhas continuam anexando no arquivo original.
+    """
+    reservado = f"{caminho}.{os.getpid()}.replay"
+    if os.path.exists(reservado):
+        # Sobra de um replay deste processo que falhou no meio: termina ele
+        # antes (os.replace sobrescreveria as linhas)
+        return reservado
+    try:
+        os.replace(caminho, reservado)
+    except FileNotFoundError:
+        return None
+    return reservado
+
+
+def _pid_vivo(pid: str) -> bool:
+    try:
+        os.kill(int(pid), 0)
+        return True
+    except (ValueError, ProcessLookupError):
+        return False
+    except PermissionError:
+        return True
+
+
+def _ler_spill(caminho: str, corrompidas: str) -> List[dict]:
+    """
+    Linhas válidas do spill. As ilegíveis (ex.: a última, truncada por uma
+    queda no meio de _anexar_spill) vão para `corrompidas`, sem travar o resto.
+    """
+    linhas: List[dict] = []
+    invalidas: List[str] = []
+
+    with open(caminho, "r", encoding="utf-8", errors="replace") as f:
+        for texto in f:
+            if not texto.strip():
+                continue
+            try:
+                linha = json.loads(texto)
+            except ValueError:
+                linha = None
+            if isinstance(linha, dict):
+                linhas.append(linha)
+            else:
+                invalidas.append(texto if texto.endswith("\n") else texto + "\n")
+
+    if invalidas:
+        logger.warning(
+            "Spill %s: %d linha(s) ilegível(is) movida(s) para %s",
+            caminho, len(invalidas), corrompidas
+        )
+        with open(corrompidas, "a", encoding="utf-8") as f:
+            f.writelines(invalidas)
+            f.flush()
+            os.fsync(f.fileno())
+
+    return linhas
+
+
+# ============================================================
+# BUFFER DE ESCRITA
+# ============================================================
+
+class BufferInsercao:
+    """
+    Write-behind: a requisição termina ao entrar na fila; um loop de fundo
+    grava em lotes (por tamanho ou tempo) com um INSERT por lote.
+
+    Linhas na fila vivem só em memória até o INSERT; falhas do banco vão
+    para o spill em disco e são regravadas depois. Um lote que o banco
+    recusa (4xx) é dividido ao meio até isolar as linhas inválidas, que
+    vão para o arquivo de recusadas; as demais são gravadas.
+    """
+
+    def __init__(
+        self,
+        tabela: str,
+        max_fila: int,
+        lote: int,
+        intervalo: float,
+        spill: str,
+        spill_retry: float
+    ):
+        self.tabela = tabela
+        self.lote = max(1, lote)
+        self.intervalo = intervalo
+        self.spill = spill
+        self.spill_retry = spill_retry
+        self.corrompidas = spill + SUFIXO_CORROMPIDAS
+        self.recusadas = spill + SUFIXO_RECUSADAS
+        self._fila: asyncio.Queue = asyncio.Queue(maxsize=max_fila)
+        self._task: Optional[asyncio.Task] = None
+        self._gravando: Optional[asyncio.Task] = None
+        self._coletando: List[dict] = []
+        self._proximo_replay = 0.0
+
+    # ---------------------------------
+    # Entrada
+    # ---------------------------------
+    def adicionar(self, linhas: List[dict]) -> None:
+        """
+        Tudo ou nada: se o lote inteiro não cabe, nada é enfileirado.
+        """
+        if self._fila.maxsize and self._fila.qsize() + len(linhas) > self._fila.maxsize:
+            raise FilaCheia(f"Fila de {self.tabela} cheia")
+
+        for linha in linhas:
+            self._fila.put_nowait(linha)
+
+    # ---------------------------------
+    # Gravação
+    # ---------------------------------
+    async def _proximo_lote(self) -> List[dict]:
+        # Atributo, não variável local: se o loop for cancelado no meio
+        # da coleta, parar() ainda enxerga as linhas já retiradas da fila
+        self._coletando = linhas = [await self._fila.get()]
+        loop = asyncio.get_running_loop()
+        limite = loop.time() + self.intervalo
+
+        while len(linhas) < self.lote:
+            try:
+                linhas.append(self._fila.get_nowait())
+                continue
+            except asyncio.QueueEmpty:
+                pass
+
+            restante = limite - loop.time()
+            if restante <= 0:
+                break
+            try:
+                linhas.append(await asyncio.wait_for(self._fila.get(), restante))
+            except asyncio.TimeoutError:
+                break
+
+        return linhas
+
+    async def _recusar(self, linha: dict, erro: Exception) -> None:
+        logger.error(
+            "Linha recusada por %s (%s); movida para %s", self.tabela, erro, self.recusadas
+        )
+        await run_in_threadpool(_anexar_spill, self.recusadas, [linha])
+
+    async def _gravar(self, linhas: List[dict]) -> bool:
+        partes: Deque[List[dict]] = deque(
+            linhas[inicio:inicio + self.lote] for inicio in range(0, len(linhas), self.lote)
+        )
+        try:
+            while partes:
+                parte = partes[0]
+                try:
+                    await db.insert(self.tabela, parte)
+                except db.SupabaseError as e:
+                    if not e.recusado:
+                        raise
+                    # Bisseção: só a linha inválida fica de fora
+                    partes.popleft()
+                    if len(parte) == 1:
+                        await self._recusar(parte[0], e)
+                    else:
+                        meio = len(parte) // 2
+                        partes.extendleft([parte[meio:], parte[:meio]])
+                    continue
+                partes.popleft()
+            return True
+
+        except Exception:
+            pendentes = [linha for parte in partes for linha in parte]
+            logger.exception(
+                "INSERT em lote de %s falhou; %d linha(s) no spill",
+                self.tabela, len(pendentes)
+            )
+            await run_in_threadpool(_anexar_spill, self.spill, pendentes)
+            self._proximo_replay = time.monotonic() + self.spill_retry
+            return False
+
+    async def _regravar_spill(self) -> None:
+        if time.monotonic() < self._proximo_replay:
+            return
+        self._proximo_replay = time.monotonic() + self.spill_retry
+
+        reservado = await run_in_threadpool(_reservar_spill, self.spill)
+        if reservado is None:
+            return
+
+        linhas = await run_in_threadpool(_ler_spill, reservado, self.corrompidas)
+        # Em caso de nova falha _gravar devolve as linhas ao spill
+        await self._gravar(linhas)
+        await run_in_threadpool(os.remove, reservado)
+
+        logger.info("Spill de %s: %d linha(s) reprocessada(s)", self.tabela, len(linhas))
+
+    async def _loop(self) -> None:
+        while True:
+            try:
+                linhas = await self._proximo_lote()
+                # Task própria: parar() espera o lote em voo em vez de perdê-lo
+                self._gravando = asyncio.create_task(self._gravar(linhas))
+                self._coletando = []
+                if await asyncio.shield(self._gravando):
+                    await self._regravar_spill()
+            except Exception:
+                # Ex.: disco cheio no spill. Uma volta perdida não pode parar
+                # o loop (a fila encheria e a API ficaria em 503)
+                logger.exception("Gravação em lote de %s falhou", self.tabela)
+
+    def estatisticas(self) -> dict:
+        return {"fila": self._fila.qsize(), "max_fila": self._fila.maxsize}
+
+    # ---------------------------------
+    # Ciclo de vida
+    # ---------------------------------
+    async def iniciar(self) -> None:
+        # Spills órfãos de processos anteriores voltam para o arquivo principal
+        pasta = os.path.dirname(self.spill) or "."
+        nome = os.path.basename(self.spill)
+        if os.path.isdir(pasta):
+            for arquivo in os.listdir(pasta):
+                if not (arquivo.startswith(nome + ".") and arquivo.endswith(".replay")):
+                    continue
+                if _pid_vivo(arquivo[len(nome) + 1:-len(".replay")]):
+                    continue
+                caminho = os.path.join(pasta, arquivo)
+                linhas = await run_in_threadpool(_ler_spill, caminho, self.corrompidas)
+                await run_in_threadpool(_anexar_spill, self.spill, linhas)
+                await run_in_threadpool(os.remove, caminho)
+
+        self._task = asyncio.create_task(self._loop())
+
+    async def parar(self) -> None:
+        """
+        Para o loop e grava o que restou na fila (ou manda para o spill).
+        """
+        if self._task is not None:
+            self._task.cancel()
+            await asyncio.gather(self._task, return_exceptions=True)
+            self._task = None
+
+        if self._gravando is not None:
+            await asyncio.gather(self._gravando, return_exceptions=True)
+            self._gravando = None
+
+        restantes, self._coletando = self._coletando, []
+        while not self._fila.empty():
+            restantes.append(self._fila.get_nowait())
+
+        if restantes:
+            await self._gravar(restantes)
+
+
+respostas = BufferInsercao(
+    "respostas",
+    max_fila=RESPOSTAS_FILA_MAX,
+    lote=RESPOSTAS_LOTE,
+    intervalo=RESPOSTAS_INTERVALO,
+    spill=RESPOSTAS_SPILL,
+    spill_retry=RESPOSTAS_SPILL_RETRY
+)
@@ -0,0 +1,362 @@
+import asyncio
+import json
+import logging
+import os
+import shutil
+import socket
+import sqlite3
+import threading
+import time
+import uuid
+from typing import Awaitable, Callable, Dict, List, Optional
+
+from fastapi import HTTPException, Request
+from fastapi.concurrency import run_in_threadpool
+from fastapi.responses import JSONResponse
+
+from app.services import metricas
+from app.services.entrada import ArquivoEntrada
+
+logger = logging.getLogger(__name__)
+
+JOBS_DB = os.getenv("JOBS_DB", os.path.join("data", "jobs.sqlite3"))
+JOBS_DIR = os.getenv("JOBS_DIR", os.path.join("data", "jobs"))
+
+# Workers dentro da API (0 = só o processo dedicado `python -m app.worker`)
+JOBS_WORKERS = int(os.getenv("JOBS_WORKERS", "2"))
+# Espera máxima ociosa; só importa para jobs enfileirados por OUTRO processo
+JOBS_ESPERA_MAX = float(os.getenv("JOBS_ESPERA_MAX", "5"))
+# Job "executando" sem dono vivo por mais que isso volta para a fila
+JOBS_LEASE_SEGUNDOS = int(os.getenv("JOBS_LEASE_SEGUNDOS", "900"))
+JOBS_RETENCAO_DIAS = int(os.getenv("JOBS_RETENCAO_DIAS", "7"))
+
+PENDENTE = "pendente"
+EXECUTANDO = "executando"
+CONCLUIDO = "concluido"
+ERRO = "erro"
+
+Handler = Callable[[dict, Dict[str, ArquivoEntrada]], Awaitable[dict]]
+
+_handlers: Dict[str, Handler] = {}
+_DONO = f"{socket.gethostname()}:{os.getpid()}"
+
+
+# ============================================================
+# FILA (SQLITE)
+# ============================================================
+
+class FilaJobs:
+    """
+    Fila persistente: sobrevive a restarts e pode ser compartilhada por
+    vários processos da mesma máquina (API e workers dedicados).
+    """
+
+    def __init__(self, caminho: str, pasta: str):
+        self.caminho = caminho
+        self.pasta = pasta
+        self._lock = threading.Lock()
+        self._conn: Optional[sqlite3.Connection] = None
+
+    def _conexao(self) -> sqlite3.Connection:
+        if self._conn is None:
+            os.makedirs(os.path.dirname(self.caminho) or ".", exist_ok=True)
+            os.makedirs(self.pasta, exist_ok=True)
+            self._conn = sqlite3.connect(
+                self.caminho,
+                check_same_thread=False,
+                timeout=30,
+                isolation_level=None
+            )
+            self._conn.row_factory = sqlite3.Row
+            self._conn.execute("PRAGMA journal_mode=WAL")
+            self._conn.execute(
+                "CREATE TABLE IF NOT EXISTS jobs ("
+                " id TEXT PRIMARY KEY,"
+                " tipo TEXT NOT NULL,"
+                " status TEXT NOT NULL,"
+                " payload TEXT NOT NULL,"
+                " resultado TEXT,"
+                " erro TEXT,"
+                " status_code INTEGER,"
+                " tentativas INTEGER NOT NULL DEFAULT 0,"
+                " dono TEXT,"
+                " criado_em REAL NOT NULL,"
+                " atualizado_em REAL NOT NULL)"
+            )
+            self._conn.execute(
+                "CREATE INDEX IF NOT EXISTS jobs_fila ON jobs (status, criado_em)"
+            )
+        return self._conn
+
+    def pasta_job(self, job_id: str) -> str:
+        return os.path.join(self.pasta, job_id)
+
+    def inserir(self, job_id: str, tipo: str, payload: dict) -> None:
+        agora = time.time()
+        with self._lock:
+            self._conexao().execute(
+                "INSERT INTO jobs (id, tipo, status, payload, criado_em, atualizado_em)"
+                " VALUES (?, ?, ?, ?, ?, ?)",
+                (job_id, tipo, PENDENTE, json.dumps(payload, default=str), agora, agora)
+            )
+
+    def reservar(self) -> Optional[sqlite3.Row]:
+        """
+        Pega o job pendente mais antigo de forma atômica.
+        """
+        with self._lock:
+            return self._conexao().execute(
+                "UPDATE jobs SET status = ?, dono = ?, tentativas = tentativas + 1,"
+                " atualizado_em = ?"
+                " WHERE id = (SELECT id FROM jobs WHERE status = ?"
+                "             ORDER BY criado_em LIMIT 1)"
+                " AND status = ?"
+                " RETURNING *",
+                (EXECUTANDO, _DONO, time.time(), PENDENTE, PENDENTE)
+            ).fetchone()
+
+    def concluir(self, job_id: str, resultado: dict) -> None:
+        with self._lock:
+            self._conexao().execute(
+                "UPDATE jobs SET status = ?, resultado = ?, atualizado_em = ?"
+                " WHERE id = ?",
+                (CONCLUIDO, json.dumps(resultado, default=str), time.time(), job_id)
+            )
+
+    def falhar(self, job_id: str, erro: str, status_code: int) -> None:
+        with self._lock:
+            self._conexao().execute(
+                "UPDATE jobs SET status = ?, erro = ?, status_code = ?, atualizado_em = ?"
+                " WHERE id = ?",
+                (ERRO, erro, status_code, time.time(), job_id)
+            )
+
+    def obter(self, job_id: str) -> Optional[sqlite3.Row]:
+        with self._lock:
+            return self._conexao().execute(
+                "SELECT * FROM jobs WHERE id = ?", (job_id,)
+            ).fetchone()
+
+    def recuperar(self) -> int:
+        """
+        Devolve à fila jobs interrompidos: do próprio host com processo
+        morto, ou de qualquer dono com lease vencido.
+        """
+        host = socket.gethostname()
+        limite = time.time() - JOBS_LEASE_SEGUNDOS
+        recuperados = 0
+
+        with self._lock:
+            conn = self._conexao()
+            linhas = conn.execute(
+                "SELECT id, dono, atualizado_em FROM jobs WHERE status = ?",
+                (EXECUTANDO,)
+            ).fetchall()
+
+            for linha in linhas:
+                dono_host, _, pid = (linha["dono"] or "").rpartition(":")
+                morto = dono_host == host and not _processo_vivo(pid)
+                if morto or linha["atualizado_em"] < limite:
+                    conn.execute(
+                        "UPDATE jobs SET status = ?, dono = NULL, atualizado_em = ?"
+                        " WHERE id = ? AND status = ?",
+                        (PENDENTE, time.time(), linha["id"], EXECUTANDO)
+                    )
+                    recuperados += 1
+
+        return recuperados
+
+    def expurgar(self) -> List[str]:
+        limite = time.time() - JOBS_RETENCAO_DIAS * 86400
+        with self._lock:
+            conn = self._conexao()
+            ids = [
+                r["id"] for r in conn.execute(
+                    "SELECT id FROM jobs WHERE status IN (?, ?) AND atualizado_em < ?",
+                    (CONCLUIDO, ERRO, limite)
+                )
+            ]
+            conn.executemany("DELETE FROM jobs WHERE id = ?", [(i,) for i in ids])
+        return ids
+
+
+def _processo_vivo(pid: str) -> bool:
+    try:
+        os.kill(int(pid), 0)
+        return True
+    except (ValueError, ProcessLookupError):
+        return False
+    except PermissionError:
+        return True
+
+
+fila = FilaJobs(JOBS_DB, JOBS_DIR)
+
+# Acordado a cada enfileiramento local: workers ociosos não fazem polling
+_novo_job = asyncio.Event()
+_workers: List[asyncio.Task] = []
+
+
+# ============================================================
+# API
+# ============================================================
+
+def registrar(tipo: str, handler: Handler) -> None:
+    """
+    Registra a função que processa jobs de `tipo`.
+    Recebe (payload, arquivos) e devolve o corpo da resposta síncrona.
+    """
+    _handlers[tipo] = handler
+
+
+def pedido_assincrono(request: Request) -> bool:
+    """
+    Modo assíncrono opcional: `Prefer: respond-async` ou `?assincrono=true`.
+    """
+    if "respond-async" in request.headers.get("prefer", ""):
+        return True
+    return request.query_params.get("assincrono", "").lower() in ("1", "true", "sim")
+
+
+def _salvar_arquivos(pasta: str, arquivos: Dict[str, ArquivoEntrada]) -> None:
+    os.makedirs(pasta, exist_ok=True)
+    for nome, arquivo in arquivos.items():
+        with open(os.path.join(pasta, nome), "wb") as f:
+            arquivo.copiar_para(f)
+
+
+async def enfileirar(
+    tipo: str,
+    payload: dict,
+    arquivos: Optional[Dict[str, ArquivoEntrada]] = None
+) -> str:
+    """
+    Persiste a entrada (JSON + arquivos em disco) e devolve o id do job.
+    """
+    if tipo not in _handlers:
+        raise ValueError(f"Tipo de job desconhecido: {tipo}")
+
+    job_id = str(uuid.uuid4())
+
+    if arquivos:
+        await run_in_threadpool(_salvar_arquivos, fila.pasta_job(job_id), arquivos)
+
+    await run_in_threadpool(fila.inserir, job_id, tipo, payload)
+    _novo_job.set()
+
+    return job_id
+
+
+def resposta_aceita(job_id: str) -> JSONResponse:
+    status_url = f"/jobs/{job_id}"
+    return JSONResponse(
+        status_code=202,
+        content={"job_id": job_id, "status": PENDENTE, "status_url": status_url},
+        headers={"Location": status_url}
+    )
+
+
+async def obter(job_id: str) -> Optional[dict]:
+    linha = await run_in_threadpool(fila.obter, job_id)
+    if linha is None:
+        return None
+
+    return {
+        "job_id": linha["id"],
+        "tipo": linha["tipo"],
+        "status": linha["status"],
+        "tentativas": linha["tentativas"],
+        "resultado": json.loads(linha["resultado"]) if linha["resultado"] else None,
+        "erro": linha["erro"],
+        "status_code": linha["status_code"],
+        "criado_em": linha["criado_em"],
+        "atualizado_em": linha["atualizado_em"],
+    }
+
+
+# ============================================================
+# WORKERS
+# ============================================================
+
+def _abrir_arquivos(pasta: str) -> Dict[str, ArquivoEntrada]:
+    if not os.path.isdir(pasta):
+        return {}
+    return {
+        nome: ArquivoEntrada(open(os.path.join(pasta, nome), "rb"))
+        for nome in os.listdir(pasta)
+    }
+
+
+async def _executar(linha: sqlite3.Row) -> None:
+    job_id = linha["id"]
+    pasta = fila.pasta_job(job_id)
+    metricas.definir_rota(f"job:{linha['tipo']}")
+    arquivos = await run_in_threadpool(_abrir_arquivos, pasta)
+
+    try:
+        resultado = await _handlers[linha["tipo"]](json.loads(linha["payload"]), arquivos)
+        erro = None
+
+    except HTTPException as e:
+        erro = (str(e.detail), e.status_code)
+
+    except Exception as e:
+        logger.exception("Job %s falhou", job_id)
+        erro = (f"Erro interno: {str(e)}", 500)
+
+    finally:
+        for arquivo in arquivos.values():
+            arquivo.arquivo.close()
+
+    if erro is None:
+        await run_in_threadpool(fila.concluir, job_id, resultado)
+    else:
+        await run_in_threadpool(fila.falhar, job_id, *erro)
+
+    # Só depois do estado final gravado: se a gravação falhar (ou o worker
+    # for cancelado), o recuperar() devolve o job à fila com os arquivos
+    await run_in_threadpool(shutil.rmtree, pasta, True)
+
+
+async def _worker() -> None:
+    while True:
+        try:
+            # Limpa antes de consultar: um enfileiramento durante a consulta
+            # deixa o evento setado e não se perde
+            _novo_job.clear()
+            linha = await run_in_threadpool(fila.reservar)
+
+            if linha is None:
+                try:
+                    await asyncio.wait_for(_novo_job.wait(), timeout=JOBS_ESPERA_MAX)
+                except asyncio.TimeoutError:
+                    pass
+                continue
+
+            await _executar(linha)
+
+        except Exception:
+            # Ex.: fila.falhar/concluir sem conseguir gravar no SQLite. O job
+            # fica "executando" até o recuperar() do próximo início; o
+            # worker segue com os demais
+            logger.exception("Worker de jobs: falha ao processar a fila")
+            await asyncio.sleep(1)
+
+
+async def iniciar(workers: int = JOBS_WORKERS) -> None:
+    recuperados = await run_in_threadpool(fila.recuperar)
+    if recuperados:
+        logger.info("%d job(s) interrompido(s) devolvido(s) à fila", recuperados)
+
+    for job_id in await run_in_threadpool(fila.expurgar):
+        await run_in_threadpool(shutil.rmtree, fila.pasta_job(job_id), True)
+
+    for _ in range(workers):
+        _workers.append(asyncio.create_task(_worker()))
+
+
+async def parar() -> None:
+    for task in _workers:
+        task.cancel()
+    await asyncio.gather(*_workers, return_exceptions=True)
+    _workers.clear()
@@ -0,0 +1,295 @@
+"""
+Motor de layout dos PDFs (usado por app.services.pdfs).
+
+- Fluxo vertical: cada bloco pede a altura de que precisa e a página
+  quebra sozinha; ninguém mais controla `y -=` à mão.
+- Texto quebrado pela largura real da fonte (nada de `texto[:300]`).
+- Elementos repetidos (fundo; cabeçalho com logo, se PDF_LOGO estiver
+  configurado) são form XObjects: entram uma vez no PDF e cada página só
+  os referencia.
+- Recursos caros (logo redimensionado) são preparados uma vez por
+  processo do pool de render e reaproveitados entre documentos.
+
+Como pdfs, roda nos processos de render: só dados serializáveis entram
+e saem, e reportlab só é importado no primeiro uso.
+"""
+import os
+from functools import lru_cache
+from io import BytesIO
+from typing import List, Optional, Tuple
+
+from app.services.imagens import ImagemNormalizada, normalizar_imagem
+
+# Logo no cabeçalho das páginas de texto (ex.: app/static/LogoFlexcolor2.png);
+# vazio = sem cabeçalho, como os PDFs sempre foram
+PDF_LOGO = os.getenv("PDF_LOGO", "")
+
+MARGEM_X = 40
+MARGEM_TOPO = 50
+MARGEM_BASE = 50
+
+# Caixa do logo no canto superior direito (pt)
+LOGO_LARGURA = 150
+LOGO_ALTURA = 20
+
+# Muda quando a diagramação muda (invalida páginas já renderizadas em cache)
+VERSAO = 3
+
+FORM_FUNDO = "fundo"
+FORM_CABECALHO = "cabecalho"
+
+
+# ============================================================
+# RECURSOS (CACHE POR PROCESSO)
+# ============================================================
+
+@lru_cache(maxsize=8)
+def logo(caminho: str, largura_pt: float, altura_pt: float) -> Optional[ImagemNormalizada]:
+    """
+    Logo recortado nas bordas transparentes e reduzido para a caixa do
+    cabeçalho. Preparado uma vez por processo; None se não existir.
+    """
+    if not caminho or not os.path.exists(caminho):
+        return None
+
+    from PIL import Image
+
+    with Image.open(caminho) as original:
+        img = original.convert("RGBA")
+        caixa = img.getchannel("A").getbbox()
+        if caixa:
+            img = img.crop(caixa)
+        recortado = BytesIO()
+        img.save(recortado, format="PNG")
+
+    return normalizar_imagem(recortado.getvalue(), largura_pt, altura_pt)
+
+
+def preparar() -> None:
+    """
+    Prepara os recursos compartilhados (aquecimento do pool de render).
+    """
+    logo(PDF_LOGO, LOGO_LARGURA, LOGO_ALTURA)
+
+
+def _cortar(palavra: str, fonte: str, tamanho: float, largura: float) -> List[str]:
+    """
+    Pedaços de uma palavra maior que a linha, numa passada só: soma a
+    largura de cada caractere (a largura de uma string nas fontes padrão
+    é a soma das larguras dos caracteres).
+    """
+    from reportlab.pdfbase.pdfmetrics import stringWidth
+
+    larguras: dict = {}
+    pedacos: List[str] = []
+    inicio, acumulado = 0, 0.0
+
+    for posicao, caractere in enumerate(palavra):
+        largura_caractere = larguras.get(caractere)
+        if largura_caractere is None:
+            largura_caractere = larguras[caractere] = stringWidth(caractere, fonte, tamanho)
+
+        if acumulado + largura_caractere > largura and posicao > inicio:
+            pedacos.append(palavra[inicio:posicao])
+            inicio, acumulado = posicao, 0.0
+        acumulado += largura_caractere
+
+    pedacos.append(palavra[inicio:])
+    return pedacos
+
+
+@lru_cache(maxsize=1024)
+def quebrar(texto: str, fonte: str, tamanho: float, largura: float) -> Tuple[str, ...]:
+    """
+    Linhas de `texto` que cabem em `largura` (respeita quebras existentes;
+    palavras maiores que a linha são cortadas por caractere).
+    """
+    from reportlab.pdfbase.pdfmetrics import stringWidth
+
+    linhas: List[str] = []
+    for paragrafo in texto.splitlines() or [""]:
+        atual = ""
+        for palavra in paragrafo.split(" "):
+            candidata = f"{atual} {palavra}" if atual else palavra
+            if stringWidth(candidata, fonte, tamanho) <= largura:
+                atual = candidata
+                continue
+
+            if atual:
+                linhas.append(atual)
+            atual = palavra
+            # Palavra sozinha maior que a linha (URL, texto sem espaços)
+            if stringWidth(palavra, fonte, tamanho) > largura:
+                *cheias, atual = _cortar(palavra, fonte, tamanho, largura)
+                linhas.extend(cheias)
+        linhas.append(atual)
+
+    return tuple(linhas)
+
+
+# ============================================================
+# DOCUMENTO EM FLUXO
+# ============================================================
+
+class Documento:
+    """
+    Canvas A4 com cursor vertical. Blocos chamam garantir(altura) antes
+    de desenhar; a quebra de página redesenha fundo e cabeçalho (forms).
+    """
+
+    def __init__(self, fundo: Optional[str] = None, cabecalho: bool = True):
+        from reportlab.lib.pagesizes import A4
+        from reportlab.pdfgen import canvas
+
+        self.buffer = BytesIO()
+        self.canvas = canvas.Canvas(self.buffer, pagesize=A4)
+        self.largura, self.altura = A4
+        self.largura_util = self.largura - 2 * MARGEM_X
+        self.pagina = 0
+        self.y = 0.0
+        self._forms: List[str] = []
+        self._pagina_vazia = True
+
+        # Forms são definidos antes da primeira página
+        if fundo:
+            self._definir_fundo(fundo)
+        if cabecalho:
+            self._definir_cabecalho()
+
+        self._iniciar_pagina()
+
+    # ---------------------------------
+    # Forms (desenhados uma vez por documento)
+    # ---------------------------------
+    def _definir_fundo(self, cor: str) -> None:
+        from reportlab.lib.colors import HexColor
+
+        c = self.canvas
+        c.beginForm(FORM_FUNDO)
+        c.setFillColor(HexColor(cor))
+        c.rect(0, 0, self.largura, self.altura, stroke=0, fill=1)
+        c.endForm()
+        self._forms.append(FORM_FUNDO)
+
+    def _definir_cabecalho(self) -> None:
+        from reportlab.lib.utils import ImageReader
+
+        imagem = logo(PDF_LOGO, LOGO_LARGURA, LOGO_ALTURA)
+        if imagem is None:
+            return
+
+        # Um único XObject de imagem, referenciado pelo form em cada página
+        c = self.canvas
+        c.beginForm(FORM_CABECALHO)
+        c.drawImage(
+            ImageReader(imagem.stream()),
+            self.largura - MARGEM_X - LOGO_LARGURA,
+            self.altura - 20 - LOGO_ALTURA,
+            width=LOGO_LARGURA,
+            height=LOGO_ALTURA,
+            preserveAspectRatio=True,
+            anchor="e",
+            mask="auto"
+        )
+        c.endForm()
+        self._forms.append(FORM_CABECALHO)
+
+    # ---------------------------------
+    # Páginas
+    # ---------------------------------
+    def _iniciar_pagina(self) -> None:
+        self.pagina += 1
+        for nome in self._forms:
+            self.canvas.doForm(nome)
+
+        self.y = self.altura - MARGEM_TOPO
+        self._pagina_vazia = True
+
+    def quebrar_pagina(self) -> None:
+        self.canvas.showPage()
+        self._iniciar_pagina()
+
+    def garantir(self, altura: float) -> None:
+        """
+        Quebra a página se o bloco de `altura` não couber (um bloco maior
+        que a página inteira começa numa página nova e segue nela).
+        """
+        if self.y - altura < MARGEM_BASE and not self._pagina_vazia:
+            self.quebrar_pagina()
+
+    def espaco(self, altura: float) -> None:
+        self.y -= altura
+
+    # ---------------------------------
+    # Blocos
+    # ---------------------------------
+    def altura_texto(
+        self,
+        texto: str,
+        tamanho: float = 10,
+        fonte: str = "Helvetica",
+        recuo: float = 0,
+        entrelinha: Optional[float] = None
+    ) -> float:
+        linhas = quebrar(texto, fonte, tamanho, self.largura_util - recuo)
+        return len(linhas) * (entrelinha or tamanho * 1.4)
+
+    def texto(
+        self,
+        texto: str,
+        tamanho: float = 10,
+        fonte: str = "Helvetica",
+        recuo: float = 0,
+        entrelinha: Optional[float] = None
+    ) -> None:
+        """
+        Parágrafo com quebra de linha; pode continuar na página seguinte.
+        """
+        entrelinha = entrelinha or tamanho * 1.4
+        for linha in quebrar(texto, fonte, tamanho, self.largura_util - recuo):
+            self.garantir(entrelinha)
+            self.canvas.setFont(fonte, tamanho)
+            self.canvas.drawString(MARGEM_X + recuo, self.y, linha)
+            self.y -= entrelinha
+            self._pagina_vazia = False
+
+    def imagem(
+        self,
+        imagem: ImagemNormalizada,
+        largura: float,
+        altura: float,
+        recuo: float = 0
+    ) -> None:
+        from reportlab.lib.utils import ImageReader
+
+        self.garantir(altura)
+        self.canvas.drawImage(
+            ImageReader(imagem.stream()),
+            MARGEM_X + recuo,
+            self.y - altura,
+            width=largura,
+            height=altura,
+            preserveAspectRatio=True,
+            anchor="sw",
+            mask="auto"
+        )
+        self.y -= altura
+        self._pagina_vazia = False
+
+    def imagem_pagina_inteira(self, imagem: ImagemNormalizada) -> None:
+        from reportlab.lib.utils import ImageReader
+
+        self.canvas.drawImage(
+            ImageReader(imagem.stream()),
+            0,
+            0,
+            width=self.largura,
+            height=self.altura,
+            mask="auto"
+        )
+        self._pagina_vazia = False
+
+    def finalizar(self) -> bytes:
+        self.canvas.showPage()
+        self.canvas.save()
+        return self.buffer.getvalue()
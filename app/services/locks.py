@@ -0,0 +1,31 @@
+import asyncio
+from contextlib import asynccontextmanager
+from typing import AsyncIterator, Dict, Hashable
+
+
+class LocksPorChave:
+    """
+    Um asyncio.Lock por chave (single-flight dentro do processo).
+
+    O lock só sai do dicionário quando ninguém o segura nem espera por
+    ele: `locked()` não basta, porque entre o release e o re-acquire de
+    quem foi acordado o lock aparece livre, e uma chamada nova criaria
+    um segundo lock para a mesma chave.
+    """
+
+    def __init__(self):
+        self._locks: Dict[Hashable, asyncio.Lock] = {}
+        self._usos: Dict[Hashable, int] = {}
+
+    @asynccontextmanager
+    async def travar(self, chave: Hashable) -> AsyncIterator[None]:
+        lock = self._locks.setdefault(chave, asyncio.Lock())
+        self._usos[chave] = self._usos.get(chave, 0) + 1
+        try:
+            async with lock:
+                yield
+        finally:
+            self._usos[chave] -= 1
+            if not self._usos[chave]:
+                del self._usos[chave]
+                del self._locks[chave]
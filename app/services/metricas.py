@@ -0,0 +1,413 @@
+"""
+Instrumentação leve: etapas (spans) com duração e tamanho, expostas em
+/metrics (formato texto do Prometheus) e, opcionalmente, no cabeçalho
+Server-Timing de cada resposta.
+
+    with metricas.etapa("upload") as span:
+        url = await upload_bytes(...)
+        span.bytes = len(pdf)
+
+Com METRICAS=0 etapa() devolve um contexto nulo compartilhado e o
+middleware não é instalado: o custo fica em uma chamada de função.
+
+Cada processo (worker do uvicorn) tem o seu registro; o Prometheus soma
+as instâncias.
+"""
+import os
+import threading
+import time
+from contextvars import ContextVar
+from typing import Callable, Dict, List, Optional, Tuple
+
+METRICAS_ATIVAS = os.getenv("METRICAS", "1") == "1"
+# Cabeçalho Server-Timing com as etapas da requisição (expõe tempos internos)
+SERVER_TIMING = os.getenv("SERVER_TIMING", "0") == "1"
+
+BUCKETS_SEGUNDOS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30)
+BUCKETS_BYTES = (1e3, 1e4, 1e5, 5e5, 1e6, 5e6, 1e7, 5e7, 1e8)
+
+ROTA_DESCONHECIDA = "desconhecida"
+
+Rotulos = Tuple[str, ...]
+
+
+# ============================================================
+# MÉTRICAS
+# ============================================================
+
+def _escapar(valor: str) -> str:
+    return valor.replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _formatar_rotulos(nomes: Tuple[str, ...], valores: Rotulos, extra: str = "") -> str:
+    pares = [f'{n}="{_escapar(v)}"' for n, v in zip(nomes, valores)]
+    if extra:
+        pares.append(extra)
+    return "{" + ",".join(pares) + "}" if pares else ""
+
+
+def _numero(valor: float) -> str:
+    valor = float(valor)
+    if valor == float("inf"):
+        return "+Inf"
+    return str(int(valor)) if valor.is_integer() else repr(valor)
+
+
+class Metrica:
+    tipo = ""
+
+    def __init__(self, nome: str, ajuda: str, rotulos: Tuple[str, ...] = ()):
+        self.nome = nome
+        self.ajuda = ajuda
+        self.rotulos = rotulos
+        self._lock = threading.Lock()
+
+    def _cabecalho(self) -> List[str]:
+        return [f"# HELP {self.nome} {self.ajuda}", f"# TYPE {self.nome} {self.tipo}"]
+
+    def expor(self) -> List[str]:
+        raise NotImplementedError
+
+
+class Contador(Metrica):
+    tipo = "counter"
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self._valores: Dict[Rotulos, float] = {}
+
+    def inc(self, *rotulos: str, valor: float = 1) -> None:
+        with self._lock:
+            self._valores[rotulos] = self._valores.get(rotulos, 0) + valor
+
+    def expor(self) -> List[str]:
+        with self._lock:
+            itens = sorted(self._valores.items())
+        return self._cabecalho() + [
+            f"{self.nome}{_formatar_rotulos(self.rotulos, r)} {_numero(v)}"
+            for r, v in itens
+        ]
+
+
+class Medidor(Metrica):
+    tipo = "gauge"
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self._valores: Dict[Rotulos, float] = {}
+
+    def somar(self, *rotulos: str, valor: float = 1) -> None:
+        with self._lock:
+            self._valores[rotulos] = self._valores.get(rotulos, 0) + valor
+
+    def definir(self, *rotulos: str, valor: float) -> None:
+        with self._lock:
+            self._valores[rotulos] = valor
+
+    expor = Contador.expor
+
+
+class Histograma(Metrica):
+    tipo = "histogram"
+
+    def __init__(self, nome: str, ajuda: str, rotulos: Tuple[str, ...], buckets):
+        super().__init__(nome, ajuda, rotulos)
+        self.buckets = tuple(sorted(buckets)) + (float("inf"),)
+        # rótulos → [contagem por bucket..., soma, total]
+        self._series: Dict[Rotulos, List[float]] = {}
+
+    def observar(self, valor: float, *rotulos: str) -> None:
+        with self._lock:
+            serie = self._series.get(rotulos)
+            if serie is None:
+                serie = self._series[rotulos] = [0] * (len(self.buckets) + 2)
+            for i, limite in enumerate(self.buckets):
+                if valor <= limite:
+                    serie[i] += 1
+                    break
+            serie[-2] += valor
+            serie[-1] += 1
+
+    def expor(self) -> List[str]:
+        with self._lock:
+            itens = sorted((r, list(s)) for r, s in self._series.items())
+
+        linhas = self._cabecalho()
+        for rotulos, serie in itens:
+            acumulado = 0
+            for limite, quantidade in zip(self.buckets, serie):
+                acumulado += quantidade
+                le = f'le="{_numero(limite)}"'
+                linhas.append(
+                    f"{self.nome}_bucket{_formatar_rotulos(self.rotulos, rotulos, le)} "
+                    f"{int(acumulado)}"
+                )
+            base = _formatar_rotulos(self.rotulos, rotulos)
+            linhas.append(f"{self.nome}_sum{base} {_numero(serie[-2])}")
+            linhas.append(f"{self.nome}_count{base} {int(serie[-1])}")
+        return linhas
+
+
+# ============================================================
+# REGISTRO
+# ============================================================
+
+REQUISICAO_SEGUNDOS = Histograma(
+    "app_requisicao_segundos",
+    "Duração das requisições HTTP",
+    ("rota", "metodo", "status"),
+    BUCKETS_SEGUNDOS
+)
+REQUISICOES_EM_ANDAMENTO = Medidor(
+    "app_requisicoes_em_andamento",
+    "Requisições HTTP em andamento"
+)
+ETAPA_SEGUNDOS = Histograma(
+    "app_etapa_segundos",
+    "Duração de cada etapa, por rota",
+    ("rota", "etapa"),
+    BUCKETS_SEGUNDOS
+)
+ETAPA_BYTES = Histograma(
+    "app_etapa_bytes",
+    "Tamanho dos dados processados em cada etapa",
+    ("rota", "etapa"),
+    BUCKETS_BYTES
+)
+ETAPA_ERROS = Contador(
+    "app_etapa_erros_total",
+    "Etapas que terminaram com exceção",
+    ("rota", "etapa", "erro")
+)
+ETAPAS_EM_ANDAMENTO = Medidor(
+    "app_etapas_em_andamento",
+    "Etapas em andamento",
+    ("etapa",)
+)
+UPLOAD_BYTES = Contador(
+    "app_upload_bytes_total",
+    "Bytes enviados ao storage",
+    ("tipo",)
+)
+UPLOADS = Contador(
+    "app_uploads_total",
+    "Uploads para o storage",
+    ("tipo", "resultado")
+)
+DOWNLOAD_BYTES = Contador(
+    "app_download_bytes_total",
+    "Bytes baixados do storage"
+)
+
+REGISTRO: List[Metrica] = [
+    REQUISICAO_SEGUNDOS,
+    REQUISICOES_EM_ANDAMENTO,
+    ETAPA_SEGUNDOS,
+    ETAPA_BYTES,
+    ETAPA_ERROS,
+    ETAPAS_EM_ANDAMENTO,
+    UPLOAD_BYTES,
+    UPLOADS,
+    DOWNLOAD_BYTES,
+]
+
+# nome → função que devolve {chave: valor}, lida a cada coleta (caches, filas)
+_coletores: Dict[str, Callable[[], Dict[str, float]]] = {}
+
+
+def registrar_coletor(nome: str, funcao: Callable[[], Dict[str, float]]) -> None:
+    """
+    Exposto como app_<nome>{chave="..."} (gauge). A função roda no
+    threadpool a cada /metrics, então pode fazer I/O leve.
+    """
+    _coletores[nome] = funcao
+
+
+def expor() -> str:
+    linhas: List[str] = []
+    for metrica in REGISTRO:
+        linhas.extend(metrica.expor())
+
+    for nome, funcao in sorted(_coletores.items()):
+        medidor = Medidor(f"app_{nome}", f"Estatísticas de {nome}", ("chave",))
+        try:
+            for chave, valor in funcao().items():
+                if isinstance(valor, (int, float)):
+                    medidor.definir(chave, valor=valor)
+        except Exception:
+            continue
+        linhas.extend(medidor.expor())
+
+    return "\n".join(linhas) + "\n"
+
+
+# ============================================================
+# ETAPAS (SPANS)
+# ============================================================
+
+class _Requisicao:
+    __slots__ = ("scope", "etapas")
+
+    def __init__(self, scope: dict):
+        self.scope = scope
+        self.etapas: List[Tuple[str, float]] = []
+
+    @property
+    def rota(self) -> str:
+        rota = self.scope.get("route")
+        return getattr(rota, "path", None) or ROTA_DESCONHECIDA
+
+
+_requisicao: ContextVar[Optional[_Requisicao]] = ContextVar(
+    "metricas_requisicao", default=None
+)
+# Rótulo de rota fora de requisições HTTP (ex.: jobs)
+_rota_fixa: ContextVar[Optional[str]] = ContextVar("metricas_rota", default=None)
+
+
+def definir_rota(rota: str) -> None:
+    """
+    Rótulo das etapas executadas fora de uma requisição (ex.: "job:nps").
+    """
+    _rota_fixa.set(rota)
+
+
+def _observar(nome: str, segundos: float, bytes: int, erro=None) -> None:
+    requisicao = _requisicao.get()
+    if requisicao is not None:
+        rota = requisicao.rota
+        requisicao.etapas.append((nome, segundos))
+    else:
+        rota = _rota_fixa.get() or ROTA_DESCONHECIDA
+
+    ETAPA_SEGUNDOS.observar(segundos, rota, nome)
+    if bytes:
+        ETAPA_BYTES.observar(bytes, rota, nome)
+    if erro is not None:
+        ETAPA_ERROS.inc(rota, nome, erro.__name__)
+
+
+class Etapa:
+    __slots__ = ("nome", "bytes", "_inicio")
+
+    def __init__(self, nome: str, bytes: int = 0):
+        self.nome = nome
+        self.bytes = bytes
+        self._inicio = 0.0
+
+    def __enter__(self) -> "Etapa":
+        ETAPAS_EM_ANDAMENTO.somar(self.nome)
+        self._inicio = time.perf_counter()
+        return self
+
+    def __exit__(self, tipo, exc, tb) -> None:
+        ETAPAS_EM_ANDAMENTO.somar(self.nome, valor=-1)
+        _observar(self.nome, time.perf_counter() - self._inicio, self.bytes, tipo)
+
+
+class _EtapaNula:
+    __slots__ = ()
+    bytes = 0
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc) -> None:
+        pass
+
+    def __setattr__(self, nome, valor) -> None:
+        pass
+
+
+_ETAPA_NULA = _EtapaNula()
+
+
+def etapa(nome: str, bytes: int = 0):
+    """
+    Context manager (síncrono; vale dentro de funções async) que mede
+    uma etapa. `span.bytes` pode ser definido dentro do bloco.
+    """
+    if not METRICAS_ATIVAS:
+        return _ETAPA_NULA
+    return Etapa(nome, bytes)
+
+
+def registrar_etapa(nome: str, segundos: float, bytes: int = 0) -> None:
+    """
+    Etapa medida em outro lugar (ex.: dentro do pool de render).
+    """
+    if METRICAS_ATIVAS:
+        _observar(nome, segundos, bytes)
+
+
+def contar_upload(tipo: str, tamanho: Optional[int], ok: bool) -> None:
+    if not METRICAS_ATIVAS:
+        return
+    UPLOADS.inc(tipo, "ok" if ok else "erro")
+    if ok and tamanho:
+        UPLOAD_BYTES.inc(tipo, valor=tamanho)
+
+
+def contar_download(tamanho: int) -> None:
+    if METRICAS_ATIVAS:
+        DOWNLOAD_BYTES.inc(valor=tamanho)
+
+
+# ============================================================
+# MIDDLEWARE (ASGI)
+# ============================================================
+
+def _server_timing(etapas: List[Tuple[str, float]], total: float) -> bytes:
+    # Etapas repetidas (ex.: vários uploads) somadas num único item
+    somas: Dict[str, float] = {}
+    for nome, duracao in etapas:
+        somas[nome] = somas.get(nome, 0.0) + duracao
+    itens = [
+        f"{nome.replace('.', '_')};dur={duracao * 1000:.1f}" for nome, duracao in somas.items()
+    ]
+    itens.append(f"total;dur={total * 1000:.1f}")
+    return ", ".join(itens).encode("latin-1")
+
+
+class MiddlewareMetricas:
+    """
+    Mede cada requisição HTTP e disponibiliza o contexto das etapas.
+    """
+
+    def __init__(self, app, server_timing: bool = SERVER_TIMING):
+        self.app = app
+        self.server_timing = server_timing
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            return await self.app(scope, receive, send)
+
+        requisicao = _Requisicao(scope)
+        token = _requisicao.set(requisicao)
+        inicio = time.perf_counter()
+        status = 500
+        REQUISICOES_EM_ANDAMENTO.somar()
+
+        async def enviar(mensagem):
+            nonlocal status
+            if mensagem["type"] == "http.response.start":
+                status = mensagem["status"]
+                if self.server_timing:
+                    mensagem = dict(mensagem)
+                    mensagem["headers"] = list(mensagem.get("headers", [])) + [(
+                        b"server-timing",
+                        _server_timing(requisicao.etapas, time.perf_counter() - inicio)
+                    )]
+            await send(mensagem)
+
+        try:
+            await self.app(scope, receive, enviar)
+        finally:
+            REQUISICOES_EM_ANDAMENTO.somar(valor=-1)
+            REQUISICAO_SEGUNDOS.observar(
+                time.perf_counter() - inicio,
+                requisicao.rota,
+                scope["method"],
+                str(status)
+            )
+            _requisicao.reset(token)
@@ -0,0 +1,179 @@
+import gzip
+import hashlib
+import os
+from dataclasses import dataclass, field
+from typing import Dict, Optional, Tuple
+
+from fastapi import Request, Response
+from jinja2 import Environment
+
+from app.services import assets
+
+try:
+    import brotli
+except ImportError:  # opcional
+    brotli = None
+
+# Confere o mtime do template a cada requisição (invalidação em dev).
+# Em produção pode ser desligado: o cache vale até o restart.
+PAGINAS_VERIFICAR_MTIME = os.getenv("PAGINAS_VERIFICAR_MTIME", "1") == "1"
+
+# O navegador pode guardar, mas revalida sempre (If-None-Match → 304)
+CACHE_PAGINA = "no-cache"
+TIPO_HTML = "text/html; charset=utf-8"
+
+
+# ============================================================
+# PÁGINA RENDERIZADA
+# ============================================================
+
+@dataclass
+class PaginaRenderizada:
+    chave: tuple
+    etag: str
+    # encoding ("identity", "gzip", "br") → corpo
+    corpos: Dict[str, bytes] = field(default_factory=dict)
+
+    def etag_de(self, encoding: str) -> str:
+        # ETag forte é por representação: cada encoding tem a sua
+        if encoding == "identity":
+            return f'"{self.etag}"'
+        return f'"{self.etag}-{encoding}"'
+
+    def corresponde(self, if_none_match: str) -> bool:
+        """
+        If-None-Match bate com qualquer representação desta versão da página.
+        """
+        if if_none_match.strip() == "*":
+            return True
+        for tag in if_none_match.split(","):
+            tag = tag.strip()
+            if tag.startswith("W/"):
+                tag = tag[2:]
+            tag = tag.strip('"')
+            if tag == self.etag or tag.startswith(self.etag + "-"):
+                return True
+        return False
+
+
+def _renderizar(env: Environment, nome: str, chave: tuple) -> PaginaRenderizada:
+    html = env.get_template(nome).render().encode("utf-8")
+
+    pagina = PaginaRenderizada(
+        chave=chave,
+        etag=hashlib.sha256(html).hexdigest()[:32],
+        corpos={"identity": html}
+    )
+
+    comprimido = gzip.compress(html, compresslevel=9, mtime=0)
+    if len(comprimido) < len(html):
+        pagina.corpos["gzip"] = comprimido
+
+    if brotli is not None:
+        comprimido = brotli.compress(html, quality=11)
+        if len(comprimido) < len(html):
+            pagina.corpos["br"] = comprimido
+
+    return pagina
+
+
+# ============================================================
+# CACHE
+# ============================================================
+
+class CachePaginas:
+    """
+    Template → HTML renderizado (+ gzip/brotli) e ETag.
+
+    A saída das rotas públicas depende só do template e das URLs dos
+    assets, então a chave é (mtime do arquivo, versão do manifest).
+    Usado só a partir do event loop (sem lock).
+    """
+
+    def __init__(self, env: Environment, diretorio: str, verificar_mtime: bool):
+        self.env = env
+        self.diretorio = diretorio
+        self.verificar_mtime = verificar_mtime
+        self._paginas: Dict[str, PaginaRenderizada] = {}
+        self.hits = 0
+        self.misses = 0
+        self.nao_modificados = 0
+
+    def _chave(self, nome: str) -> Tuple[int, str]:
+        mtime = os.stat(os.path.join(self.diretorio, nome)).st_mtime_ns
+        return mtime, assets.versao()
+
+    def obter(self, nome: str) -> PaginaRenderizada:
+        pagina = self._paginas.get(nome)
+
+        if pagina is not None and not self.verificar_mtime:
+            self.hits += 1
+            return pagina
+
+        chave = self._chave(nome)
+        if pagina is not None and pagina.chave == chave:
+            self.hits += 1
+            return pagina
+
+        self.misses += 1
+        pagina = _renderizar(self.env, nome, chave)
+        self._paginas[nome] = pagina
+        return pagina
+
+    def limpar(self) -> None:
+        self._paginas.clear()
+
+    def estatisticas(self) -> Dict[str, int]:
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "nao_modificados": self.nao_modificados,
+            "paginas": len(self._paginas),
+            "bytes": sum(
+                len(c) for p in self._paginas.values() for c in p.corpos.values()
+            ),
+        }
+
+
+# ============================================================
+# RESPOSTA
+# ============================================================
+
+def _escolher_encoding(pagina: PaginaRenderizada, accept_encoding: str) -> str:
+    for encoding in ("br", "gzip"):
+        if encoding in pagina.corpos and assets.aceita(accept_encoding, encoding):
+            return encoding
+    return "identity"
+
+
+def responder(
+    cache: CachePaginas,
+    request: Request,
+    nome: str
+) -> Response:
+    """
+    Página do cache: 304 se o navegador já tem esta versão, senão o corpo
+    pré-comprimido conforme o Accept-Encoding.
+    """
+    pagina = cache.obter(nome)
+    encoding = _escolher_encoding(pagina, request.headers.get("accept-encoding", ""))
+
+    headers = {
+        "ETag": pagina.etag_de(encoding),
+        "Cache-Control": CACHE_PAGINA,
+        "Vary": "Accept-Encoding",
+    }
+
+    if_none_match: Optional[str] = request.headers.get("if-none-match")
+    if if_none_match and pagina.corresponde(if_none_match):
+        cache.nao_modificados += 1
+        return Response(status_code=304, headers=headers)
+
+    if encoding != "identity":
+        headers["Content-Encoding"] = encoding
+
+    return Response(
+        content=pagina.corpos[encoding],
+        media_type=TIPO_HTML,
+        headers=headers
+    )
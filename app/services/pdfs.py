@@ -0,0 +1,247 @@
+"""
+Renderizadores de PDF.
+
+Funções puras: recebem dados serializáveis (str, bytes, date, dataclasses)
+e devolvem os bytes do PDF. Rodam nos processos do pool de render
+(app.services.render), então não podem depender de estado da requisição.
+
+A diagramação (fluxo, quebra de texto e de página, recursos repetidos)
+fica em app.services.layout.
+
+reportlab e PyPDF2 só são importados no primeiro render (ou em carregar()):
+importar este módulo não pesa no boot da API.
+"""
+from dataclasses import dataclass
+from datetime import date, datetime
+from io import BytesIO
+from typing import List, Optional, Tuple, Union
+
+from app.services import layout
+from app.services.imagens import RelatorioPdf, normalizar_imagem
+
+
+def carregar() -> None:
+    """
+    Importa as dependências pesadas de uma vez (aquecimento).
+    """
+    import PIL.Image  # noqa: F401
+    import PyPDF2  # noqa: F401
+    import reportlab.lib.utils  # noqa: F401
+    import reportlab.pdfgen.canvas  # noqa: F401
+
+    layout.preparar()
+
+
+# ============================================================
+# TERMO
+# ============================================================
+
+COR_FUNDO_TERMO = "#5b2fa6"
+
+
+def termo(imagem: bytes) -> Tuple[bytes, RelatorioPdf]:
+    from reportlab.lib.colors import HexColor
+
+    relatorio = RelatorioPdf("termo")
+    doc = layout.Documento(fundo=COR_FUNDO_TERMO, cabecalho=False)
+
+    # Imagem capturada, reduzida para a página e achatada sobre o fundo
+    normalizada = normalizar_imagem(
+        imagem,
+        doc.largura,
+        doc.altura,
+        fundo=tuple(int(v * 255) for v in HexColor(COR_FUNDO_TERMO).rgb())
+    )
+    relatorio.adicionar(normalizada)
+    doc.imagem_pagina_inteira(normalizada)
+
+    pdf = doc.finalizar()
+    relatorio.finalizar(len(pdf))
+    return pdf, relatorio
+
+
+# ============================================================
+# RESSALVAS
+# ============================================================
+
+@dataclass
+class ItemRessalvaPdf:
+    item: str
+    descricao: str
+    prazo: Optional[date] = None
+    aprovacao: bool = False
+    imagem: Optional[bytes] = None
+
+
+# Caixa da foto de cada item (pt)
+FOTO_LARGURA = 200
+FOTO_ALTURA = 150
+
+
+def _cabecalho_ressalvas(
+    doc: "layout.Documento",
+    titulo: str,
+    processo_codigo: str,
+    responsavel: str
+) -> None:
+    doc.texto(titulo, 14, "Helvetica-Bold", entrelinha=30)
+    doc.texto(f"Processo: {processo_codigo}", entrelinha=15)
+    doc.texto(f"Responsável: {responsavel}", entrelinha=15)
+    doc.texto(f"Data: {datetime.now().strftime('%d/%m/%Y %H:%M')}", entrelinha=15)
+    doc.espaco(10)
+
+
+def _desenhar_itens(
+    doc: "layout.Documento",
+    relatorio: RelatorioPdf,
+    itens: List[ItemRessalvaPdf],
+    inicio: int = 1
+) -> None:
+    for idx, img in enumerate(itens, start=inicio):
+        linhas = [(f"Item {idx}: {img.item}", 11, "Helvetica-Bold")]
+        linhas.append((f"Descrição: {img.descricao}", 10, "Helvetica"))
+        if img.prazo:
+            linhas.append((f"Prazo: {img.prazo.strftime('%d/%m/%Y')}", 10, "Helvetica"))
+        linhas.append((f"Aprovação: {'Sim' if img.aprovacao else 'Não'}", 10, "Helvetica"))
+
+        # O item inteiro (textos + foto) fica na mesma página
+        altura = sum(
+            doc.altura_texto(texto, tamanho, fonte, entrelinha=15)
+            for texto, tamanho, fonte in linhas
+        )
+        doc.garantir(altura + (FOTO_ALTURA + 20 if img.imagem is not None else 20))
+
+        for texto, tamanho, fonte in linhas:
+            doc.texto(texto, tamanho, fonte, entrelinha=15)
+
+        if img.imagem is not None:
+            # Reduz para a caixa da foto antes de embutir
+            normalizada = normalizar_imagem(img.imagem, FOTO_LARGURA, FOTO_ALTURA)
+            relatorio.adicionar(normalizada)
+            doc.imagem(normalizada, FOTO_LARGURA, FOTO_ALTURA)
+
+        doc.espaco(20)
+
+
+def ressalvas(
+    processo_codigo: str,
+    responsavel: str,
+    observacoes: Optional[str],
+    itens: List[ItemRessalvaPdf]
+) -> Tuple[bytes, RelatorioPdf]:
+    relatorio = RelatorioPdf("ressalvas")
+    doc = layout.Documento()
+
+    _cabecalho_ressalvas(doc, "RELATÓRIO DE RESSALVAS", processo_codigo, responsavel)
+
+    if observacoes:
+        doc.garantir(30)
+        doc.texto("Observações:", 10, "Helvetica-Bold", entrelinha=15)
+        doc.texto(observacoes, entrelinha=15)
+        doc.espaco(10)
+
+    _desenhar_itens(doc, relatorio, itens)
+
+    pdf = doc.finalizar()
+    relatorio.finalizar(len(pdf))
+    return pdf, relatorio
+
+
+def ressalvas_continuacao(
+    processo_codigo: str,
+    responsavel: str,
+    itens: List[ItemRessalvaPdf],
+    inicio: int
+) -> Tuple[bytes, RelatorioPdf]:
+    """
+    Páginas extras com itens acrescentados a um relatório já gerado
+    (numeração a partir de `inicio`), para mesclar ao fim do PDF existente.
+    """
+    relatorio = RelatorioPdf("ressalvas_continuacao")
+    doc = layout.Documento()
+
+    _cabecalho_ressalvas(
+        doc, "RELATÓRIO DE RESSALVAS (CONTINUAÇÃO)", processo_codigo, responsavel
+    )
+    _desenhar_itens(doc, relatorio, itens, inicio)
+
+    pdf = doc.finalizar()
+    relatorio.finalizar(len(pdf))
+    return pdf, relatorio
+
+
+# ============================================================
+# NPS
+# ============================================================
+
+def pagina_nps(nps: int, avaliacoes: dict, feedback: dict) -> bytes:
+    """
+    Página da pesquisa usada em /nps/finalizar.
+    """
+    doc = layout.Documento()
+
+    doc.texto("Pesquisa de Satisfação (NPS)", 16, "Helvetica-Bold", entrelinha=40)
+    doc.texto(f"NPS informado: {nps}", 12, entrelinha=30)
+
+    # Avaliações
+    doc.garantir(35)
+    doc.texto("Avaliações", 12, "Helvetica-Bold", entrelinha=20)
+    for k, v in avaliacoes.items():
+        doc.texto(f"{k}: {v}", entrelinha=15)
+
+    # Feedback
+    doc.espaco(20)
+    doc.garantir(34)
+    doc.texto("Feedback", 12, "Helvetica-Bold", entrelinha=20)
+
+    for titulo, texto in feedback.items():
+        doc.garantir(28)
+        doc.texto(f"{titulo}:", entrelinha=14)
+        doc.texto(texto, recuo=10, entrelinha=14)
+        doc.espaco(10)
+
+    return doc.finalizar()
+
+
+def resumo_nps(nps: dict) -> bytes:
+    """
+    Página resumida usada em /finalizacao/gerar-pdf-final.
+    """
+    doc = layout.Documento()
+
+    doc.texto("Pesquisa NPS", 16, "Helvetica-Bold", entrelinha=40)
+    doc.texto(f"NPS Final: {nps['nps']}", 11, entrelinha=30)
+
+    for k, v in nps["avaliacoes"].items():
+        doc.texto(f"{k.upper()}: {v}", 11, entrelinha=20)
+
+    doc.espaco(20)
+    for titulo, texto in nps["feedback"].items():
+        doc.garantir(32)
+        doc.texto(titulo.capitalize(), 12, "Helvetica-Bold", entrelinha=18)
+        doc.texto(texto, entrelinha=14)
+        doc.espaco(16)
+
+    return doc.finalizar()
+
+
+# ============================================================
+# MERGE
+# ============================================================
+
+def mesclar(fontes: List[Union[str, bytes]]) -> bytes:
+    """
+    Concatena PDFs (caminho em disco ou bytes) na ordem recebida.
+    """
+    from PyPDF2 import PdfReader, PdfWriter
+
+    writer = PdfWriter()
+
+    for fonte in fontes:
+        reader = PdfReader(fonte if isinstance(fonte, str) else BytesIO(fonte))
+        for page in reader.pages:
+            writer.add_page(page)
+
+    saida = BytesIO()
+    writer.write(saida)
+    return saida.getvalue()
@@ -0,0 +1,160 @@
+import os
+import re
+import time
+from collections import OrderedDict
+from typing import Dict, Optional, Tuple
+
+from app.services import database as db
+
+# Colunas mantidas em cache: só a identificação, que nunca muda. Status
+# e documentos são alterados por outros processos (API, worker) e o cache
+# é local: esses sempre vêm do banco (documentos()).
+COLUNAS_PROCESSO = "id,processo_id,codigo"
+COLUNAS_DOCUMENTOS = "termo_pdf,pdf_ressalvas"
+
+PROCESSOS_CACHE_TTL = float(os.getenv("PROCESSOS_CACHE_TTL", "300"))
+PROCESSOS_CACHE_MAX = int(os.getenv("PROCESSOS_CACHE_MAX", "10000"))
+
+_UUID = re.compile(r"[0-9a-fA-F]{8}-([0-9a-fA-F]{4}-){3}[0-9a-fA-F]{12}")
+
+
+# ============================================================
+# CACHE EM MEMÓRIA (TTL + LRU)
+# ============================================================
+
+class CacheProcessos:
+    """
+    codigo / processo_id / id → identificação do processo.
+
+    As três chaves apontam para o mesmo dict, então atualizar o registro
+    vale para todas. Usado só a partir do event loop (sem lock).
+    """
+
+    def __init__(self, ttl: float, max_chaves: int):
+        self.ttl = ttl
+        self.max_chaves = max_chaves
+        self._itens: "OrderedDict[str, Tuple[float, dict]]" = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+
+    @staticmethod
+    def _chaves(registro: dict):
+        for campo in ("codigo", "processo_id", "id"):
+            if registro.get(campo) is not None:
+                yield str(registro[campo])
+
+    def obter(self, chave: str) -> Optional[dict]:
+        item = self._itens.get(chave)
+
+        if item is None or item[0] < time.monotonic():
+            if item is not None:
+                self.remover(item[1])
+            self.misses += 1
+            return None
+
+        self._itens.move_to_end(chave)
+        self.hits += 1
+        return item[1]
+
+    def guardar(self, registro: dict) -> dict:
+        registro = {
+            campo: registro.get(campo) for campo in COLUNAS_PROCESSO.split(",")
+        }
+        expira = time.monotonic() + self.ttl
+
+        for chave in self._chaves(registro):
+            self._itens[chave] = (expira, registro)
+            self._itens.move_to_end(chave)
+
+        while len(self._itens) > self.max_chaves:
+            self._itens.popitem(last=False)
+
+        return registro
+
+    def atualizar(self, registro_id: str, valores: dict) -> None:
+        item = self._itens.get(str(registro_id))
+        if item is not None:
+            item[1].update(
+                (k, v) for k, v in valores.items() if k in item[1]
+            )
+
+    def remover(self, registro: dict) -> None:
+        for chave in self._chaves(registro):
+            self._itens.pop(chave, None)
+
+    def estatisticas(self) -> Dict[str, int]:
+        return {"hits": self.hits, "misses": self.misses, "chaves": len(self._itens)}
+
+
+cache = CacheProcessos(PROCESSOS_CACHE_TTL, PROCESSOS_CACHE_MAX)
+
+
+# ============================================================
+# API
+# ============================================================
+
+async def buscar(identificador: str) -> Optional[dict]:
+    """
+    Aceita o código humano (o que o front guarda) ou o UUID do processo.
+    Retorna só a identificação (id, processo_id, codigo), ou None se não
+    existir.
+    """
+    registro = cache.obter(identificador)
+    if registro is not None:
+        return registro
+
+    proc = await db.select(
+        "processos",
+        COLUNAS_PROCESSO,
+        {"codigo": db.eq(identificador)},
+        unico=True
+    )
+
+    if proc is None and _UUID.fullmatch(identificador):
+        proc = await db.select(
+            "processos",
+            COLUNAS_PROCESSO,
+            {"processo_id": db.eq(identificador)},
+            unico=True
+        )
+
+    if proc is None:
+        return None
+
+    return cache.guardar(proc)
+
+
+async def documentos(registro_id: str) -> dict:
+    """
+    URLs atuais dos PDFs do processo (por id), sempre lidas do banco.
+    """
+    linha = await db.select(
+        "processos",
+        COLUNAS_DOCUMENTOS,
+        {"id": db.eq(registro_id)},
+        unico=True
+    )
+    return linha or {}
+
+
+def lembrar(registro: dict) -> None:
+    """
+    Pré-popula o cache com um processo recém-criado.
+    """
+    cache.guardar(registro)
+
+
+async def atualizar(registro_id: str, valores: dict) -> None:
+    """
+    UPDATE em processos (por id); colunas em cache refletidas nele.
+    """
+    try:
+        await db.update("processos", valores, {"id": db.eq(registro_id)})
+    except Exception:
+        # Resultado incerto: a próxima leitura vai ao banco
+        registro = cache.obter(str(registro_id))
+        if registro is not None:
+            cache.remover(registro)
+        raise
+
+    cache.atualizar(registro_id, valores)
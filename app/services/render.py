@@ -0,0 +1,141 @@
+import asyncio
+import logging
+import multiprocessing
+import os
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from functools import partial
+from typing import Any, Callable, Optional, TypeVar
+
+from fastapi.concurrency import run_in_threadpool
+
+from app.services import metricas
+
+logger = logging.getLogger(__name__)
+
+# Processos de render (0 = renderiza no threadpool do próprio processo)
+RENDER_WORKERS = int(os.getenv("RENDER_WORKERS", str(os.cpu_count() or 2)))
+# Tempo máximo de um render, em segundos
+RENDER_TIMEOUT = float(os.getenv("RENDER_TIMEOUT", "60"))
+# spawn: filhos limpos, sem herdar threads/conexões da API
+RENDER_START_METHOD = os.getenv("RENDER_START_METHOD", "spawn")
+
+T = TypeVar("T")
+
+
+class RenderError(Exception):
+    pass
+
+
+class RenderTimeout(RenderError):
+    pass
+
+
+_pool: Optional[ProcessPoolExecutor] = None
+_aquecimento: Optional[asyncio.Task] = None
+
+
+# ============================================================
+# POOL
+# ============================================================
+
+def _aquecer() -> None:
+    """
+    Roda uma vez em cada processo: importa reportlab, PIL e PyPDF2
+    para que o primeiro render não pague o custo de import.
+    """
+    from app.services import pdfs
+
+    pdfs.carregar()
+
+
+def _ping() -> int:
+    return os.getpid()
+
+
+def _criar_pool() -> ProcessPoolExecutor:
+    return ProcessPoolExecutor(
+        max_workers=RENDER_WORKERS,
+        mp_context=multiprocessing.get_context(RENDER_START_METHOD),
+        initializer=_aquecer
+    )
+
+
+def _obter_pool() -> ProcessPoolExecutor:
+    global _pool
+    if _pool is None:
+        _pool = _criar_pool()
+    return _pool
+
+
+async def iniciar() -> None:
+    """
+    Cria o pool e sobe todos os processos antes da primeira requisição.
+    """
+    global _aquecimento
+
+    if RENDER_WORKERS <= 0:
+        # Sem pool: importa em segundo plano, sem atrasar o startup
+        _aquecimento = asyncio.create_task(run_in_threadpool(_aquecer))
+        return
+
+    pool = _obter_pool()
+    loop = asyncio.get_running_loop()
+    pids = await asyncio.gather(
+        *(loop.run_in_executor(pool, _ping) for _ in range(RENDER_WORKERS))
+    )
+    logger.info("Pool de render pronto: %d processo(s)", len(set(pids)))
+
+
+async def parar() -> None:
+    global _pool, _aquecimento
+    if _aquecimento is not None:
+        await asyncio.gather(_aquecimento, return_exceptions=True)
+        _aquecimento = None
+    if _pool is not None:
+        pool, _pool = _pool, None
+        await run_in_threadpool(pool.shutdown, True, cancel_futures=True)
+
+
+# ============================================================
+# RENDER
+# ============================================================
+
+async def renderizar(
+    funcao: Callable[..., T],
+    *args: Any,
+    timeout: Optional[float] = None,
+    **kwargs: Any
+) -> T:
+    """
+    Executa `funcao(*args, **kwargs)` num processo do pool.
+    A função precisa ser de módulo (picklable) e os argumentos/retorno
+    serializáveis — ver app.services.pdfs.
+    """
+    global _pool
+    timeout = RENDER_TIMEOUT if timeout is None else timeout
+    chamada = partial(funcao, *args, **kwargs)
+    pool = None
+
+    if RENDER_WORKERS <= 0:
+        futuro = run_in_threadpool(chamada)
+    else:
+        pool = _obter_pool()
+        futuro = asyncio.get_running_loop().run_in_executor(pool, chamada)
+
+    try:
+        with metricas.etapa("render"):
+            return await asyncio.wait_for(futuro, timeout=timeout)
+
+    except asyncio.TimeoutError:
+        # O processo termina o trabalho em segundo plano; a requisição não espera
+        raise RenderTimeout(
+            f"Render de {funcao.__name__} excedeu {timeout:g}s"
+        )
+
+    except BrokenProcessPool:
+        # Um processo morreu (ex.: falta de memória): recria o pool
+        logger.exception("Pool de render quebrado; recriando")
+        if _pool is pool:
+            _pool = None
+        raise RenderError("Falha no processo de render")
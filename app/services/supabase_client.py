@@ -1,16 +1,113 @@
+import logging
 import os
+from typing import Optional, Tuple
+
+import httpx
 from dotenv import load_dotenv
-from supabase import create_client
 
 load_dotenv()
 
+logger = logging.getLogger(__name__)
+
 SUPABASE_URL = os.getenv("SUPABASE_URL")
 SUPABASE_SERVICE_ROLE_KEY = os.getenv("SUPABASE_SERVICE_ROLE_KEY")
+# Abre a primeira conexão com o Supabase no startup (lifespan)
+SUPABASE_AQUECER = os.getenv("SUPABASE_AQUECER", "1") == "1"
+
+
+def _credenciais() -> Tuple[str, str]:
+    """
+    Validadas no primeiro uso, não no import: a API sobe (e os testes
+    importam os módulos) sem as variáveis configuradas.
+    """
+    if not SUPABASE_URL or not SUPABASE_SERVICE_ROLE_KEY:
+        raise RuntimeError("Variáveis SUPABASE não configuradas")
+    return SUPABASE_URL, SUPABASE_SERVICE_ROLE_KEY
+
+
+# ============================================================
+# CLIENTE DO SDK (LAZY)
+# ============================================================
+
+_client = None
+
+
+def get_client():
+    """
+    Cliente síncrono do SDK `supabase`, criado no primeiro uso.
+    O SDK é pesado para importar; as rotas usam o cliente HTTP abaixo.
+    """
+    global _client
+
+    if _client is None:
+        from supabase import create_client
+
+        _client = create_client(*_credenciais())
+
+    return _client
+
+
+def __getattr__(nome: str):
+    # Compatibilidade: `from app.services.supabase_client import supabase`
+    if nome == "supabase":
+        return get_client()
+    raise AttributeError(f"module {__name__!r} has no attribute {nome!r}")
+
+
+# ============================================================
+# CLIENTE HTTP ASSÍNCRONO (POOL COMPARTILHADO)
+# ============================================================
+
+SUPABASE_MAX_CONEXOES = int(os.getenv("SUPABASE_MAX_CONEXOES", "100"))
+SUPABASE_MAX_KEEPALIVE = int(os.getenv("SUPABASE_MAX_KEEPALIVE", "20"))
+SUPABASE_TIMEOUT = float(os.getenv("SUPABASE_TIMEOUT", "30"))
+
+_async_client: Optional[httpx.AsyncClient] = None
+
+
+def get_async_client() -> httpx.AsyncClient:
+    """
+    Retorna o cliente HTTP assíncrono compartilhado por todas as rotas.
+    As conexões com REST e Storage ficam no pool e são reutilizadas.
+    """
+    global _async_client
+
+    if _async_client is None or _async_client.is_closed:
+        url, chave = _credenciais()
+        _async_client = httpx.AsyncClient(
+            base_url=url.rstrip("/"),
+            headers={
+                "apikey": chave,
+                "Authorization": f"Bearer {chave}",
+            },
+            limits=httpx.Limits(
+                max_connections=SUPABASE_MAX_CONEXOES,
+                max_keepalive_connections=SUPABASE_MAX_KEEPALIVE,
+            ),
+            timeout=httpx.Timeout(SUPABASE_TIMEOUT),
+        )
+
+    return _async_client
+
+
+async def close_async_client() -> None:
+    global _async_client
+
+    if _async_client is not None:
+        await _async_client.aclose()
+        _async_client = None
+
 
-if not SUPABASE_URL or not SUPABASE_SERVICE_ROLE_KEY:
-    raise RuntimeError("Variáveis SUPABASE não configuradas")
+async def aquecer() -> None:
+    """
+    Hook do lifespan: cria o pool e abre uma conexão (DNS + TLS) antes da
+    primeira requisição. Falha aqui só é logada; a API sobe mesmo assim.
+    """
+    if not SUPABASE_AQUECER:
+        return
 
-supabase = create_client(
-    SUPABASE_URL,
-    SUPABASE_SERVICE_ROLE_KEY
-)
+    try:
+        client = get_async_client()
+        await client.head("/rest/v1/", timeout=5)
+    except Exception as exc:
+        logger.warning("Aquecimento do Supabase falhou: %s", exc)
@@ -1,49 +1,272 @@
-import base64
+import io
+import os
 import uuid
+from typing import AsyncIterable, AsyncIterator, BinaryIO, Optional, Union
 
-from app.services.supabase_client import supabase
+import httpx
+from fastapi.concurrency import run_in_threadpool
 
+from app.services import metricas
+from app.services.supabase_client import SUPABASE_URL, get_async_client
 
-def upload_pdf(pdf_base64: str, folder: str) -> str:
+BUCKET = "processos"
+
+# Content-type por tipo de artefato
+CONTENT_TYPES = {
+    "pdf": "application/pdf",
+    "png": "image/png",
+    "jpg": "image/jpeg",
+    "json": "application/json",
+}
+
+# Acima deste tamanho o corpo é enviado em streaming, em blocos
+UPLOAD_CHUNK_SIZE = int(os.getenv("UPLOAD_CHUNK_SIZE", str(256 * 1024)))
+UPLOAD_STREAMING_MIN = int(os.getenv("UPLOAD_STREAMING_MIN", str(8 * 1024 * 1024)))
+
+Fonte = Union[bytes, bytearray, memoryview, BinaryIO, AsyncIterable[bytes]]
+
+
+class UploadError(Exception):
+    def __init__(self, mensagem: str, status_code: Optional[int] = None):
+        super().__init__(mensagem)
+        self.status_code = status_code
+
+    @property
+    def duplicado(self) -> bool:
+        """Objeto já existe no bucket (upload sem upsert)."""
+        return self.status_code == 409 or "Duplicate" in str(self)
+
+
+# ============================================================
+# UTILS
+# ============================================================
+
+def public_url(path: str) -> str:
+    return f"{SUPABASE_URL.rstrip('/')}/storage/v1/object/public/{BUCKET}/{path}"
+
+
+def path_de_url(url: str) -> str:
+    """
+    Inverso de public_url: extrai o path do objeto no bucket.
+    """
+    prefixo = public_url("")
+    if not url.startswith(prefixo):
+        raise UploadError(f"URL fora do bucket {BUCKET}: {url}")
+    return url[len(prefixo):]
+
+
+def detectar_tipo(cabecalho: bytes) -> Optional[str]:
+    """
+    Identifica o tipo do artefato pelos primeiros bytes (magic number).
     """
-    Recebe PDF em base64 (data:application/pdf;base64,...)
-    Faz upload no Supabase Storage (bucket: processos)
+    if cabecalho.startswith(b"%PDF"):
+        return "pdf"
+    if cabecalho.startswith(b"\x89PNG\r\n\x1a\n"):
+        return "png"
+    if cabecalho.startswith(b"\xff\xd8\xff"):
+        return "jpg"
+    return None
+
+
+def _tamanho_arquivo(arquivo: BinaryIO) -> Optional[int]:
+    try:
+        atual = arquivo.tell()
+        arquivo.seek(0, os.SEEK_END)
+        fim = arquivo.tell()
+        arquivo.seek(atual)
+        return fim - atual
+    except (AttributeError, OSError, ValueError):
+        return None
+
+
+async def _blocos_memoria(dados: memoryview) -> AsyncIterator[bytes]:
+    for inicio in range(0, len(dados), UPLOAD_CHUNK_SIZE):
+        yield bytes(dados[inicio:inicio + UPLOAD_CHUNK_SIZE])
+
+
+async def _blocos_arquivo(arquivo: BinaryIO) -> AsyncIterator[bytes]:
+    while True:
+        bloco = await run_in_threadpool(arquivo.read, UPLOAD_CHUNK_SIZE)
+        if not bloco:
+            break
+        yield bloco
+
+
+async def _prefixar(primeiro: bytes, resto: AsyncIterable[bytes]) -> AsyncIterator[bytes]:
+    yield primeiro
+    async for bloco in resto:
+        yield bloco
+
+
+# ============================================================
+# UPLOAD
+# ============================================================
+
+async def upload_bytes(
+    dados: Fonte,
+    folder: str,
+    *,
+    tipo: Optional[str] = None,
+    nome: Optional[str] = None,
+    upsert: bool = False,
+    streaming: Optional[bool] = None
+) -> str:
+    """
+    Faz upload de bytes, memoryview, arquivo (file-like) ou iterável
+    assíncrono de blocos no Supabase Storage (bucket: processos).
+
+    - tipo: "pdf", "png" ou "jpg"; se omitido, é detectado pelo conteúdo
+    - nome: nome do objeto; se omitido, gera <uuid>.<tipo>
+    - streaming: força (ou desliga) o envio em blocos; por padrão é usado
+      para arquivos acima de UPLOAD_STREAMING_MIN ou de tamanho desconhecido
+
     Retorna URL pública
     """
 
     try:
+        tamanho: Optional[int] = None
+
         # ---------------------------------
-        # 1. Remove header base64
+        # 1. Normaliza a fonte
         # ---------------------------------
-        if "," in pdf_base64:
-            pdf_base64 = pdf_base64.split(",", 1)[1]
+        if isinstance(dados, io.BytesIO):
+            dados = dados.getbuffer()[dados.tell():]
 
-        pdf_bytes = base64.b64decode(pdf_base64)
+        if isinstance(dados, (bytes, bytearray, memoryview)):
+            view = memoryview(dados).cast("B")
+            tamanho = len(view)
+            cabecalho = bytes(view[:16])
+
+            if streaming is None:
+                streaming = tamanho >= UPLOAD_STREAMING_MIN
+
+            if streaming:
+                corpo = _blocos_memoria(view)
+            elif isinstance(dados, bytes):
+                corpo = dados
+            else:
+                corpo = view.tobytes()
+
+        elif hasattr(dados, "read"):
+            tamanho = await run_in_threadpool(_tamanho_arquivo, dados)
+
+            if streaming is None:
+                streaming = tamanho is None or tamanho >= UPLOAD_STREAMING_MIN
+
+            if streaming:
+                cabecalho = await run_in_threadpool(dados.read, UPLOAD_CHUNK_SIZE)
+                corpo = _prefixar(cabecalho, _blocos_arquivo(dados))
+            else:
+                corpo = await run_in_threadpool(dados.read)
+                cabecalho = corpo[:16]
+
+        else:
+            iterador = dados.__aiter__()
+            cabecalho = await iterador.__anext__()
+            corpo = _prefixar(cabecalho, iterador)
+
+        # ---------------------------------
+        # 2. Tipo e content-type
+        # ---------------------------------
+        tipo = tipo or detectar_tipo(cabecalho)
+        if tipo not in CONTENT_TYPES:
+            raise UploadError("Falha no upload do arquivo: tipo não suportado")
 
         # ---------------------------------
-        # 2. Path
+        # 3. Path
         # ---------------------------------
-        filename = f"{uuid.uuid4()}.pdf"
+        filename = nome or f"{uuid.uuid4()}.{tipo}"
         path = f"{folder}/{filename}"
 
+        headers = {
+            "content-type": CONTENT_TYPES[tipo],
+            "x-upsert": "true" if upsert else "false"
+        }
+        if tamanho is not None:
+            headers["content-length"] = str(tamanho)
+
         # ---------------------------------
-        # 3. Upload (SE FALHAR, LANÇA EXCEPTION)
+        # 4. Upload (SE FALHAR, LANÇA EXCEPTION)
         # ---------------------------------
-        supabase.storage.from_("processos").upload(
-            path,
-            pdf_bytes,
-            file_options={
-                "content-type": "application/pdf",
-                "upsert": False
-            }
-        )
+        with metricas.etapa("upload", tamanho or 0):
+            resp = await get_async_client().post(
+                f"/storage/v1/object/{BUCKET}/{path}",
+                content=corpo,
+                headers=headers
+            )
+        metricas.contar_upload(tipo, tamanho, resp.status_code < 400)
+
+        if resp.status_code >= 400:
+            raise UploadError(
+                f"Falha no upload do arquivo: {resp.status_code}: {resp.text}",
+                status_code=resp.status_code
+            )
 
         # ---------------------------------
-        # 4. URL pública
+        # 5. URL pública
         # ---------------------------------
-        public_url = supabase.storage.from_("processos").get_public_url(path)
+        return public_url(path)
 
-        return public_url
+    except UploadError:
+        raise
 
     except Exception as e:
-        raise Exception(f"Falha no upload do PDF: {str(e)}")
+        raise UploadError(f"Falha no upload do arquivo: {str(e)}")
+
+
+async def existe_objeto(path: str) -> bool:
+    """
+    Consulta remota de existência (HEAD) de um objeto do bucket.
+    """
+    with metricas.etapa("storage_head"):
+        resp = await get_async_client().head(f"/storage/v1/object/{BUCKET}/{path}")
+
+    if resp.status_code == 200:
+        return True
+    if resp.status_code in (400, 404):
+        return False
+
+    raise UploadError(
+        f"Falha ao consultar objeto: {resp.status_code}",
+        status_code=resp.status_code
+    )
+
+
+def _status_storage(resp: httpx.Response) -> int:
+    """
+    O Storage responde 400 com o status verdadeiro em `statusCode` no corpo
+    (404 para objeto inexistente, 403 para token inválido, ...).
+    """
+    if resp.status_code != 400:
+        return resp.status_code
+    try:
+        return int(resp.json().get("statusCode"))
+    except (ValueError, TypeError, AttributeError):
+        return 400
+
+
+async def baixar(path: str) -> bytes:
+    """
+    Download autenticado de um objeto do bucket.
+    Objeto inexistente → UploadError com status_code 404; falha de rede →
+    UploadError sem status_code.
+    """
+    try:
+        with metricas.etapa("download") as span:
+            resp = await get_async_client().get(f"/storage/v1/object/{BUCKET}/{path}")
+            span.bytes = len(resp.content)
+    except httpx.HTTPError as e:
+        raise UploadError(f"Falha ao baixar arquivo {path}: {e!r}")
+
+    status = _status_storage(resp)
+    if status == 404:
+        raise UploadError(f"Arquivo não encontrado: {path}", status_code=404)
+
+    if status >= 400:
+        raise UploadError(
+            f"Falha ao baixar arquivo: {status}: {resp.text}",
+            status_code=status
+        )
+
+    metricas.contar_download(len(resp.content))
+    return resp.content
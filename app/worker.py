@@ -0,0 +1,37 @@
+"""
+Worker dedicado da fila de jobs.
+
+    python -m app.worker
+
+Permite escalar a geração de PDFs separada da API
+(rodar a API com JOBS_WORKERS=0 e N processos deste worker).
+"""
+import asyncio
+import logging
+import os
+
+# Importar os routers registra os handlers de cada tipo de job
+from app.routers import nps, ressalvas, termo  # noqa: F401
+from app.services import jobs, render
+from app.services.supabase_client import close_async_client
+
+WORKER_CONCORRENCIA = int(os.getenv("WORKER_CONCORRENCIA", "4"))
+
+
+async def main() -> None:
+    await render.iniciar()
+    await jobs.iniciar(WORKER_CONCORRENCIA)
+    try:
+        await asyncio.Event().wait()
+    finally:
+        await jobs.parar()
+        await render.parar()
+        await close_async_client()
+
+
+if __name__ == "__main__":
+    logging.basicConfig(level=logging.INFO)
+    try:
+        asyncio.run(main())
+    except KeyboardInterrupt:
+        pass
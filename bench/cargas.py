@@ -0,0 +1,225 @@
+"""
+Geradores de payload realistas para os benchmarks.
+
+- PNG no tamanho de um html2canvas do termo (tela de celular, escala 2-3x)
+- fotos JPEG de câmera de celular para as ressalvas
+- corpos JSON de /termo/salvar, /ressalvas/salvar, /nps/finalizar e
+  /api/respostas
+
+Gerar imagens é caro, então cada imagem base é gerada uma vez por
+(tipo, tamanho, semente) e as variações só trocam um chunk de metadados:
+o conteúdo (SHA-256) muda, e o dedup do armazenamento não mascara o upload.
+"""
+import base64
+import random
+import struct
+import zlib
+from functools import lru_cache
+from io import BytesIO
+from typing import List, Optional
+
+from PIL import Image, ImageDraw, ImageFilter, ImageFont
+
+# html2canvas do TermoAceite.html num celular (390 x ~844 CSS px, escala 3)
+TERMO_LARGURA = 1170
+TERMO_ALTURA = 2532
+
+# Foto de câmera reduzida pelo navegador antes do envio
+FOTO_LARGURA = 1600
+FOTO_ALTURA = 1200
+
+
+# ============================================================
+# IMAGENS BASE
+# ============================================================
+
+PALAVRAS = (
+    "entrega vistoria apartamento cliente termo aceite unidade chaves "
+    "acabamento declaro recebi imóvel condições conforme memorial"
+).split()
+
+
+@lru_cache(maxsize=16)
+def _png_termo(largura: int, altura: int, semente: int) -> bytes:
+    """
+    Captura de tela: fundo em degradê, cabeçalho, texto com antialiasing,
+    campos e uma assinatura à mão livre (o que o html2canvas gera do
+    formulário; ~200 KB como no celular).
+    """
+    rnd = random.Random(semente)
+    escala = largura / 390
+
+    fundo = Image.linear_gradient("L").resize((largura, altura))
+    img = Image.merge("RGB", [
+        fundo.point(lambda v: 245 - v // 12),
+        fundo.point(lambda v: 240 - v // 10),
+        Image.new("L", (largura, altura), 252),
+    ])
+    draw = ImageDraw.Draw(img)
+    fonte = ImageFont.load_default(size=int(14 * escala))
+
+    draw.rectangle((0, 0, largura, int(90 * escala)), fill=(91, 47, 166))
+    y = int(120 * escala)
+    while y < altura * 0.75:
+        for _ in range(rnd.randint(3, 7)):
+            linha = " ".join(rnd.choice(PALAVRAS) for _ in range(5))
+            draw.text((20 * escala, y), linha, font=fonte, fill=(40, 40, 40))
+            y += int(20 * escala)
+        y += int(16 * escala)
+        # Campo de formulário
+        draw.rounded_rectangle(
+            (20 * escala, y, largura - 20 * escala, y + 40 * escala),
+            radius=int(6 * escala),
+            fill=(255, 255, 255),
+            outline=(200, 200, 200),
+            width=max(1, int(escala))
+        )
+        y += int(60 * escala)
+
+    pontos = []
+    x, yy = largura * 0.2, altura * 0.85
+    for _ in range(120):
+        x += rnd.uniform(2, 8) * escala
+        yy += rnd.uniform(-10, 10) * escala
+        pontos.append((x, yy))
+    draw.line(pontos, fill=(20, 20, 120), width=int(2 * escala), joint="curve")
+
+    saida = BytesIO()
+    img.save(saida, format="PNG")
+    return saida.getvalue()
+
+
+@lru_cache(maxsize=16)
+def _jpeg_foto(largura: int, altura: int, semente: int) -> bytes:
+    """
+    Foto: gradiente de cor com ruído de sensor (comprime como uma foto real).
+    """
+    rnd = random.Random(semente)
+    base = Image.linear_gradient("L").resize((largura, altura))
+    cores = [
+        Image.eval(base, lambda v, a=rnd.randint(0, 255): (v + a) % 256)
+        for _ in range(3)
+    ]
+    img = Image.merge("RGB", cores)
+    ruido = Image.effect_noise((largura, altura), rnd.uniform(20, 40)).convert("RGB")
+    img = Image.blend(img, ruido, 0.35).filter(ImageFilter.GaussianBlur(1))
+
+    saida = BytesIO()
+    img.save(saida, format="JPEG", quality=88)
+    return saida.getvalue()
+
+
+# ============================================================
+# VARIAÇÕES BARATAS (CONTEÚDO ÚNICO)
+# ============================================================
+
+def _variar_png(dados: bytes, marca: bytes) -> bytes:
+    # Chunk tEXt logo antes do IEND (últimos 12 bytes)
+    conteudo = b"bench\x00" + marca
+    chunk = struct.pack(">I", len(conteudo)) + b"tEXt" + conteudo
+    chunk += struct.pack(">I", zlib.crc32(b"tEXt" + conteudo) & 0xFFFFFFFF)
+    return dados[:-12] + chunk + dados[-12:]
+
+
+def _variar_jpeg(dados: bytes, marca: bytes) -> bytes:
+    # Segmento de comentário (COM) logo depois do SOI
+    return dados[:2] + b"\xff\xfe" + struct.pack(">H", len(marca) + 2) + marca + dados[2:]
+
+
+def png_termo(
+    variacao: Optional[int] = None,
+    largura: int = TERMO_LARGURA,
+    altura: int = TERMO_ALTURA,
+    semente: int = 0
+) -> bytes:
+    dados = _png_termo(largura, altura, semente)
+    if variacao is None:
+        return dados
+    return _variar_png(dados, str(variacao).encode())
+
+
+def jpeg_foto(
+    variacao: Optional[int] = None,
+    largura: int = FOTO_LARGURA,
+    altura: int = FOTO_ALTURA,
+    semente: int = 0
+) -> bytes:
+    dados = _jpeg_foto(largura, altura, semente)
+    if variacao is None:
+        return dados
+    return _variar_jpeg(dados, str(variacao).encode())
+
+
+def data_url(dados: bytes, mime: str) -> str:
+    return f"data:{mime};base64," + base64.b64encode(dados).decode("ascii")
+
+
+# ============================================================
+# PAYLOADS
+# ============================================================
+
+def cpf(rnd: random.Random) -> str:
+    return "".join(str(rnd.randint(0, 9)) for _ in range(11))
+
+
+def termo(i: int, unico: bool = True) -> dict:
+    rnd = random.Random(i)
+    return {
+        "cpf": cpf(rnd),
+        "nome_cliente": rnd.choice(["Ana Souza", "João Lima", "Maria Reis"]),
+        "status_entrega": "concluido_com_ressalva",
+        "imagem": data_url(png_termo(i if unico else None, semente=i % 4), "image/png"),
+        "imagens": [],
+    }
+
+
+def ressalvas(
+    processo_id: str,
+    i: int,
+    itens: int = 5,
+    com_fotos: bool = True,
+    unico: bool = True
+) -> dict:
+    lista: List[dict] = []
+    for n in range(itens):
+        item = {
+            "item": str(n + 1),
+            "descricao": f"Ajuste no acabamento do item {n + 1} " * 3,
+            "prazo": "2026-12-31",
+            "aprovacao": n % 2 == 0,
+        }
+        if com_fotos:
+            foto = jpeg_foto(i * 1000 + n if unico else None, semente=n % 4)
+            item["imagem_base64"] = data_url(foto, "image/jpeg")
+        lista.append(item)
+
+    return {
+        "processo_id": processo_id,
+        "responsavel": "Equipe de entrega",
+        "observacoes": "Gerado pelo benchmark",
+        "imagens": lista,
+    }
+
+
+def nps(processo_id: str, i: int) -> dict:
+    rnd = random.Random(i)
+    return {
+        "processo_id": processo_id,
+        "nps": rnd.randint(0, 10),
+        "avaliacoes": {
+            chave: rnd.randint(1, 5)
+            for chave in ("atendimento", "prazo", "qualidade", "limpeza")
+        },
+        "feedback": {
+            "elogios": "Equipe atenciosa e pontual. " * 4,
+            "sugestoes": "Avisar com antecedência sobre a vistoria. " * 2,
+        },
+    }
+
+
+def resposta(i: int) -> dict:
+    return {
+        "cliente_id": f"cliente-{i % 500}",
+        "pagina": random.Random(i).choice(["termo", "ressalvas", "nps"]),
+        "dados": {"pergunta": i % 12, "valor": i % 11, "comentario": "ok"},
+    }
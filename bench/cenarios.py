@@ -0,0 +1,125 @@
+"""
+Cenários do benchmark: rota, payloads e a preparação de dados que cada
+um precisa (ex.: o NPS finaliza processos que já têm termo e ressalvas).
+"""
+import asyncio
+import json
+from dataclasses import dataclass
+from typing import Awaitable, Callable, Dict, List
+
+import httpx
+
+from bench import cargas
+
+
+@dataclass
+class Parametros:
+    itens_ressalva: int = 5
+    # Fotos nas ressalvas criadas só para preparar o cenário de NPS
+    itens_preparo_nps: int = 2
+    concorrencia_preparo: int = 4
+
+
+@dataclass
+class Cenario:
+    nome: str
+    rota: str
+    requisicoes_padrao: int
+    # (cliente, quantidade, parâmetros) → corpos JSON já serializados
+    gerar: Callable[[httpx.AsyncClient, int, Parametros], Awaitable[List[bytes]]]
+
+
+def _json(corpo: dict) -> bytes:
+    return json.dumps(corpo).encode("utf-8")
+
+
+async def _em_paralelo(chamadas: List[Callable[[], Awaitable]], limite: int) -> list:
+    semaforo = asyncio.Semaphore(limite)
+
+    async def rodar(chamada):
+        async with semaforo:
+            return await chamada()
+
+    return await asyncio.gather(*(rodar(c) for c in chamadas))
+
+
+async def _criar_processo(cliente: httpx.AsyncClient, i: int) -> str:
+    resp = await cliente.post(
+        "/termo/salvar",
+        content=_json(cargas.termo(1_000_000 + i)),
+        headers={"content-type": "application/json"}
+    )
+    resp.raise_for_status()
+    return resp.json()["processo_id"]
+
+
+async def _criar_ressalvas(
+    cliente: httpx.AsyncClient,
+    codigo: str,
+    i: int,
+    itens: int
+) -> None:
+    resp = await cliente.post(
+        "/ressalvas/salvar",
+        content=_json(cargas.ressalvas(codigo, 1_000_000 + i, itens=itens)),
+        headers={"content-type": "application/json"}
+    )
+    resp.raise_for_status()
+
+
+async def _processos(
+    cliente: httpx.AsyncClient,
+    quantidade: int,
+    parametros: Parametros,
+    com_ressalvas: bool
+) -> List[str]:
+    codigos = await _em_paralelo(
+        [lambda i=i: _criar_processo(cliente, i) for i in range(quantidade)],
+        parametros.concorrencia_preparo
+    )
+    if com_ressalvas:
+        await _em_paralelo(
+            [
+                lambda i=i, c=c: _criar_ressalvas(
+                    cliente, c, i, parametros.itens_preparo_nps
+                )
+                for i, c in enumerate(codigos)
+            ],
+            parametros.concorrencia_preparo
+        )
+    return codigos
+
+
+# ============================================================
+# GERADORES
+# ============================================================
+
+async def _gerar_termo(cliente, quantidade, parametros) -> List[bytes]:
+    return [_json(cargas.termo(i)) for i in range(quantidade)]
+
+
+async def _gerar_ressalvas(cliente, quantidade, parametros) -> List[bytes]:
+    codigos = await _processos(cliente, quantidade, parametros, com_ressalvas=False)
+    return [
+        _json(cargas.ressalvas(codigo, i, itens=parametros.itens_ressalva))
+        for i, codigo in enumerate(codigos)
+    ]
+
+
+async def _gerar_nps(cliente, quantidade, parametros) -> List[bytes]:
+    codigos = await _processos(cliente, quantidade, parametros, com_ressalvas=True)
+    return [_json(cargas.nps(codigo, i)) for i, codigo in enumerate(codigos)]
+
+
+async def _gerar_respostas(cliente, quantidade, parametros) -> List[bytes]:
+    return [_json(cargas.resposta(i)) for i in range(quantidade)]
+
+
+CENARIOS: Dict[str, Cenario] = {
+    c.nome: c for c in (
+        Cenario("termo", "/termo/salvar", 40, _gerar_termo),
+        Cenario("ressalvas", "/ressalvas/salvar", 20, _gerar_ressalvas),
+        Cenario("nps", "/nps/finalizar", 20, _gerar_nps),
+        Cenario("respostas", "/api/respostas", 2000, _gerar_respostas),
+    )
+}
@@ -0,0 +1,406 @@
+"""
+Benchmark da API contra o Supabase fake.
+
+    python -m bench.executar
+    python -m bench.executar --cenarios termo,nps --concorrencia 16 \\
+        --latencia-rest-ms 15 --latencia-storage-ms 40 --jitter-ms 10
+    python -m bench.executar --salvar-baseline local
+    python -m bench.executar --comparar local --tolerancia 0.15
+
+Sobe o Supabase fake (bench.supabase_fake) e a API (uvicorn app.main:app)
+em subprocessos, com dados locais (cache, CAS, jobs) numa pasta temporária.
+Para cada cenário: prepara os dados, aquece, dispara as requisições com a
+concorrência pedida e mede vazão, latência (p50/p95/p99), pico de RSS da
+API (processo + filhos do pool de render) e tamanho dos PDFs enviados.
+
+Baselines ficam em bench/baselines/<nome>.json; --comparar sai com código 1
+se algum cenário piorou além da tolerância.
+"""
+import argparse
+import asyncio
+import json
+import os
+import platform
+import socket
+import subprocess
+import sys
+import tempfile
+import time
+from dataclasses import asdict
+from typing import Dict, List, Optional
+
+import httpx
+
+from bench.cenarios import CENARIOS, Cenario, Parametros
+
+PASTA_BASELINES = os.path.join(os.path.dirname(__file__), "baselines")
+
+# Métrica → True se maior é melhor
+METRICAS = {
+    "throughput_rps": True,
+    "p50_ms": False,
+    "p95_ms": False,
+    "p99_ms": False,
+    "rss_pico_mb": False,
+    "pdf_media_kb": False,
+}
+
+
+# ============================================================
+# PROCESSOS
+# ============================================================
+
+def _porta_livre() -> int:
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+async def _esperar(url: str, processo: subprocess.Popen, limite: float = 60) -> None:
+    fim = time.monotonic() + limite
+    async with httpx.AsyncClient() as cliente:
+        while time.monotonic() < fim:
+            if processo.poll() is not None:
+                raise RuntimeError(f"Processo saiu com código {processo.returncode}: {url}")
+            try:
+                await cliente.get(url, timeout=1)
+                return
+            except httpx.TransportError:
+                await asyncio.sleep(0.2)
+    raise RuntimeError(f"Timeout esperando {url}")
+
+
+def _rss_kb(pid: int) -> int:
+    try:
+        with open(f"/proc/{pid}/status") as f:
+            for linha in f:
+                if linha.startswith("VmRSS:"):
+                    return int(linha.split()[1])
+    except OSError:
+        pass
+    return 0
+
+
+def _arvore(pid: int) -> List[int]:
+    pids, pendentes = [], [pid]
+    while pendentes:
+        atual = pendentes.pop()
+        pids.append(atual)
+        try:
+            for tarefa in os.listdir(f"/proc/{atual}/task"):
+                with open(f"/proc/{atual}/task/{tarefa}/children") as f:
+                    pendentes.extend(int(p) for p in f.read().split())
+        except OSError:
+            pass
+    return pids
+
+
+class MonitorMemoria:
+    """
+    Amostra a RSS somada do processo e dos filhos (Linux, /proc).
+    """
+
+    def __init__(self, pid: Optional[int], intervalo: float = 0.05):
+        self.pid = pid
+        self.intervalo = intervalo
+        self.pico_kb = 0
+        self._task: Optional[asyncio.Task] = None
+
+    async def _loop(self) -> None:
+        while True:
+            total = sum(_rss_kb(p) for p in _arvore(self.pid))
+            self.pico_kb = max(self.pico_kb, total)
+            await asyncio.sleep(self.intervalo)
+
+    def __enter__(self):
+        if self.pid is not None and os.path.isdir("/proc"):
+            self._task = asyncio.get_running_loop().create_task(self._loop())
+        return self
+
+    def __exit__(self, *exc):
+        if self._task is not None:
+            self._task.cancel()
+
+    @property
+    def pico_mb(self) -> Optional[float]:
+        return round(self.pico_kb / 1024, 1) if self.pico_kb else None
+
+
+# ============================================================
+# MEDIÇÃO
+# ============================================================
+
+def _percentil(ordenados: List[float], p: float) -> float:
+    if not ordenados:
+        return 0.0
+    indice = max(0, min(len(ordenados) - 1, round(p / 100 * len(ordenados) + 0.5) - 1))
+    return ordenados[indice]
+
+
+async def _disparar(
+    cliente: httpx.AsyncClient,
+    rota: str,
+    corpos: List[bytes],
+    concorrencia: int
+) -> tuple:
+    latencias: List[float] = []
+    status: Dict[str, int] = {}
+    fila = iter(corpos)
+
+    async def trabalhador():
+        for corpo in fila:
+            inicio = time.perf_counter()
+            try:
+                resp = await cliente.post(
+                    rota, content=corpo, headers={"content-type": "application/json"}
+                )
+                chave = str(resp.status_code)
+            except httpx.HTTPError as e:
+                chave = type(e).__name__
+            latencias.append((time.perf_counter() - inicio) * 1000)
+            status[chave] = status.get(chave, 0) + 1
+
+    inicio = time.perf_counter()
+    await asyncio.gather(*(trabalhador() for _ in range(concorrencia)))
+    return time.perf_counter() - inicio, latencias, status
+
+
+async def rodar_cenario(
+    api: httpx.AsyncClient,
+    fake: httpx.AsyncClient,
+    cenario: Cenario,
+    requisicoes: int,
+    concorrencia: int,
+    aquecimento: int,
+    parametros: Parametros,
+    pid_api: Optional[int]
+) -> dict:
+    corpos = await cenario.gerar(api, requisicoes + aquecimento, parametros)
+
+    if aquecimento:
+        await _disparar(api, cenario.rota, corpos[:aquecimento], concorrencia)
+
+    await fake.post("/_bench/reiniciar-estatisticas")
+    with MonitorMemoria(pid_api) as memoria:
+        duracao, latencias, status = await _disparar(
+            api, cenario.rota, corpos[aquecimento:], concorrencia
+        )
+    estatisticas = (await fake.get("/_bench/estatisticas")).json()
+
+    ordenadas = sorted(latencias)
+    ok = sum(n for s, n in status.items() if s.startswith("2"))
+    pdfs = estatisticas["pdfs"]
+
+    return {
+        "requisicoes": len(latencias),
+        "concorrencia": concorrencia,
+        "status": status,
+        "duracao_s": round(duracao, 3),
+        "throughput_rps": round(ok / duracao, 2) if duracao else 0.0,
+        "p50_ms": round(_percentil(ordenadas, 50), 1),
+        "p95_ms": round(_percentil(ordenadas, 95), 1),
+        "p99_ms": round(_percentil(ordenadas, 99), 1),
+        "max_ms": round(ordenadas[-1], 1) if ordenadas else 0.0,
+        "rss_pico_mb": memoria.pico_mb,
+        "pdfs": len(pdfs),
+        "pdf_media_kb": round(sum(pdfs) / len(pdfs) / 1024, 1) if pdfs else None,
+        "pdf_max_kb": round(max(pdfs) / 1024, 1) if pdfs else None,
+        "chamadas_supabase": estatisticas["chamadas"],
+    }
+
+
+# ============================================================
+# RELATÓRIO / BASELINES
+# ============================================================
+
+def imprimir(resultados: Dict[str, dict]) -> None:
+    print(
+        f"\n{'cenário':<10} {'req':>5} {'ok%':>5} {'req/s':>8} {'p50':>8} "
+        f"{'p95':>8} {'p99':>8} {'RSS MB':>7} {'PDF KB':>7}"
+    )
+    for nome, r in resultados.items():
+        ok = sum(n for s, n in r["status"].items() if s.startswith("2"))
+        print(
+            f"{nome:<10} {r['requisicoes']:>5} {100 * ok / max(1, r['requisicoes']):>5.0f} "
+            f"{r['throughput_rps']:>8.1f} {r['p50_ms']:>6.0f}ms {r['p95_ms']:>6.0f}ms "
+            f"{r['p99_ms']:>6.0f}ms {r['rss_pico_mb'] or 0:>7.0f} "
+            f"{r['pdf_media_kb'] or 0:>7.0f}"
+        )
+        erros = {s: n for s, n in r["status"].items() if not s.startswith("2")}
+        if erros:
+            print(f"{'':<10} erros: {erros}")
+
+
+def comparar(atual: Dict[str, dict], baseline: Dict[str, dict], tolerancia: float) -> bool:
+    """
+    Imprime as variações e retorna True se houve regressão.
+    """
+    regressao = False
+    print(f"\nComparação com baseline (tolerância {tolerancia:.0%}):")
+
+    for nome, r in atual.items():
+        base = baseline.get(nome)
+        if base is None:
+            print(f"  {nome}: sem baseline")
+            continue
+
+        for metrica, maior_melhor in METRICAS.items():
+            antes, depois = base.get(metrica), r.get(metrica)
+            if not antes or depois is None:
+                continue
+            variacao = (depois - antes) / antes
+            piorou = variacao < -tolerancia if maior_melhor else variacao > tolerancia
+            regressao |= piorou
+            print(
+                f"  {nome:<10} {metrica:<14} {antes:>10} → {depois:<10} "
+                f"{variacao:+.1%}{'  REGRESSÃO' if piorou else ''}"
+            )
+
+    return regressao
+
+
+def _caminho_baseline(nome: str) -> str:
+    return os.path.join(PASTA_BASELINES, f"{nome}.json")
+
+
+# ============================================================
+# MAIN
+# ============================================================
+
+async def main(args: argparse.Namespace) -> int:
+    nomes = [n.strip() for n in args.cenarios.split(",") if n.strip()]
+    desconhecidos = [n for n in nomes if n not in CENARIOS]
+    if desconhecidos:
+        print(f"Cenários desconhecidos: {desconhecidos} (há {list(CENARIOS)})")
+        return 2
+
+    parametros = Parametros(itens_ressalva=args.itens)
+    processos: List[subprocess.Popen] = []
+    raiz = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+    with tempfile.TemporaryDirectory(prefix="bench-") as pasta:
+        porta_fake, porta_api = _porta_livre(), _porta_livre()
+        url_fake = f"http://127.0.0.1:{porta_fake}"
+        url_api = f"http://127.0.0.1:{porta_api}"
+
+        try:
+            fake = subprocess.Popen(
+                [
+                    sys.executable, "-m", "bench.supabase_fake",
+                    "--porta", str(porta_fake),
+                    "--latencia-rest-ms", str(args.latencia_rest_ms),
+                    "--latencia-storage-ms", str(args.latencia_storage_ms),
+                    "--jitter-ms", str(args.jitter_ms),
+                    "--storage-ms-por-mb", str(args.storage_ms_por_mb),
+                ],
+                cwd=raiz
+            )
+            processos.append(fake)
+            await _esperar(url_fake + "/_bench/estatisticas", fake)
+
+            ambiente = {
+                **os.environ,
+                "SUPABASE_URL": url_fake,
+                "SUPABASE_SERVICE_ROLE_KEY": "bench",
+                "ARTEFATOS_DIR": os.path.join(pasta, "artefatos"),
+                "CAS_INDICE": os.path.join(pasta, "cas.sqlite3"),
+                "JOBS_DB": os.path.join(pasta, "jobs.sqlite3"),
+                "JOBS_DIR": os.path.join(pasta, "jobs"),
+                "RESPOSTAS_SPILL": os.path.join(pasta, "respostas.spill.jsonl"),
+            }
+            api = subprocess.Popen(
+                [
+                    sys.executable, "-m", "uvicorn", "app.main:app",
+                    "--host", "127.0.0.1",
+                    "--port", str(porta_api),
+                    "--log-level", "warning",
+                ],
+                cwd=raiz,
+                env=ambiente
+            )
+            processos.append(api)
+            await _esperar(url_api + "/", api)
+
+            resultados: Dict[str, dict] = {}
+            limites = httpx.Limits(max_connections=max(args.concorrencia, 10))
+            async with httpx.AsyncClient(
+                base_url=url_api, timeout=args.timeout, limits=limites
+            ) as cliente_api, httpx.AsyncClient(base_url=url_fake) as cliente_fake:
+                for nome in nomes:
+                    cenario = CENARIOS[nome]
+                    print(f"Cenário {nome}...", flush=True)
+                    resultados[nome] = await rodar_cenario(
+                        cliente_api,
+                        cliente_fake,
+                        cenario,
+                        args.requisicoes or cenario.requisicoes_padrao,
+                        args.concorrencia,
+                        args.aquecimento,
+                        parametros,
+                        api.pid
+                    )
+
+        finally:
+            for processo in reversed(processos):
+                processo.terminate()
+                try:
+                    processo.wait(timeout=15)
+                except subprocess.TimeoutExpired:
+                    processo.kill()
+
+    imprimir(resultados)
+
+    execucao = {
+        "parametros": {
+            **{k: v for k, v in vars(args).items()
+               if k not in ("salvar_baseline", "comparar")},
+            **asdict(parametros),
+            "render_workers": os.getenv("RENDER_WORKERS"),
+        },
+        "maquina": {
+            "python": platform.python_version(),
+            "cpus": os.cpu_count(),
+            "plataforma": platform.platform(),
+        },
+        "cenarios": resultados,
+    }
+
+    if args.json:
+        with open(args.json, "w", encoding="utf-8") as f:
+            json.dump(execucao, f, indent=2, ensure_ascii=False)
+
+    if args.salvar_baseline:
+        os.makedirs(PASTA_BASELINES, exist_ok=True)
+        with open(_caminho_baseline(args.salvar_baseline), "w", encoding="utf-8") as f:
+            json.dump(execucao, f, indent=2, ensure_ascii=False)
+        print(f"\nBaseline salvo: {_caminho_baseline(args.salvar_baseline)}")
+
+    if args.comparar:
+        with open(_caminho_baseline(args.comparar), "r", encoding="utf-8") as f:
+            baseline = json.load(f)
+        if comparar(resultados, baseline["cenarios"], args.tolerancia):
+            return 1
+
+    return 0
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Benchmark da API")
+    parser.add_argument("--cenarios", default=",".join(CENARIOS))
+    parser.add_argument("--requisicoes", type=int, default=0,
+                        help="por cenário (0 = padrão de cada cenário)")
+    parser.add_argument("--concorrencia", type=int, default=8)
+    parser.add_argument("--aquecimento", type=int, default=2)
+    parser.add_argument("--itens", type=int, default=5,
+                        help="itens com foto por ressalva")
+    parser.add_argument("--timeout", type=float, default=120)
+    parser.add_argument("--latencia-rest-ms", type=float, default=10)
+    parser.add_argument("--latencia-storage-ms", type=float, default=30)
+    parser.add_argument("--jitter-ms", type=float, default=5)
+    parser.add_argument("--storage-ms-por-mb", type=float, default=8)
+    parser.add_argument("--json", help="grava o resultado completo neste arquivo")
+    parser.add_argument("--salvar-baseline", metavar="NOME")
+    parser.add_argument("--comparar", metavar="NOME")
+    parser.add_argument("--tolerancia", type=float, default=0.15)
+
+    sys.exit(asyncio.run(main(parser.parse_args())))
@@ -0,0 +1,369 @@
+"""
+Supabase de mentira para benchmarks: o subconjunto do PostgREST e do
+Storage que a API usa, em memória, com latência configurável.
+
+    python -m bench.supabase_fake --porta 54321 --latencia-rest-ms 20
+
+REST (/rest/v1/<tabela>):
+- GET com select, filtros eq./in./is.null/lt./gte. (e or=/and=), order e limit;
+  Prefer: count=exact devolve o total em Content-Range; select com count()
+  agrupa pelas demais colunas
+- POST (lista ou objeto) e PATCH com filtros; Prefer: return=representation
+
+Storage (/storage/v1/object/...):
+- POST/PUT <bucket>/<path> com x-upsert (duplicado → 400/409, como o real)
+- GET e HEAD <bucket>/<path>, GET public/<bucket>/<path>
+- objeto inexistente → 400 com statusCode 404, como o real
+
+Rotas de controle (/_bench):
+- GET /_bench/estatisticas: chamadas por tipo e tamanho dos PDFs enviados
+- POST /_bench/reiniciar-estatisticas
+"""
+import argparse
+import asyncio
+import json
+import random
+import uuid
+from collections import defaultdict
+from dataclasses import dataclass
+from datetime import datetime
+from typing import Dict, List
+
+from starlette.applications import Starlette
+from starlette.requests import Request
+from starlette.responses import JSONResponse, Response
+from starlette.routing import Route
+
+
+@dataclass
+class Latencia:
+    rest_ms: float = 0.0
+    storage_ms: float = 0.0
+    # Variação aleatória somada a cada chamada (0..jitter_ms)
+    jitter_ms: float = 0.0
+    # Custo extra de transferência no Storage, por MB enviado ou lido
+    storage_ms_por_mb: float = 0.0
+
+    async def esperar(self, base_ms: float, tamanho: int = 0) -> None:
+        atraso = base_ms + random.uniform(0, self.jitter_ms)
+        atraso += self.storage_ms_por_mb * tamanho / (1024 * 1024)
+        if atraso > 0:
+            await asyncio.sleep(atraso / 1000)
+
+
+# ============================================================
+# ESTADO
+# ============================================================
+
+class Estado:
+    def __init__(self, latencia: Latencia):
+        self.latencia = latencia
+        self.tabelas: Dict[str, List[dict]] = defaultdict(list)
+        self.objetos: Dict[str, bytes] = {}
+        self.reiniciar_estatisticas()
+
+    def reiniciar_estatisticas(self) -> None:
+        self.chamadas: Dict[str, int] = defaultdict(int)
+        self.pdfs: List[int] = []
+        self.bytes_recebidos = 0
+
+    def estatisticas(self) -> dict:
+        return {
+            "chamadas": dict(self.chamadas),
+            "pdfs": self.pdfs,
+            "bytes_recebidos": self.bytes_recebidos,
+            "objetos": len(self.objetos),
+            "linhas": {t: len(linhas) for t, linhas in self.tabelas.items()},
+        }
+
+
+# ============================================================
+# POSTGREST
+# ============================================================
+
+def _converter(valor: str):
+    if valor == "null":
+        return None
+    if valor in ("true", "false"):
+        return valor == "true"
+    return valor
+
+
+_COMPARACOES = {
+    "lt": lambda a, b: a < b,
+    "lte": lambda a, b: a <= b,
+    "gt": lambda a, b: a > b,
+    "gte": lambda a, b: a >= b,
+}
+
+
+def _casa(linha: dict, coluna: str, filtro: str) -> bool:
+    atual = linha.get(coluna)
+    if filtro == "is.null":
+        return atual is None
+    if filtro.startswith("eq."):
+        esperado = _converter(filtro[3:].strip('"'))
+        return atual == esperado or str(atual) == str(esperado)
+    operador, _, valor = filtro.partition(".")
+    if operador in _COMPARACOES:
+        # Comparação textual: basta para datas ISO, UUIDs e códigos
+        return atual is not None and _COMPARACOES[operador](str(atual), valor.strip('"'))
+    if filtro.startswith("in.(") and filtro.endswith(")"):
+        valores = [
+            v.strip().strip('"') for v in filtro[4:-1].split(",") if v.strip()
+        ]
+        return str(atual) in valores
+    raise ValueError(f"Filtro não suportado: {coluna}={filtro}")
+
+
+def _separar(lista: str) -> List[str]:
+    """
+    Divide "a.eq.1,and(b.eq.2,c.lt.3)" nas vírgulas de primeiro nível.
+    """
+    partes, atual, nivel, aspas = [], "", 0, False
+    for ch in lista:
+        if ch == '"':
+            aspas = not aspas
+        elif not aspas and ch == "(":
+            nivel += 1
+        elif not aspas and ch == ")":
+            nivel -= 1
+        elif not aspas and ch == "," and nivel == 0:
+            partes.append(atual)
+            atual = ""
+            continue
+        atual += ch
+    return partes + [atual] if atual else partes
+
+
+def _casa_logico(linha: dict, operador: str, lista: str) -> bool:
+    """
+    Parâmetros or=(...) e and=(...), com and(...)/or(...) aninhados.
+    """
+    resultados = []
+    for condicao in _separar(lista[1:-1]):
+        if condicao.startswith(("and(", "or(")):
+            interno, _, resto = condicao.partition("(")
+            resultados.append(_casa_logico(linha, interno, "(" + resto))
+        else:
+            coluna, _, filtro = condicao.partition(".")
+            resultados.append(_casa(linha, coluna, filtro))
+    return any(resultados) if operador == "or" else all(resultados)
+
+
+def _filtrar(linhas: List[dict], params) -> List[dict]:
+    for coluna, filtro in params.items():
+        if coluna in ("select", "order", "limit", "offset", "on_conflict"):
+            continue
+        if coluna in ("or", "and"):
+            linhas = [l for l in linhas if _casa_logico(l, coluna, filtro)]
+            continue
+        linhas = [l for l in linhas if _casa(l, coluna, filtro)]
+    return linhas
+
+
+def _projetar(linha: dict, select: str) -> dict:
+    if not select or select == "*":
+        return dict(linha)
+    return {c: linha.get(c) for c in select.split(",")}
+
+
+def _agregar(linhas: List[dict], select: str) -> List[dict]:
+    """
+    select com count() (ex.: processo_id,total:count()): uma linha por
+    grupo das demais colunas, como os agregados do PostgREST 12.
+    """
+    colunas, contagem = [], "count"
+    for parte in select.split(","):
+        if parte.endswith("count()"):
+            contagem = parte.partition(":")[0] if ":" in parte else "count"
+        else:
+            colunas.append(parte)
+
+    grupos: Dict[tuple, int] = defaultdict(int)
+    for linha in linhas:
+        grupos[tuple(linha.get(c) for c in colunas)] += 1
+    return [{**dict(zip(colunas, chave)), contagem: n} for chave, n in grupos.items()]
+
+
+def _ordenar(linhas: List[dict], ordem: str) -> List[dict]:
+    for parte in reversed(ordem.split(",")):
+        coluna, _, direcao = parte.partition(".")
+        linhas = sorted(
+            linhas,
+            key=lambda l: (l.get(coluna) is None, str(l.get(coluna))),
+            reverse=direcao.startswith("desc")
+        )
+    return linhas
+
+
+async def rest(request: Request) -> Response:
+    estado: Estado = request.app.state.estado
+    tabela = request.path_params["tabela"]
+    params = request.query_params
+    metodo = request.method
+
+    estado.chamadas[f"rest {metodo}"] += 1
+    await estado.latencia.esperar(estado.latencia.rest_ms)
+
+    representacao = "return=representation" in request.headers.get("prefer", "")
+
+    try:
+        if metodo == "GET":
+            linhas = _filtrar(estado.tabelas[tabela], params)
+            if "order" in params:
+                linhas = _ordenar(linhas, params["order"])
+            if "count()" in params.get("select", ""):
+                return JSONResponse(_agregar(linhas, params["select"]))
+            total = len(linhas)
+            inicio = int(params.get("offset", 0))
+            linhas = linhas[inicio:]
+            if "limit" in params:
+                linhas = linhas[:int(params["limit"])]
+            headers = {}
+            if "count=exact" in request.headers.get("prefer", ""):
+                headers["Content-Range"] = (
+                    f"{inicio}-{inicio + len(linhas) - 1}/{total}" if linhas else f"*/{total}"
+                )
+            return JSONResponse(
+                [_projetar(l, params.get("select", "*")) for l in linhas],
+                headers=headers
+            )
+
+        if metodo == "POST":
+            corpo = await request.body()
+            estado.bytes_recebidos += len(corpo)
+            novas = json.loads(corpo)
+            novas = novas if isinstance(novas, list) else [novas]
+            agora = datetime.now().isoformat()
+            for linha in novas:
+                linha.setdefault("id", str(uuid.uuid4()))
+                linha.setdefault("criado_em", agora)
+            estado.tabelas[tabela].extend(novas)
+            if representacao:
+                return JSONResponse(novas, status_code=201)
+            return Response(status_code=201)
+
+        if metodo == "PATCH":
+            valores = json.loads(await request.body())
+            linhas = _filtrar(estado.tabelas[tabela], params)
+            for linha in linhas:
+                linha.update(valores)
+            if representacao:
+                return JSONResponse(linhas)
+            return Response(status_code=204)
+
+    except ValueError as e:
+        return JSONResponse({"message": str(e)}, status_code=400)
+
+    return JSONResponse({"message": "Método não suportado"}, status_code=405)
+
+
+# ============================================================
+# STORAGE
+# ============================================================
+
+def _nao_encontrado() -> Response:
+    return JSONResponse(
+        {"statusCode": "404", "error": "not_found", "message": "Object not found"},
+        status_code=400
+    )
+
+
+async def objeto(request: Request) -> Response:
+    estado: Estado = request.app.state.estado
+    caminho = request.path_params["caminho"]
+    metodo = request.method
+
+    if caminho.startswith("public/"):
+        caminho = caminho[len("public/"):]
+
+    estado.chamadas[f"storage {metodo}"] += 1
+
+    if metodo in ("POST", "PUT"):
+        corpo = await request.body()
+        await estado.latencia.esperar(estado.latencia.storage_ms, len(corpo))
+        estado.bytes_recebidos += len(corpo)
+
+        upsert = request.headers.get("x-upsert") == "true"
+        if caminho in estado.objetos and not upsert and metodo == "POST":
+            return JSONResponse(
+                {"statusCode": "409", "error": "Duplicate",
+                 "message": "The resource already exists"},
+                status_code=400
+            )
+
+        estado.objetos[caminho] = corpo
+        if caminho.endswith(".pdf"):
+            estado.pdfs.append(len(corpo))
+        return JSONResponse({"Key": caminho})
+
+    dados = estado.objetos.get(caminho)
+    await estado.latencia.esperar(
+        estado.latencia.storage_ms,
+        len(dados) if dados is not None and metodo == "GET" else 0
+    )
+
+    if dados is None:
+        return _nao_encontrado() if metodo == "GET" else Response(status_code=400)
+
+    if metodo == "HEAD":
+        return Response(headers={"content-length": str(len(dados))})
+    return Response(dados, media_type="application/octet-stream")
+
+
+# ============================================================
+# CONTROLE
+# ============================================================
+
+async def estatisticas(request: Request) -> Response:
+    return JSONResponse(request.app.state.estado.estatisticas())
+
+
+async def reiniciar_estatisticas(request: Request) -> Response:
+    request.app.state.estado.reiniciar_estatisticas()
+    return Response(status_code=204)
+
+
+def criar_app(latencia: Latencia) -> Starlette:
+    app = Starlette(routes=[
+        Route("/rest/v1/{tabela}", rest, methods=["GET", "POST", "PATCH"]),
+        Route("/rest/v1/", lambda r: JSONResponse({}), methods=["GET", "HEAD"]),
+        Route(
+            "/storage/v1/object/{caminho:path}",
+            objeto,
+            methods=["GET", "HEAD", "POST", "PUT"]
+        ),
+        Route("/_bench/estatisticas", estatisticas),
+        Route(
+            "/_bench/reiniciar-estatisticas",
+            reiniciar_estatisticas,
+            methods=["POST"]
+        ),
+    ])
+    app.state.estado = Estado(latencia)
+    return app
+
+
+if __name__ == "__main__":
+    import uvicorn
+
+    parser = argparse.ArgumentParser(description="Supabase fake para benchmarks")
+    parser.add_argument("--porta", type=int, default=54321)
+    parser.add_argument("--latencia-rest-ms", type=float, default=0)
+    parser.add_argument("--latencia-storage-ms", type=float, default=0)
+    parser.add_argument("--jitter-ms", type=float, default=0)
+    parser.add_argument("--storage-ms-por-mb", type=float, default=0)
+    args = parser.parse_args()
+
+    uvicorn.run(
+        criar_app(Latencia(
+            rest_ms=args.latencia_rest_ms,
+            storage_ms=args.latencia_storage_ms,
+            jitter_ms=args.jitter_ms,
+            storage_ms_por_mb=args.storage_ms_por_mb
+        )),
+        host="127.0.0.1",
+        port=args.porta,
+        log_level="warning"
+    )
@@ -0,0 +1,140 @@
+import asyncio
+import base64
+import hashlib
+import json
+
+import pytest
+from fastapi import HTTPException, Request
+from pydantic import BaseModel
+
+from app.services import entrada
+from app.services.entrada import CorpoGrande, ExtratorJson
+
+
+class Modelo(BaseModel):
+    nome: str
+    imagem: str
+
+
+def _requisicao(corpo: bytes, pedaco: int, content_type: str = "application/json", content_length: bool = True):
+    mensagens = [
+        {"type": "http.request", "body": corpo[i:i + pedaco], "more_body": i + pedaco < len(corpo)}
+        for i in range(0, len(corpo), pedaco)
+    ]
+    lidas = []
+
+    async def receive():
+        lidas.append(True)
+        return mensagens.pop(0)
+
+    headers = [(b"content-type", content_type.encode())]
+    if content_length:
+        headers.append((b"content-length", str(len(corpo)).encode()))
+    scope = {"type": "http", "method": "POST", "path": "/", "headers": headers, "query_string": b""}
+    return Request(scope, receive), lidas
+
+
+def _extrair(corpo: bytes, cortes):
+    extrator = ExtratorJson(("imagem",))
+    inicio = 0
+    for corte in list(cortes) + [len(corpo)]:
+        extrator.alimentar(corpo[inicio:corte])
+        inicio = corte
+    return extrator.finalizar(), extrator.partes
+
+
+def _divisoes(corpo: bytes):
+    # Todos os cortes em dois pedaços e o corpo byte a byte
+    yield from ([corte] for corte in range(1, len(corpo)))
+    yield range(1, len(corpo))
+
+
+# ============================================================
+# JSON EM STREAMING
+# ============================================================
+
+@pytest.mark.parametrize("valor", [
+    'a"b\\c\u00e9\t/ fim',
+    "x" * 300 + '\\"\u00e9',
+])
+def test_string_comum_em_campo_binario_preserva_escapes(valor):
+    corpo = json.dumps({"imagem": valor, "nome": "n"}).encode()
+
+    for cortes in _divisoes(corpo):
+        payload, partes = _extrair(corpo, cortes)
+        assert payload == {"imagem": valor, "nome": "n"}
+        assert not partes
+
+
+def test_data_url_partido_em_qualquer_ponto():
+    dados = bytes(range(256)) * 2
+    codificado = base64.encodebytes(dados).decode()
+    valor = "data:image/png;base64," + codificado
+    # \/ e \n escapados como um cliente JSON pode enviar
+    corpo = json.dumps({"nome": "n", "imagem": valor}).replace("/", "\\/").encode()
+
+    for cortes in _divisoes(corpo):
+        payload, partes = _extrair(corpo, cortes)
+        assert payload == {"nome": "n", "imagem": "__json_0"}
+        arquivo = partes["__json_0"]
+        assert arquivo.ler() == dados
+        assert arquivo.content_type == "image/png"
+        assert arquivo.sha256 == hashlib.sha256(dados).hexdigest()
+
+
+# ============================================================
+# LEITURA DA REQUISIÇÃO
+# ============================================================
+
+def test_multipart_com_boundary_partido_entre_pedacos():
+    boundary = "----limite7MA4YWxkTrZu0gW"
+    png = b"\x89PNG\r\n\x1a\n" + bytes(range(256))
+    corpo = (
+        f"--{boundary}\r\n"
+        'Content-Disposition: form-data; name="dados"\r\n\r\n'
+        '{"nome": "n", "imagem": "img"}\r\n'
+        f"--{boundary}\r\n"
+        'Content-Disposition: form-data; name="img"; filename="a.png"\r\n'
+        "Content-Type: image/png\r\n\r\n"
+    ).encode() + png + f"\r\n--{boundary}--\r\n".encode()
+
+    for pedaco in (1, 5, len(boundary) - 1, len(boundary) + 3, len(corpo)):
+        request, _ = _requisicao(corpo, pedaco, f"multipart/form-data; boundary={boundary}")
+        dados, form = asyncio.run(entrada.ler_requisicao(request, Modelo, ("imagem",)))
+        try:
+            assert dados == Modelo(nome="n", imagem="img")
+            assert entrada.resolver_arquivo("img", form).ler() == png
+        finally:
+            asyncio.run(form.close())
+
+
+def test_content_length_acima_do_limite_nao_le_o_corpo(monkeypatch):
+    monkeypatch.setattr(entrada, "REQUISICAO_MAX_BYTES", 100)
+    request, lidas = _requisicao(b"{" + b" " * 200 + b"}", 50)
+
+    with pytest.raises(HTTPException) as erro:
+        asyncio.run(entrada.ler_requisicao(request, Modelo, ("imagem",)))
+
+    assert erro.value.status_code == 413
+    assert not lidas
+
+
+def test_corpo_sem_content_length_para_no_limite():
+    corpo = json.dumps({"nome": "n", "imagem": "data:image/png;base64," + "A" * 1000}).encode()
+    request, lidas = _requisicao(corpo, 64, content_length=False)
+
+    with pytest.raises(CorpoGrande):
+        asyncio.run(entrada.ler_json_streaming(request, ("imagem",), limite=200))
+
+    assert len(lidas) <= 4
+
+
+def test_imagem_acima_do_limite(monkeypatch):
+    monkeypatch.setattr(entrada, "IMAGEM_MAX_BYTES", 10)
+    corpo = json.dumps({"nome": "n", "imagem": "data:image/png;base64," + "A" * 100}).encode()
+    request, _ = _requisicao(corpo, 16)
+
+    with pytest.raises(HTTPException) as erro:
+        asyncio.run(entrada.ler_requisicao(request, Modelo, ("imagem",)))
+
+    assert erro.value.status_code == 413
@@ -0,0 +1,45 @@
+import time
+
+from reportlab.pdfbase.pdfmetrics import stringWidth
+
+from app.services import layout, pdfs
+
+
+def test_palavra_longa_sem_espacos_e_cortada_em_tempo_linear():
+    texto = "A" * 5000
+
+    inicio = time.perf_counter()
+    linhas = layout.quebrar(texto, "Helvetica", 10, 500)
+    assert time.perf_counter() - inicio < 1
+
+    assert "".join(linhas) == texto
+    assert all(stringWidth(linha, "Helvetica", 10) <= 500 for linha in linhas)
+    # Linhas cheias: o corte não desperdiça espaço
+    assert all(
+        stringWidth(linha + "A", "Helvetica", 10) > 500 for linha in linhas[:-1]
+    )
+
+
+def test_quebra_preserva_palavras_e_paragrafos():
+    texto = "uma frase curta\n" + "palavra " * 60 + "\n" + "x" * 300
+
+    linhas = layout.quebrar(texto, "Helvetica", 10, 200)
+
+    assert linhas[0] == "uma frase curta"
+    assert linhas[1].startswith("palavra palavra")
+    assert "".join(linhas).replace(" ", "") == texto.replace(" ", "").replace("\n", "")
+    assert all(stringWidth(linha, "Helvetica", 10) <= 200 for linha in linhas)
+
+
+def test_feedback_longo_continua_nas_paginas_seguintes():
+    from io import BytesIO
+
+    from PyPDF2 import PdfReader
+
+    longo = "palavra " * 3000 + "y" * 2000
+    pdf = pdfs.pagina_nps(9, {"atendimento": 5}, {"elogio": longo})
+
+    paginas = PdfReader(BytesIO(pdf)).pages
+    assert len(paginas) > 1
+    texto = "".join(pagina.extract_text().replace("\n", "") for pagina in paginas)
+    assert "y" * 2000 in texto